@@ -0,0 +1,36 @@
+"""add statement-level NOTIFY triggers for the applicant lookup index
+
+Revision ID: add_application_lookup_notify
+Revises: add_trgm_search_indexes
+Create Date: 2025-07-30 12:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from db.notify import (
+    LOOKUP_ROW_TRIGGER, LOOKUP_NOTIFY_FUNCTION_SQL, LOOKUP_NOTIFY_TRIGGERS_SQL, TRIGGER_EXISTS_SQL, drop_trigger_sql
+)
+
+# revision identifiers, used by Alembic.
+revision = 'add_application_lookup_notify'
+down_revision = 'add_trgm_search_indexes'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    # Построчный триггер первой версии индекса создавал сам бот; с новой функцией он не работает
+    op.execute(drop_trigger_sql(LOOKUP_ROW_TRIGGER))
+    # Схема не зависит от настроек того, кто запускает миграцию: триггеры ставятся всегда,
+    # а бот при выключенном индексе (LOOKUP_INDEX_ENABLED) удаляет их при старте
+    op.execute(LOOKUP_NOTIFY_FUNCTION_SQL)
+    bind = op.get_bind()
+    for name, trigger_sql in LOOKUP_NOTIFY_TRIGGERS_SQL.items():
+        # Триггер мог быть уже создан индексом при старте бота
+        exists = bind.execute(sa.text(TRIGGER_EXISTS_SQL), {"name": name}).scalar()
+        if not exists:
+            op.execute(trigger_sql)
+
+def downgrade() -> None:
+    for name in LOOKUP_NOTIFY_TRIGGERS_SQL:
+        op.execute(drop_trigger_sql(name))
+    op.execute("DROP FUNCTION IF EXISTS notify_application_lookup()")
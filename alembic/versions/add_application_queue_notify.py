@@ -0,0 +1,31 @@
+"""add NOTIFY trigger for application queue changes
+
+Revision ID: add_application_queue_notify
+Revises: add_dispatch_indexes
+Create Date: 2025-07-21 12:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from db.notify import (
+    QUEUE_NOTIFY_TRIGGER, QUEUE_NOTIFY_FUNCTION_SQL, QUEUE_NOTIFY_TRIGGER_SQL, TRIGGER_EXISTS_SQL, drop_trigger_sql
+)
+
+# revision identifiers, used by Alembic.
+revision = 'add_application_queue_notify'
+down_revision = 'add_dispatch_indexes'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    # Схема не зависит от настроек того, кто запускает миграцию: триггер ставится всегда,
+    # а бот при выключенном диспетчере (DISPATCHER_ENABLED) удаляет его при старте
+    op.execute(QUEUE_NOTIFY_FUNCTION_SQL)
+    # Триггер мог быть уже создан диспетчером при старте бота
+    exists = op.get_bind().execute(sa.text(TRIGGER_EXISTS_SQL), {"name": QUEUE_NOTIFY_TRIGGER}).scalar()
+    if not exists:
+        op.execute(QUEUE_NOTIFY_TRIGGER_SQL)
+
+def downgrade() -> None:
+    op.execute(drop_trigger_sql(QUEUE_NOTIFY_TRIGGER))
+    op.execute("DROP FUNCTION IF EXISTS notify_application_queue()")
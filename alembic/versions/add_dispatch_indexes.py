@@ -0,0 +1,32 @@
+"""add partial index for application dispatch
+
+Revision ID: add_dispatch_indexes
+Revises: add_employee_password_column
+Create Date: 2025-07-20 12:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_dispatch_indexes'
+down_revision = 'add_employee_password_column'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    # Индекс мог быть уже создан через Base.metadata.create_all при старте бота
+    connection = op.get_bind()
+    inspector = sa.inspect(connection)
+    existing_indexes = [ix['name'] for ix in inspector.get_indexes('applications')]
+
+    if 'ix_applications_dispatch' not in existing_indexes:
+        op.create_index(
+            'ix_applications_dispatch',
+            'applications',
+            ['queue_type', sa.text('is_priority DESC'), sa.text('submitted_at ASC')],
+            postgresql_include=['id', 'postponed_until'],
+            postgresql_where=sa.text("status = 'QUEUED'")
+        )
+
+def downgrade() -> None:
+    op.drop_index('ix_applications_dispatch', table_name='applications')
@@ -0,0 +1,60 @@
+"""add unique index on (fio, submitted_at) for epgu applications
+
+Revision ID: add_epgu_import_unique_index
+Revises: add_queue_counters
+Create Date: 2025-07-24 12:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_epgu_import_unique_index'
+down_revision = 'add_queue_counters'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    connection = op.get_bind()
+    inspector = sa.inspect(connection)
+    existing_indexes = [ix['name'] for ix in inspector.get_indexes('applications')]
+    if 'ux_applications_epgu_fio_submitted' in existing_indexes:
+        return
+
+    # Повторные импорты до появления индекса могли оставить дубли. Удаляем только
+    # дубли, которые еще никто не брал в работу: оставляется обработанная строка,
+    # а среди необработанных — самая ранняя
+    op.execute("""
+        DELETE FROM applications a
+        USING (
+            SELECT id, row_number() OVER (
+                PARTITION BY fio, submitted_at
+                ORDER BY (status = 'QUEUED' AND processed_by_id IS NULL), id
+            ) AS rn
+            FROM applications
+            WHERE queue_type = 'epgu'
+        ) d
+        WHERE a.id = d.id AND d.rn > 1
+          AND a.status = 'QUEUED' AND a.processed_by_id IS NULL
+    """)
+    remaining = connection.execute(sa.text("""
+        SELECT count(*) FROM (
+            SELECT 1 FROM applications WHERE queue_type = 'epgu'
+            GROUP BY fio, submitted_at HAVING count(*) > 1
+        ) d
+    """)).scalar()
+    if remaining:
+        raise RuntimeError(
+            f"В очереди epgu {remaining} обработанных дублей по (fio, submitted_at); "
+            "устраните их вручную и повторите миграцию"
+        )
+
+    op.create_index(
+        'ux_applications_epgu_fio_submitted',
+        'applications',
+        ['fio', 'submitted_at'],
+        unique=True,
+        postgresql_where=sa.text("queue_type = 'epgu'")
+    )
+
+def downgrade() -> None:
+    op.drop_index('ux_applications_epgu_fio_submitted', table_name='applications')
@@ -0,0 +1,55 @@
+"""add import_jobs table for background imports
+
+Revision ID: add_import_jobs
+Revises: add_import_manifest
+Create Date: 2025-07-26 12:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = 'add_import_jobs'
+down_revision = 'add_import_manifest'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    # Таблица могла быть уже создана через Base.metadata.create_all при старте бота
+    connection = op.get_bind()
+    inspector = sa.inspect(connection)
+    if 'import_jobs' in inspector.get_table_names():
+        return
+
+    status_enum = postgresql.ENUM('QUEUED', 'RUNNING', 'DONE', 'FAILED', 'CANCELLED', name='importjobstatusenum')
+    status_enum.create(connection, checkfirst=True)
+    op.create_table(
+        'import_jobs',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('kind', sa.String(), nullable=False),
+        sa.Column('file_path', sa.String(), nullable=False),
+        sa.Column('file_name', sa.String(), nullable=True),
+        sa.Column('status', postgresql.ENUM(name='importjobstatusenum', create_type=False), nullable=False),
+        sa.Column('created_by', sa.String(), nullable=False),
+        sa.Column('employee_name', sa.String(), nullable=True),
+        sa.Column('chat_id', sa.BigInteger(), nullable=True),
+        sa.Column('message_id', sa.Integer(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('started_at', sa.DateTime(), nullable=True),
+        sa.Column('finished_at', sa.DateTime(), nullable=True),
+        sa.Column('total_rows', sa.Integer(), nullable=True),
+        sa.Column('progress', sa.Text(), nullable=True),
+        sa.Column('result', sa.Text(), nullable=True),
+        sa.Column('error', sa.Text(), nullable=True),
+    )
+    op.create_index(
+        'ix_import_jobs_queued',
+        'import_jobs',
+        ['id'],
+        postgresql_where=sa.text("status = 'QUEUED'")
+    )
+
+def downgrade() -> None:
+    op.drop_index('ix_import_jobs_queued', table_name='import_jobs')
+    op.drop_table('import_jobs')
+    op.execute("DROP TYPE IF EXISTS importjobstatusenum")
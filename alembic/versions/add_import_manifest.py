@@ -0,0 +1,43 @@
+"""add import upload manifest and row fingerprints
+
+Revision ID: add_import_manifest
+Revises: add_epgu_import_unique_index
+Create Date: 2025-07-25 12:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_import_manifest'
+down_revision = 'add_epgu_import_unique_index'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    # Таблицы могли быть уже созданы через Base.metadata.create_all при старте бота
+    connection = op.get_bind()
+    inspector = sa.inspect(connection)
+    existing_tables = inspector.get_table_names()
+
+    if 'import_uploads' not in existing_tables:
+        op.create_table(
+            'import_uploads',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('source', sa.String(), nullable=False),
+            sa.Column('file_hash', sa.String(length=64), nullable=False),
+            sa.Column('uploaded_at', sa.DateTime(), nullable=False),
+            sa.Column('total_rows', sa.Integer(), nullable=False),
+            sa.Column('changed_rows', sa.Integer(), nullable=False),
+        )
+
+    if 'import_fingerprints' not in existing_tables:
+        op.create_table(
+            'import_fingerprints',
+            sa.Column('source', sa.String(), primary_key=True),
+            sa.Column('fingerprint', sa.BigInteger(), primary_key=True),
+            sa.Column('upload_id', sa.Integer(), sa.ForeignKey('import_uploads.id'), nullable=False),
+        )
+
+def downgrade() -> None:
+    op.drop_table('import_fingerprints')
+    op.drop_table('import_uploads')
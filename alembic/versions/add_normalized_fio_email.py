@@ -0,0 +1,87 @@
+"""add generated fio_norm/email_norm columns and exact-match indexes
+
+Revision ID: add_normalized_fio_email
+Revises: add_import_jobs
+Create Date: 2025-07-27 12:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_normalized_fio_email'
+down_revision = 'add_import_jobs'
+branch_labels = None
+depends_on = None
+
+# Должны совпадать с FIO_NORM_SQL / EMAIL_NORM_SQL в db/models.py
+FIO_NORM_SQL = "lower(translate(regexp_replace(btrim(fio), '\\s+', ' ', 'g'), 'Ёё', 'Ее'))"
+EMAIL_NORM_SQL = "lower(btrim(email))"
+
+def upgrade() -> None:
+    connection = op.get_bind()
+    inspector = sa.inspect(connection)
+    columns = [c['name'] for c in inspector.get_columns('applications')]
+
+    # Вычисляемые колонки заполняются для существующих строк при ALTER TABLE
+    if 'fio_norm' not in columns:
+        op.add_column('applications', sa.Column('fio_norm', sa.String(), sa.Computed(FIO_NORM_SQL, persisted=True)))
+    if 'email_norm' not in columns:
+        op.add_column('applications', sa.Column('email_norm', sa.String(), sa.Computed(EMAIL_NORM_SQL, persisted=True)))
+
+    existing_indexes = [ix['name'] for ix in inspector.get_indexes('applications')]
+    if 'ix_applications_queue_fio_norm' not in existing_indexes:
+        op.create_index('ix_applications_queue_fio_norm', 'applications', ['queue_type', 'fio_norm'])
+    if 'ix_applications_queue_email_norm' not in existing_indexes:
+        op.create_index('ix_applications_queue_email_norm', 'applications', ['queue_type', 'email_norm'])
+
+    # Уникальность заявлений ЕПГУ — теперь по нормализованному ФИО. Новые дубли
+    # (ФИО, отличающиеся пробелами/регистром/«ё») удаляются так же, как в
+    # add_epgu_import_unique_index: только еще не взятые в работу
+    if 'ux_applications_epgu_fio_norm_submitted' not in existing_indexes:
+        op.execute("""
+            DELETE FROM applications a
+            USING (
+                SELECT id, row_number() OVER (
+                    PARTITION BY fio_norm, submitted_at
+                    ORDER BY (status = 'QUEUED' AND processed_by_id IS NULL), id
+                ) AS rn
+                FROM applications
+                WHERE queue_type = 'epgu'
+            ) d
+            WHERE a.id = d.id AND d.rn > 1
+              AND a.status = 'QUEUED' AND a.processed_by_id IS NULL
+        """)
+        remaining = connection.execute(sa.text("""
+            SELECT count(*) FROM (
+                SELECT 1 FROM applications WHERE queue_type = 'epgu'
+                GROUP BY fio_norm, submitted_at HAVING count(*) > 1
+            ) d
+        """)).scalar()
+        if remaining:
+            raise RuntimeError(
+                f"В очереди epgu {remaining} обработанных дублей по (fio_norm, submitted_at); "
+                "устраните их вручную и повторите миграцию"
+            )
+        op.create_index(
+            'ux_applications_epgu_fio_norm_submitted',
+            'applications',
+            ['fio_norm', 'submitted_at'],
+            unique=True,
+            postgresql_where=sa.text("queue_type = 'epgu'")
+        )
+    if 'ux_applications_epgu_fio_submitted' in existing_indexes:
+        op.drop_index('ux_applications_epgu_fio_submitted', table_name='applications')
+
+def downgrade() -> None:
+    op.create_index(
+        'ux_applications_epgu_fio_submitted',
+        'applications',
+        ['fio', 'submitted_at'],
+        unique=True,
+        postgresql_where=sa.text("queue_type = 'epgu'")
+    )
+    op.drop_index('ux_applications_epgu_fio_norm_submitted', table_name='applications')
+    op.drop_index('ix_applications_queue_email_norm', table_name='applications')
+    op.drop_index('ix_applications_queue_fio_norm', table_name='applications')
+    op.drop_column('applications', 'email_norm')
+    op.drop_column('applications', 'fio_norm')
@@ -0,0 +1,94 @@
+"""add queue_counters table maintained by statement-level triggers
+
+Revision ID: add_queue_counters
+Revises: add_reclaim_index
+Create Date: 2025-07-23 12:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = 'add_queue_counters'
+down_revision = 'add_reclaim_index'
+branch_labels = None
+depends_on = None
+
+TRIGGERS = {
+    'applications_counters_insert': """
+        CREATE TRIGGER applications_counters_insert
+        AFTER INSERT ON applications
+        REFERENCING NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION applications_queue_counters()
+    """,
+    'applications_counters_update': """
+        CREATE TRIGGER applications_counters_update
+        AFTER UPDATE ON applications
+        REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION applications_queue_counters()
+    """,
+    'applications_counters_delete': """
+        CREATE TRIGGER applications_counters_delete
+        AFTER DELETE ON applications
+        REFERENCING OLD TABLE AS old_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION applications_queue_counters()
+    """,
+}
+
+def upgrade() -> None:
+    # Таблица и триггеры могли быть уже созданы ботом при старте
+    connection = op.get_bind()
+    inspector = sa.inspect(connection)
+
+    if 'queue_counters' not in inspector.get_table_names():
+        op.create_table(
+            'queue_counters',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('queue_type', sa.String(), nullable=False),
+            sa.Column('status', postgresql.ENUM(name='applicationstatusenum', create_type=False), nullable=True),
+            sa.Column('n', sa.Integer(), nullable=False),
+        )
+
+    op.execute("""
+        CREATE OR REPLACE FUNCTION applications_queue_counters() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP = 'INSERT' THEN
+                INSERT INTO queue_counters (queue_type, status, n)
+                SELECT queue_type, status, count(*) FROM new_rows GROUP BY queue_type, status;
+            ELSIF TG_OP = 'DELETE' THEN
+                INSERT INTO queue_counters (queue_type, status, n)
+                SELECT queue_type, status, -count(*) FROM old_rows GROUP BY queue_type, status;
+            ELSE
+                INSERT INTO queue_counters (queue_type, status, n)
+                SELECT queue_type, status, sum(delta) FROM (
+                    SELECT queue_type, status, -1 AS delta FROM old_rows
+                    UNION ALL
+                    SELECT queue_type, status, 1 AS delta FROM new_rows
+                ) AS changes
+                GROUP BY queue_type, status
+                HAVING sum(delta) <> 0;
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+
+    existing = set(connection.execute(sa.text(
+        "SELECT tgname FROM pg_trigger WHERE tgrelid = 'applications'::regclass AND NOT tgisinternal"
+    )).scalars().all())
+    for name, ddl in TRIGGERS.items():
+        if name not in existing:
+            op.execute(ddl)
+
+    # Начальные значения: точный пересчет по текущим заявлениям
+    op.execute("DELETE FROM queue_counters")
+    op.execute("""
+        INSERT INTO queue_counters (queue_type, status, n)
+        SELECT queue_type, status, count(*) FROM applications GROUP BY queue_type, status
+    """)
+
+def downgrade() -> None:
+    for name in TRIGGERS:
+        op.execute(f"DROP TRIGGER IF EXISTS {name} ON applications")
+    op.execute("DROP FUNCTION IF EXISTS applications_queue_counters()")
+    op.drop_table('queue_counters')
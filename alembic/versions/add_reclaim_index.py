@@ -0,0 +1,31 @@
+"""add partial index for reclaiming expired in-progress applications
+
+Revision ID: add_reclaim_index
+Revises: add_application_queue_notify
+Create Date: 2025-07-22 12:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_reclaim_index'
+down_revision = 'add_application_queue_notify'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    # Индекс мог быть уже создан через Base.metadata.create_all при старте бота
+    connection = op.get_bind()
+    inspector = sa.inspect(connection)
+    existing_indexes = [ix['name'] for ix in inspector.get_indexes('applications')]
+
+    if 'ix_applications_in_progress_taken_at' not in existing_indexes:
+        op.create_index(
+            'ix_applications_in_progress_taken_at',
+            'applications',
+            ['taken_at'],
+            postgresql_where=sa.text("status = 'IN_PROGRESS'")
+        )
+
+def downgrade() -> None:
+    op.drop_index('ix_applications_in_progress_taken_at', table_name='applications')
@@ -0,0 +1,43 @@
+"""enable pg_trgm and add trigram GIN indexes for substring search
+
+Revision ID: add_trgm_search_indexes
+Revises: add_normalized_fio_email
+Create Date: 2025-07-28 12:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_trgm_search_indexes'
+down_revision = 'add_normalized_fio_email'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+
+    # Индексы могли быть уже созданы через Base.metadata.create_all при старте бота
+    connection = op.get_bind()
+    inspector = sa.inspect(connection)
+    existing_indexes = [ix['name'] for ix in inspector.get_indexes('applications')]
+    if 'ix_applications_fio_norm_trgm' not in existing_indexes:
+        op.create_index(
+            'ix_applications_fio_norm_trgm',
+            'applications',
+            ['fio_norm'],
+            postgresql_using='gin',
+            postgresql_ops={'fio_norm': 'gin_trgm_ops'}
+        )
+    if 'ix_applications_email_norm_trgm' not in existing_indexes:
+        op.create_index(
+            'ix_applications_email_norm_trgm',
+            'applications',
+            ['email_norm'],
+            postgresql_using='gin',
+            postgresql_ops={'email_norm': 'gin_trgm_ops'}
+        )
+
+def downgrade() -> None:
+    op.drop_index('ix_applications_email_norm_trgm', table_name='applications')
+    op.drop_index('ix_applications_fio_norm_trgm', table_name='applications')
+    # Расширение pg_trgm не удаляется: им могут пользоваться другие объекты базы
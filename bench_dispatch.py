@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк выдачи заявлений: p50/p99 запросов выбора следующего заявления
+(ЛК и ЕПГУ) без индекса ix_applications_dispatch и с ним.
+
+Данные создаются в отдельной схеме bench_dispatch, которая удаляется по окончании.
+Запуск: DB_DSN=postgresql+asyncpg://... python bench_dispatch.py [100000 500000 1000000]
+"""
+import asyncio
+import statistics
+import sys
+import os
+import time
+from datetime import datetime
+
+# Добавляем корневую директорию в путь
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.dialects import postgresql
+from config import DB_DSN
+from db.models import Base
+from db.dispatch import next_application_candidate_stmt
+
+BENCH_SCHEMA = "bench_dispatch"
+DEFAULT_SIZES = [100_000, 500_000, 1_000_000]
+ITERATIONS = 200
+
+# ~10% заявлений в очереди, ~5% приоритетных, часть ЕПГУ отложена
+SEED_SQL = """
+INSERT INTO applications (fio, submitted_at, is_priority, status, queue_type, postponed_until)
+SELECT
+    'Заявитель ' || g,
+    now() - (g || ' seconds')::interval,
+    (g % 20 = 0),
+    CASE WHEN g % 10 = 0 THEN 'QUEUED' ELSE 'ACCEPTED' END::applicationstatusenum,
+    (ARRAY['lk', 'epgu', 'epgu_mail'])[g % 3 + 1],
+    CASE WHEN g % 7 = 0 THEN now() + interval '1 day' ELSE NULL END
+FROM generate_series(1, :n) AS g
+"""
+
+def compile_sql(stmt):
+    """Скомпилировать запрос с подставленными параметрами для EXPLAIN"""
+    return str(stmt.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+
+def dispatch_queries():
+    now = datetime.now()
+    return {
+        "lk": compile_sql(next_application_candidate_stmt("lk")),
+        "epgu": compile_sql(next_application_candidate_stmt("epgu", postponed_before=now)),
+    }
+
+async def measure(conn, sql):
+    timings = []
+    for _ in range(ITERATIONS):
+        started = time.perf_counter()
+        await conn.execute(text(sql))
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    p50 = statistics.median(timings)
+    p99 = timings[min(len(timings) - 1, int(len(timings) * 0.99))]
+    return p50, p99
+
+async def explain(conn, sql):
+    result = await conn.execute(text(f"EXPLAIN {sql}"))
+    return "\n".join(f"      {row[0]}" for row in result.fetchall())
+
+async def run_size(engine, size):
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.execute(text("DROP INDEX IF EXISTS ix_applications_dispatch"))
+        await conn.execute(text(SEED_SQL), {"n": size})
+        await conn.execute(text("ANALYZE applications"))
+
+    print(f"\n📊 Заявлений: {size}")
+    queries = dispatch_queries()
+    for label, create_index in (("без индекса", False), ("с индексом", True)):
+        if create_index:
+            async with engine.begin() as conn:
+                for ix in Base.metadata.tables["applications"].indexes:
+                    await conn.run_sync(lambda sync_conn, ix=ix: ix.create(sync_conn))
+                await conn.execute(text("ANALYZE applications"))
+        for queue_type, sql in queries.items():
+            # Каждый замер выполняется в транзакции, которая откатывается
+            async with engine.connect() as conn:
+                trans = await conn.begin()
+                p50, p99 = await measure(conn, sql)
+                plan = await explain(conn, sql)
+                await trans.rollback()
+            print(f"   {queue_type:<5} {label:<12} p50={p50:.2f} мс  p99={p99:.2f} мс")
+            if create_index:
+                print(plan)
+
+async def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or DEFAULT_SIZES
+    admin_engine = create_async_engine(DB_DSN)
+    async with admin_engine.begin() as conn:
+        await conn.execute(text(f"DROP SCHEMA IF EXISTS {BENCH_SCHEMA} CASCADE"))
+        await conn.execute(text(f"CREATE SCHEMA {BENCH_SCHEMA}"))
+
+    engine = create_async_engine(
+        DB_DSN,
+        connect_args={"server_settings": {"search_path": f"{BENCH_SCHEMA}, public"}}
+    )
+    try:
+        for size in sizes:
+            await run_size(engine, size)
+    finally:
+        await engine.dispose()
+        async with admin_engine.begin() as conn:
+            await conn.execute(text(f"DROP SCHEMA IF EXISTS {BENCH_SCHEMA} CASCADE"))
+        await admin_engine.dispose()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк разбора выгрузок: построчный разбор (iterrows + strptime, как было раньше)
+против колоночного из utils.excel на синтетической выгрузке 1С.
+
+Для каждого размера создается временный .xlsx, замеряются чтение файла и разбор.
+Результаты построчного и колоночного разбора сравниваются. Для выгрузки 1С также
+сравнивается пиковая память (tracemalloc) чтения через pd.read_excel и потокового
+чтения XlsxChunkReader, а также время чтения той же выгрузки разными бэкендами
+utils.excel (openpyxl, calamine — если установлен python-calamine, потоковое .xlsx, CSV).
+Запуск: python bench_excel.py [10000 100000]
+"""
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+# Добавляем корневую директорию в путь
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import pandas as pd
+from utils.excel import (
+    classify_1c_applications, parse_lk_applications, parse_epgu_applications, parse_1c_applications_from_excel,
+    read_table, open_chunk_reader, EXCEL_ENGINE
+)
+
+DEFAULT_SIZES = [10_000, 100_000]
+
+METHODS = ["СМС-подтверждение", "СМС-подтверждение", "Через ЕПГУ", "Лично", None]
+STATUSES = ["Подано", "Принято", "На рассмотрении", "Редактируется", "Отозвано"]
+
+
+def make_1c_export(size: int, seed: int = 42) -> pd.DataFrame:
+    rnd = random.Random(seed)
+    start = datetime(2025, 6, 20, 9, 0, 0)
+    dates = []
+    for _ in range(size):
+        moment = start + timedelta(seconds=rnd.randint(0, 60 * 24 * 3600))
+        # Часть дат без секунд, часть без времени, как в реальных выгрузках
+        fmt = rnd.choice(["%d.%m.%Y %H:%M:%S", "%d.%m.%Y %H:%M:%S", "%d.%m.%Y %H:%M", "%d.%m.%Y"])
+        dates.append(moment.strftime(fmt))
+    return pd.DataFrame({
+        "Физическое лицо": [f"Заявитель {rnd.randint(1, size // 2)}" for _ in range(size)],
+        "Способ подачи заявления": [rnd.choice(METHODS) for _ in range(size)],
+        "Статус заявления в ПК": [rnd.choice(STATUSES) for _ in range(size)],
+        "Есть изменения": [rnd.choice(["Да", "Нет", "Нет"]) for _ in range(size)],
+        "Дата первой подачи": dates,
+    })
+
+
+def _parse_date_rowwise(date_str, formats):
+    for fmt in formats:
+        try:
+            return datetime.strptime(date_str, fmt)
+        except Exception:
+            continue
+    return None
+
+
+def classify_1c_rowwise(df: pd.DataFrame):
+    """Прежний построчный разбор выгрузки 1С (для сравнения)"""
+    result = {"lk": [], "epgu": [], "unknown": []}
+    for _, row in df.iterrows():
+        fio = str(row["Физическое лицо"]).strip()
+        submission_method = str(row["Способ подачи заявления"]).strip()
+        status = str(row["Статус заявления в ПК"]).strip().lower()
+        has_changes = str(row["Есть изменения"]).strip().lower()
+        date_str = str(row["Дата первой подачи"]).strip()
+        if not fio or fio == 'nan' or not date_str or date_str == 'nan':
+            continue
+        submitted_at = _parse_date_rowwise(date_str, ["%d.%m.%Y %H:%M:%S", "%d.%m.%Y %H:%M", "%d.%m.%Y"])
+        if submitted_at is None:
+            continue
+        is_priority = False
+        status_reason = None
+        if "СМС-подтверждение" in submission_method:
+            queue_type = "lk"
+            if status == "принято":
+                app_status = "accepted"
+            elif status == "подано":
+                app_status = "queued"
+            elif status == "на рассмотрении":
+                if has_changes == "да":
+                    app_status = "queued"
+                    is_priority = True
+                else:
+                    app_status = "rejected"
+                    status_reason = "загружено администратором"
+            else:
+                continue
+        elif "ЕПГУ" in submission_method:
+            queue_type = "epgu"
+            if status == "принято":
+                app_status = "accepted"
+            elif status == "на рассмотрении":
+                app_status = "queued"
+            else:
+                continue
+        elif submission_method == "" and status == "подано":
+            queue_type = "lk"
+            app_status = "queued"
+        else:
+            queue_type = "unknown"
+            app_status = "queued"
+            status_reason = f"Неизвестный способ подачи: '{submission_method}'"
+        result[queue_type].append({
+            "fio": fio,
+            "submitted_at": submitted_at,
+            "queue_type": queue_type,
+            "status": app_status,
+            "is_priority": is_priority,
+            "status_reason": status_reason
+        })
+    result["lk"].sort(key=lambda x: (not x["is_priority"], x["submitted_at"]))
+    result["epgu"].sort(key=lambda x: x["submitted_at"])
+    result["unknown"].sort(key=lambda x: x["submitted_at"])
+    return result
+
+
+def timed(func, *args):
+    started = time.perf_counter()
+    result = func(*args)
+    return result, (time.perf_counter() - started) * 1000
+
+
+def peak_memory(func, *args):
+    """Пиковый объем памяти (МБ), выделенной Python-кодом во время вызова"""
+    tracemalloc.start()
+    try:
+        result = func(*args)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, peak / 1024 / 1024
+
+
+def parse_1c_in_memory(path):
+    return classify_1c_applications(pd.read_excel(path))
+
+
+def parse_1c_streaming(path):
+    return asyncio.run(parse_1c_applications_from_excel(path))
+
+
+def read_streaming(path):
+    with open_chunk_reader(path) as reader:
+        return sum(len(chunk) for chunk in reader)
+
+
+def bench_backends(df: pd.DataFrame, path: str, tmp_dir: str):
+    """Время чтения одной выгрузки разными бэкендами"""
+    csv_path = os.path.join(tmp_dir, "export.csv")
+    df.to_csv(csv_path, index=False, encoding="cp1251", sep=";")
+    backends = [("openpyxl", lambda: read_table(path, engine="openpyxl"))]
+    if EXCEL_ENGINE == "calamine":
+        backends.append(("calamine", lambda: read_table(path, engine="calamine")))
+    else:
+        print("   calamine: недоступен — необязательный python-calamine не установлен, .xlsx читается через openpyxl")
+    backends += [
+        ("openpyxl read_only", lambda: read_streaming(path)),
+        ("CSV (cp1251, ;)", lambda: read_table(csv_path)),
+        ("CSV потоково", lambda: read_streaming(csv_path)),
+    ]
+    for label, func in backends:
+        _, ms = timed(func)
+        print(f"   чтение {label + ':':<22}{ms:9.1f} мс")
+
+
+def without_fingerprint(result):
+    """Результат разбора без отпечатков строк: построчный разбор их не считает"""
+    return {
+        queue: [{k: v for k, v in app.items() if k != "fingerprint"} for app in apps]
+        for queue, apps in result.items()
+    }
+
+
+def run_size(size: int, tmp_dir: str):
+    print(f"\n📊 Строк: {size}")
+    path = os.path.join(tmp_dir, f"export_{size}.xlsx")
+    _, write_ms = timed(lambda: make_1c_export(size).to_excel(path, index=False))
+    df, read_ms = timed(pd.read_excel, path)
+    print(f"   запись .xlsx:            {write_ms:9.1f} мс")
+    print(f"   чтение pd.read_excel:    {read_ms:9.1f} мс")
+
+    rowwise, rowwise_ms = timed(classify_1c_rowwise, df)
+    columnar, columnar_ms = timed(classify_1c_applications, df)
+    assert rowwise == without_fingerprint(columnar), "результаты построчного и колоночного разбора различаются"
+    print(f"   1С построчно:            {rowwise_ms:9.1f} мс")
+    print(f"   1С по колонкам:          {columnar_ms:9.1f} мс  (x{rowwise_ms / columnar_ms:.1f})")
+
+    _, lk_ms = timed(parse_lk_applications, df)
+    print(f"   ЛК по колонкам:          {lk_ms:9.1f} мс")
+    epgu_df = df[["Физическое лицо", "Дата первой подачи"]]
+    _, epgu_ms = timed(parse_epgu_applications, epgu_df)
+    print(f"   ЕПГУ по колонкам:        {epgu_ms:9.1f} мс")
+
+    bench_backends(df, path, tmp_dir)
+
+    del df, rowwise, columnar
+    in_memory, in_memory_mb = peak_memory(parse_1c_in_memory, path)
+    streaming, streaming_ms = timed(parse_1c_streaming, path)
+    _, streaming_mb = peak_memory(parse_1c_streaming, path)
+    assert in_memory == streaming, "результаты потокового чтения отличаются"
+    print(f"   1С потоково (с чтением): {streaming_ms:9.1f} мс")
+    print(f"   пик памяти read_excel:   {in_memory_mb:9.1f} МБ")
+    print(f"   пик памяти потоково:     {streaming_mb:9.1f} МБ")
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or DEFAULT_SIZES
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for size in sizes:
+            run_size(size, tmp_dir)
+
+
+if __name__ == "__main__":
+    main()
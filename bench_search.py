@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк поиска заявлений по подстроке: p50/p99 прежнего ILIKE '%...%' по fio/email
+(полный просмотр таблицы) и запросов db/search.py с триграммными GIN-индексами pg_trgm.
+
+Данные создаются в отдельной схеме bench_search, которая удаляется по окончании.
+Запуск: DB_DSN=postgresql+asyncpg://... python bench_search.py [100000 500000 1000000]
+"""
+import asyncio
+import statistics
+import sys
+import os
+import time
+
+# Добавляем корневую директорию в путь
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import select, text
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.dialects import postgresql
+from config import DB_DSN
+from db.models import Base, Application
+from db.search import search_applications_stmt
+
+BENCH_SCHEMA = "bench_search"
+DEFAULT_SIZES = [100_000, 500_000, 1_000_000]
+ITERATIONS = 100
+TRGM_INDEXES = ("ix_applications_fio_norm_trgm", "ix_applications_email_norm_trgm")
+
+# ФИО из сочетаний фамилий, имен и отчеств; у части заявлений есть email
+SEED_SQL = """
+INSERT INTO applications (fio, email, submitted_at, is_priority, status, queue_type)
+SELECT
+    (ARRAY['Иванов', 'Петров', 'Сидоров', 'Кузнецов', 'Смирнов', 'Попов', 'Васильев',
+           'Соколов', 'Михайлов', 'Новиков', 'Фёдоров', 'Морозов', 'Волков', 'Алексеев'])[g % 14 + 1]
+        || '-' || (g / 14) || ' '
+        || (ARRAY['Александр', 'Дмитрий', 'Максим', 'Сергей', 'Андрей', 'Алексей', 'Артём',
+                  'Илья', 'Кирилл', 'Михаил', 'Никита', 'Матвей'])[g % 12 + 1] || ' '
+        || (ARRAY['Александрович', 'Дмитриевич', 'Сергеевич', 'Андреевич', 'Алексеевич',
+                  'Иванович', 'Петрович'])[g % 7 + 1],
+    CASE WHEN g % 3 = 0 THEN 'applicant' || g || '@example.ru' ELSE NULL END,
+    now() - (g || ' seconds')::interval,
+    (g % 20 = 0),
+    CASE WHEN g % 10 = 0 THEN 'QUEUED' ELSE 'ACCEPTED' END::applicationstatusenum,
+    (ARRAY['lk', 'epgu', 'epgu_mail'])[g % 3 + 1]
+FROM generate_series(1, :n) AS g
+"""
+
+# (название, запрос, очередь, поиск по email)
+SEARCHES = [
+    ("ФИО целиком", "Петров-4242 Кирилл", "epgu", False),
+    ("часть фамилии", "ова-777", None, False),
+    ("email", "applicant4242@", "epgu_mail", True),
+]
+
+def compile_sql(stmt):
+    """Скомпилировать запрос с подставленными параметрами для EXPLAIN"""
+    return str(stmt.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+
+def ilike_stmt(query, queue_type, by_email):
+    """Поиск в прежнем виде: ILIKE по исходной колонке"""
+    column = Application.email if by_email else Application.fio
+    stmt = select(Application).where(column.ilike(f"%{query}%"))
+    if queue_type is not None:
+        stmt = stmt.where(Application.queue_type == queue_type)
+    return stmt.order_by(Application.submitted_at.desc())
+
+async def measure(conn, sql):
+    timings = []
+    for _ in range(ITERATIONS):
+        started = time.perf_counter()
+        await conn.execute(text(sql))
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    p50 = statistics.median(timings)
+    p99 = timings[min(len(timings) - 1, int(len(timings) * 0.99))]
+    return p50, p99
+
+async def explain(conn, sql):
+    result = await conn.execute(text(f"EXPLAIN {sql}"))
+    return "\n".join(f"      {row[0]}" for row in result.fetchall())
+
+async def run_size(engine, size):
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+        for name in TRGM_INDEXES:
+            await conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+        await conn.execute(text(SEED_SQL), {"n": size})
+        await conn.execute(text("ANALYZE applications"))
+
+    print(f"\n📊 Заявлений: {size}")
+    for label, create_index in (("ILIKE", False), ("pg_trgm", True)):
+        if create_index:
+            async with engine.begin() as conn:
+                for ix in Base.metadata.tables["applications"].indexes:
+                    if ix.name in TRGM_INDEXES:
+                        await conn.run_sync(lambda sync_conn, ix=ix: ix.create(sync_conn))
+                await conn.execute(text("ANALYZE applications"))
+        for name, query, queue_type, by_email in SEARCHES:
+            if create_index:
+                stmt = search_applications_stmt(query, queue_type, by_email=by_email)
+            else:
+                stmt = ilike_stmt(query, queue_type, by_email)
+            sql = compile_sql(stmt)
+            async with engine.connect() as conn:
+                p50, p99 = await measure(conn, sql)
+                plan = await explain(conn, sql)
+            print(f"   {name:<14} {label:<8} p50={p50:.2f} мс  p99={p99:.2f} мс")
+            if create_index:
+                print(plan)
+
+async def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or DEFAULT_SIZES
+    admin_engine = create_async_engine(DB_DSN)
+    async with admin_engine.begin() as conn:
+        await conn.execute(text(f"DROP SCHEMA IF EXISTS {BENCH_SCHEMA} CASCADE"))
+        await conn.execute(text(f"CREATE SCHEMA {BENCH_SCHEMA}"))
+
+    # public — для функций и классов операторов pg_trgm, если расширение уже установлено
+    engine = create_async_engine(
+        DB_DSN,
+        connect_args={"server_settings": {"search_path": f"{BENCH_SCHEMA}, public"}}
+    )
+    try:
+        for size in sizes:
+            await run_size(engine, size)
+    finally:
+        await engine.dispose()
+        async with admin_engine.begin() as conn:
+            await conn.execute(text(f"DROP SCHEMA IF EXISTS {BENCH_SCHEMA} CASCADE"))
+        await admin_engine.dispose()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,27 +1,63 @@
 import asyncio
 from aiogram import Bot, Dispatcher
 
-from config import BOT_TOKEN, ADMIN_USER_ID
+from config import (
+    BOT_TOKEN, ADMIN_USER_ID, DISPATCHER_ENABLED, LOOKUP_INDEX_ENABLED, SCHEDULER_ENABLED,
+    RECLAIM_INTERVAL, POSTPONED_REACTIVATION_INTERVAL, OVERDUE_MAIL_CHECK_INTERVAL,
+    QUEUE_COUNTERS_RECONCILE_INTERVAL
+)
 from handlers.common import router as common_router
 from handlers.lk import router as lk_router
 from handlers.epgu import router as epgu_router
 from handlers.admin import router as admin_router
 from handlers.mail import router as mail_router
 from handlers.problem import router as problem_router
+from handlers.inline import router as inline_router
 from db.models import Base
 from db.session import engine
-from db.crud import add_employee, get_employee_by_tg_id
+from db.counters import ensure_counter_triggers
+from db.crud import (
+    add_employee, get_employee_by_tg_id, manual_cleanup_expired_applications,
+    reactivate_postponed_applications, notify_overdue_mail_applications, reconcile_queue_counters
+)
+from db.dispatcher import start_dispatcher, stop_dispatcher, drop_dispatcher_trigger
+from db.lookup import start_applicant_index, stop_applicant_index, drop_lookup_triggers
 from utils.logger import init_logger
+from utils.scheduler import init_scheduler
+from utils.workers import shutdown_workers
+from utils.import_jobs import start_import_runner, stop_import_runner
+from middlewares import DbSessionMiddleware, CommitBeforeRequestMiddleware
 
 async def create_tables():
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+        await ensure_counter_triggers(conn)
 
 async def ensure_admin():
     admin = await get_employee_by_tg_id(str(ADMIN_USER_ID))
     if not admin:
         await add_employee(str(ADMIN_USER_ID), "Администратор", is_admin_flag=True)
 
+def setup_scheduler(bot: Bot):
+    scheduler = init_scheduler()
+    scheduler.add_job(
+        "reclaim_expired", lambda: manual_cleanup_expired_applications(bot),
+        interval=RECLAIM_INTERVAL, first_delay=10
+    )
+    scheduler.add_job(
+        "reactivate_postponed", reactivate_postponed_applications,
+        interval=POSTPONED_REACTIVATION_INTERVAL, first_delay=30
+    )
+    scheduler.add_job(
+        "overdue_mail", lambda: notify_overdue_mail_applications(bot),
+        interval=OVERDUE_MAIL_CHECK_INTERVAL
+    )
+    scheduler.add_job(
+        "reconcile_queue_counters", reconcile_queue_counters,
+        interval=QUEUE_COUNTERS_RECONCILE_INTERVAL
+    )
+    return scheduler
+
 async def main():
     # Создаем бота с настройками по умолчанию
     bot = Bot(token=BOT_TOKEN)
@@ -30,6 +66,11 @@ async def main():
     # Инициализируем логгер
     init_logger(bot)
     
+    # Одна сессия БД на апдейт (единица работы)
+    dp.update.outer_middleware(DbSessionMiddleware())
+    # Изменения апдейта фиксируются до отправки сообщений в Telegram
+    bot.session.middleware(CommitBeforeRequestMiddleware())
+    
     # Регистрируем роутеры
     dp.include_router(common_router)
     dp.include_router(lk_router)
@@ -37,15 +78,47 @@ async def main():
     dp.include_router(admin_router)
     dp.include_router(mail_router)
     dp.include_router(problem_router)
+    dp.include_router(inline_router)
     
     # Создаем таблицы
     await create_tables()
     
+    # Сверяем счетчики очередей (при первом запуске — заполняем)
+    await reconcile_queue_counters()
+    
     # Добавляем админа если его нет
     await ensure_admin()
     
+    # Запускаем диспетчер выдачи заявлений, если он включен
+    if DISPATCHER_ENABLED:
+        await start_dispatcher()
+    else:
+        await drop_dispatcher_trigger()
+    
+    # Строим индекс заявителей для inline-поиска, если он включен
+    if LOOKUP_INDEX_ENABLED:
+        await start_applicant_index()
+    else:
+        await drop_lookup_triggers()
+    
+    # Запускаем периодические задачи
+    scheduler = setup_scheduler(bot) if SCHEDULER_ENABLED else None
+    if scheduler:
+        scheduler.start()
+    
+    # Запускаем исполнитель фоновых заданий импорта (в т.ч. прерванных прошлым запуском)
+    await start_import_runner(bot)
+    
     # Запускаем бота с увеличенными таймаутами
-    await dp.start_polling(bot, polling_timeout=30)
+    try:
+        await dp.start_polling(bot, polling_timeout=30)
+    finally:
+        if scheduler:
+            await scheduler.stop()
+        await stop_import_runner()
+        await stop_dispatcher()
+        await stop_applicant_index()
+        shutdown_workers()
 
 if __name__ == "__main__":
     asyncio.run(main()) 
\ No newline at end of file
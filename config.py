@@ -44,6 +44,36 @@ def get_db_dsn():
 
 DB_DSN = get_db_dsn()
 
+# Диспетчер выдачи заявлений в памяти (кучи по очередям + LISTEN/NOTIFY)
+DISPATCHER_ENABLED = os.getenv("DISPATCHER_ENABLED", "").lower() in ["true", "1", "yes"]
+
+# Индекс заявителей в памяти для inline-поиска (@bot ФИО) без запросов к БД на каждое нажатие
+LOOKUP_INDEX_ENABLED = os.getenv("LOOKUP_INDEX_ENABLED", "").lower() in ["true", "1", "yes"]
+
+# Кеш сотрудников и их групп (проверка доступа в хендлерах); TTL=0 отключает кеш
+EMPLOYEE_CACHE_TTL = float(os.getenv("EMPLOYEE_CACHE_TTL", "60"))
+EMPLOYEE_CACHE_SIZE = int(os.getenv("EMPLOYEE_CACHE_SIZE", "1024"))
+
+# Периодические задачи бота (интервалы в секундах)
+SCHEDULER_ENABLED = os.getenv("SCHEDULER_ENABLED", "true").lower() in ["true", "1", "yes"]
+RECLAIM_INTERVAL = int(os.getenv("RECLAIM_INTERVAL", "60"))  # Возврат в очередь заявлений, взятых больше часа назад
+POSTPONED_REACTIVATION_INTERVAL = int(os.getenv("POSTPONED_REACTIVATION_INTERVAL", "300"))  # Снятие истекших откладываний ЕПГУ
+OVERDUE_MAIL_CHECK_INTERVAL = int(os.getenv("OVERDUE_MAIL_CHECK_INTERVAL", "86400"))  # Напоминание о просроченной почте
+QUEUE_COUNTERS_RECONCILE_INTERVAL = int(os.getenv("QUEUE_COUNTERS_RECONCILE_INTERVAL", "300"))  # Сверка счетчиков очередей
+
+# Процессов для разбора файлов импорта (Excel/CSV) вне цикла событий бота; 0 — в потоке бота
+IMPORT_WORKERS = int(os.getenv("IMPORT_WORKERS", "1"))
+# Файлы меньше этого размера (МБ) разбираются в потоке: запуск процесса пула дороже разбора
+IMPORT_OFFLOAD_MIN_MB = float(os.getenv("IMPORT_OFFLOAD_MIN_MB", "2"))
+# Фоновые задания импорта: каталог для загруженных файлов и период опроса таблицы import_jobs
+IMPORT_JOBS_DIR = os.getenv("IMPORT_JOBS_DIR", os.path.join("data", "imports"))
+IMPORT_JOBS_POLL_INTERVAL = float(os.getenv("IMPORT_JOBS_POLL_INTERVAL", "5"))
+# Не чаще одного обновления сообщения о прогрессе импорта за столько секунд
+IMPORT_PROGRESS_INTERVAL = float(os.getenv("IMPORT_PROGRESS_INTERVAL", "3"))
+
+# Время жизни общего снимка статистики очередей (бот и дашборд), секунд; 0 — без кеша
+STATISTICS_CACHE_TTL = float(os.getenv("STATISTICS_CACHE_TTL", "5"))
+
 # Загружаем настройки чатов из файла
 def load_chat_config():
     config_file = "chat_config.json"
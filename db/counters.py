@@ -0,0 +1,122 @@
+"""
+Счетчики заявлений по (queue_type, status) без COUNT(*) по таблице applications.
+
+Таблица queue_counters — журнал приращений: триггеры уровня оператора на applications
+добавляют по строке на каждую пару (queue_type, status), изменившуюся в операторе,
+поэтому массовый импорт дает несколько строк, а не строку на заявление. Строки только
+добавляются, так что параллельные транзакции не блокируют друг друга на счетчиках.
+Текущее значение — SUM(n) по паре.
+
+Задача сверки (reconcile_counters_sql) в транзакции REPEATABLE READ заменяет все видимые
+строки журнала точными COUNT(*) по тому же снимку: журнал снова сворачивается до одной
+строки на пару, а приращения транзакций, зафиксированных после снимка, сохраняются.
+
+Модуль используется и ботом (async), и веб-интерфейсом (sync), поэтому здесь только
+запросы и DDL без привязки к сессии.
+"""
+from sqlalchemy import select, func, text
+from .models import QueueCounter, ApplicationStatusEnum
+
+COUNTERS_FUNCTION_SQL = """
+CREATE OR REPLACE FUNCTION applications_queue_counters() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO queue_counters (queue_type, status, n)
+        SELECT queue_type, status, count(*) FROM new_rows GROUP BY queue_type, status;
+    ELSIF TG_OP = 'DELETE' THEN
+        INSERT INTO queue_counters (queue_type, status, n)
+        SELECT queue_type, status, -count(*) FROM old_rows GROUP BY queue_type, status;
+    ELSE
+        INSERT INTO queue_counters (queue_type, status, n)
+        SELECT queue_type, status, sum(delta) FROM (
+            SELECT queue_type, status, -1 AS delta FROM old_rows
+            UNION ALL
+            SELECT queue_type, status, 1 AS delta FROM new_rows
+        ) AS changes
+        GROUP BY queue_type, status
+        HAVING sum(delta) <> 0;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+"""
+
+# Триггер с таблицами переходов может обслуживать только одно событие
+COUNTERS_TRIGGERS_SQL = {
+    "applications_counters_insert": """
+        CREATE TRIGGER applications_counters_insert
+        AFTER INSERT ON applications
+        REFERENCING NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION applications_queue_counters()
+    """,
+    "applications_counters_update": """
+        CREATE TRIGGER applications_counters_update
+        AFTER UPDATE ON applications
+        REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION applications_queue_counters()
+    """,
+    "applications_counters_delete": """
+        CREATE TRIGGER applications_counters_delete
+        AFTER DELETE ON applications
+        REFERENCING OLD TABLE AS old_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION applications_queue_counters()
+    """,
+}
+
+# Сверка: выполняется одной транзакцией в REPEATABLE READ
+RECONCILE_DRIFT_SQL = """
+SELECT coalesce(c.queue_type, a.queue_type) AS queue_type,
+       coalesce(c.status, a.status) AS status,
+       coalesce(c.n, 0) AS counted,
+       coalesce(a.n, 0) AS actual
+FROM (SELECT queue_type, status, sum(n) AS n FROM queue_counters GROUP BY queue_type, status) AS c
+FULL JOIN (SELECT queue_type, status, count(*) AS n FROM applications GROUP BY queue_type, status) AS a
+    ON a.queue_type = c.queue_type AND a.status IS NOT DISTINCT FROM c.status
+WHERE coalesce(c.n, 0) <> coalesce(a.n, 0)
+"""
+RECONCILE_DELETE_SQL = "DELETE FROM queue_counters"
+RECONCILE_INSERT_SQL = """
+INSERT INTO queue_counters (queue_type, status, n)
+SELECT queue_type, status, count(*) FROM applications GROUP BY queue_type, status
+"""
+
+
+async def ensure_counter_triggers(conn):
+    """Создать функцию и триггеры счетчиков, если их нет (conn — AsyncConnection)"""
+    await conn.execute(text(COUNTERS_FUNCTION_SQL))
+    result = await conn.execute(text(
+        "SELECT tgname FROM pg_trigger WHERE tgrelid = 'applications'::regclass AND NOT tgisinternal"
+    ))
+    existing = set(result.scalars().all())
+    for name, ddl in COUNTERS_TRIGGERS_SQL.items():
+        if name not in existing:
+            await conn.execute(text(ddl))
+
+
+def queue_counts_stmt(queue_types=None):
+    """SELECT queue_type, status, n — текущие значения счетчиков"""
+    stmt = select(
+        QueueCounter.queue_type,
+        QueueCounter.status,
+        func.sum(QueueCounter.n).label("n")
+    ).group_by(QueueCounter.queue_type, QueueCounter.status)
+    if queue_types:
+        stmt = stmt.where(QueueCounter.queue_type.in_(queue_types))
+    return stmt
+
+
+def counts_by_queue(rows):
+    """
+    Преобразовать строки queue_counts_stmt в {queue_type: {status.value: n}}.
+    Все статусы присутствуют (0, если заявлений нет)
+    """
+    result = {}
+    for queue_type, status, n in rows:
+        counts = result.setdefault(queue_type, {s.value: 0 for s in ApplicationStatusEnum})
+        if status is not None:
+            counts[status.value] = int(n or 0)
+    return result
+
+
+def empty_counts():
+    return {s.value: 0 for s in ApplicationStatusEnum}
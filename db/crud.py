@@ -1,11 +1,29 @@
-from sqlalchemy import select, update, delete
-from sqlalchemy.orm import selectinload
-from .models import Application, ApplicationStatusEnum, Employee, Group, WorkDay, WorkBreak, WorkDayStatusEnum
+from sqlalchemy import select, update, delete, insert, case, exists, literal, func, text
+from sqlalchemy.orm import selectinload, aliased
+from sqlalchemy.schema import CreateTable
+from sqlalchemy.exc import IntegrityError
+from .models import Application, ApplicationStatusEnum, Employee, Group, WorkDay, WorkBreak, WorkDayStatusEnum, ImportUpload, ImportJob, ImportJobStatusEnum, normalized_fio
 from datetime import datetime, timedelta, date
-from .session import get_session
+from collections import Counter
+from sqlalchemy.ext.asyncio import AsyncSession
+from .session import get_session, commit
+from .dispatch import claim_next_application_stmt
+from .search import search_applications_stmt, search_applications_page_stmt, is_searchable, SEARCH_PAGE_SIZE
+from .imports import (
+    batches, insert_epgu_applications_stmt, insert_queued_applications_stmt, epgu_duplicate_stmt,
+    STAGED_QUEUES, staging_1c, staging_rows, drop_known_fios_stmt, drop_duplicates_stmt,
+    mark_matched_stmt, update_matched_stmt, insert_unmatched_stmt, staged_totals_stmt,
+    IMPORT_SOURCE_1C, last_upload_hash_stmt, known_fingerprints_stmt, record_fingerprints_stmt, reset_manifest_stmts,
+    move_epgu_to_mail_stmt, insert_mail_applications_stmt, normalize_email
+)
+from .dispatcher import get_dispatcher
+from .employee_cache import employee_cache, invalidate_employee, CachedEmployee, MISSING
+from .counters import RECONCILE_DRIFT_SQL, RECONCILE_DELETE_SQL, RECONCILE_INSERT_SQL
+from .statistics import get_statistics_snapshot, invalidate_statistics, processed_by_queue_stmt, build_processed_report
+from .work_reports import work_day_report_stmt, build_work_day_report
 import aiohttp
 import tempfile
-from utils.excel import parse_lk_applications_from_excel, parse_epgu_applications_from_excel, parse_1c_applications_from_excel, parse_epgu_mail_applications_from_excel
+from utils.excel import parse_lk_applications_from_excel, parse_epgu_applications_from_excel, parse_1c_applications_from_excel, parse_epgu_mail_applications_from_excel, run_parser
 import pytz
 import logging
 import pandas as pd
@@ -13,6 +31,8 @@ import subprocess
 import os
 from urllib.parse import urlparse
 from utils.logger import get_logger
+from utils.workers import run_in_worker, should_offload, cancellation
+from utils.progress import as_reporter
 
 # Настройка логирования
 logging.basicConfig(level=logging.INFO)
@@ -29,44 +49,79 @@ def get_moscow_date():
     """Получить текущую дату в московском часовом поясе"""
     return get_moscow_now().date()
 
-async def cleanup_expired_applications():
-    """Возвращает в очередь заявления, которые в обработке больше часа"""
+async def cleanup_expired_applications(timeout: timedelta = timedelta(hours=1)):
+    """
+    Возвращает в очередь заявления, которые в обработке дольше timeout (по умолчанию час).
+    Один оператор UPDATE ... RETURNING по индексу ix_applications_in_progress_taken_at;
+    строки, заблокированные в этот момент, пропускаются до следующего запуска
+    """
     async for session in get_session():
-        one_hour_ago = datetime.now() - timedelta(hours=1)
-        # Сначала получаем заявления, которые будут возвращены
-        expired_stmt = select(Application).where(
-            Application.status == ApplicationStatusEnum.IN_PROGRESS,
-            Application.taken_at < one_hour_ago
-        ).options(selectinload(Application.processed_by))
-        expired_result = await session.execute(expired_stmt)
-        expired_apps = expired_result.scalars().all()
-        
-        # Возвращаем заявления в очередь
-        stmt = update(Application).where(
-            Application.status == ApplicationStatusEnum.IN_PROGRESS,
-            Application.taken_at < one_hour_ago
-        ).values(
+        applications = Application.__table__
+        employees = Employee.__table__
+        expired = select(applications.c.id, applications.c.processed_by_id).where(
+            applications.c.status == ApplicationStatusEnum.IN_PROGRESS,
+            applications.c.taken_at < datetime.now() - timeout
+        ).with_for_update(skip_locked=True).cte("expired")
+        # processed_by_id берем из expired: в RETURNING самой таблицы он уже обнулен
+        reclaimed = update(applications).where(applications.c.id == expired.c.id).values(
             status=ApplicationStatusEnum.QUEUED,
             processed_by_id=None,
             taken_at=None
-        )
-        await session.execute(stmt)
+        ).returning(
+            applications.c.id, applications.c.fio, applications.c.queue_type, expired.c.processed_by_id
+        ).cte("reclaimed")
+        stmt = select(
+            reclaimed.c.id,
+            reclaimed.c.fio,
+            reclaimed.c.queue_type,
+            employees.c.tg_id.label("employee_tg_id"),
+            employees.c.fio.label("employee_fio")
+        ).select_from(
+            reclaimed.outerjoin(employees, employees.c.id == reclaimed.c.processed_by_id)
+        ).order_by(reclaimed.c.id)
+        result = await session.execute(stmt)
+        rows = result.all()
         await session.commit()
         
         # Возвращаем информацию о возвращённых заявлениях
         return [
             {
-                "app_id": app.id,
-                "fio": app.fio,
-                "queue_type": app.queue_type,
-                "employee_tg_id": app.processed_by.tg_id if app.processed_by else None,
-                "employee_fio": app.processed_by.fio if app.processed_by else None
+                "app_id": row.id,
+                "fio": row.fio,
+                "queue_type": row.queue_type,
+                "employee_tg_id": row.employee_tg_id,
+                "employee_fio": row.employee_fio
             }
-            for app in expired_apps
+            for row in rows
         ]
 
-async def get_next_application(queue_type: str, employee_id: int = None, bot=None):
+async def reactivate_postponed_applications():
+    """Снять отметку «отложено» с заявлений ЕПГУ, срок откладывания которых истек. Возвращает их id"""
     async for session in get_session():
+        stmt = update(Application).where(
+            Application.queue_type == "epgu",
+            Application.status == ApplicationStatusEnum.QUEUED,
+            Application.postponed_until <= get_moscow_now()
+        ).values(postponed_until=None).returning(Application.id).execution_options(synchronize_session=False)
+        result = await session.execute(stmt)
+        app_ids = result.scalars().all()
+        await session.commit()
+        return app_ids
+
+async def get_next_application(queue_type: str, employee_id: int = None, bot=None, session: AsyncSession = None):
+    async for session in get_session(session):
+        if employee_id:
+            dispatcher = get_dispatcher()
+            if dispatcher:
+                app = await dispatcher.claim(session, queue_type, employee_id, datetime.now())
+            else:
+                # Сразу блокируем заявление за сотрудником одним UPDATE ... SKIP LOCKED
+                result = await session.execute(
+                    claim_next_application_stmt(queue_type, employee_id, datetime.now())
+                )
+                app = result.scalars().first()
+            await commit(session)
+            return app
         stmt = select(Application).where(
             Application.queue_type == queue_type,
             Application.status == ApplicationStatusEnum.QUEUED
@@ -75,17 +130,10 @@ async def get_next_application(queue_type: str, employee_id: int = None, bot=Non
             Application.submitted_at.asc()
         )
         result = await session.execute(stmt)
-        app = result.scalars().first()
-        if app and employee_id:
-            # Сразу блокируем заявление за сотрудником
-            app.status = ApplicationStatusEnum.IN_PROGRESS
-            app.processed_by_id = employee_id
-            app.taken_at = datetime.now()
-            await session.commit()
-        return app
+        return result.scalars().first()
 
-async def update_application_status(app_id: int, status: ApplicationStatusEnum, reason: str = None, employee_id: int = None):
-    async for session in get_session():
+async def update_application_status(app_id: int, status: ApplicationStatusEnum, reason: str = None, employee_id: int = None, session: AsyncSession = None):
+    async for session in get_session(session):
         # Если статус PROBLEM, меняем тип очереди на _problem
         if status == ApplicationStatusEnum.PROBLEM:
             # Получаем текущее заявление, чтобы узнать его тип очереди
@@ -119,58 +167,71 @@ async def update_application_status(app_id: int, status: ApplicationStatusEnum,
             )
         
         await session.execute(stmt)
-        await session.commit()
+        await commit(session)
 
-async def add_application(fio: str, submitted_at: datetime, queue_type: str, is_priority: bool = False):
-    async for session in get_session():
+async def add_application(fio: str, submitted_at: datetime, queue_type: str, is_priority: bool = False, session: AsyncSession = None):
+    async for session in get_session(session):
         app = Application(fio=fio, submitted_at=submitted_at, queue_type=queue_type, is_priority=is_priority)
         session.add(app)
-        await session.commit()
+        await commit(session)
         return app
 
-async def set_priority(fio: str, queue_type: str):
-    async for session in get_session():
+async def set_priority(fio: str, queue_type: str, session: AsyncSession = None):
+    async for session in get_session(session):
         stmt = update(Application).where(
-            Application.fio == fio,
+            Application.fio_norm == normalized_fio(fio),
             Application.queue_type == queue_type
         ).values(is_priority=True)
         await session.execute(stmt)
-        await session.commit()
+        await commit(session)
 
-async def find_application_by_fio(fio: str, queue_type: str):
-    async for session in get_session():
+async def find_application_by_fio(fio: str, queue_type: str, session: AsyncSession = None):
+    async for session in get_session(session):
         stmt = select(Application).where(
-            Application.fio == fio,
+            Application.fio_norm == normalized_fio(fio),
             Application.queue_type == queue_type
         )
         result = await session.execute(stmt)
         return result.scalars().all()
 
-async def get_employee_by_tg_id(tg_id: str):
-    async for session in get_session():
-        stmt = select(Employee).where(Employee.tg_id == str(tg_id)).options(selectinload(Employee.groups))
-        result = await session.execute(stmt)
-        return result.scalars().first()
+async def _load_employee(session, tg_id: str):
+    """Загрузить ORM-объект сотрудника с группами (для изменений, в обход кеша)"""
+    stmt = select(Employee).where(Employee.tg_id == str(tg_id)).options(selectinload(Employee.groups))
+    result = await session.execute(stmt)
+    return result.scalars().first()
 
-async def employee_has_group(tg_id: str, group_name: str):
-    async for session in get_session():
-        stmt = select(Employee).where(Employee.tg_id == tg_id).options(selectinload(Employee.groups))
-        result = await session.execute(stmt)
-        emp = result.scalars().first()
-        if not emp or not emp.groups:
-            return False
-        return any(g.name == group_name for g in emp.groups)
+async def get_employee_by_tg_id(tg_id: str, session: AsyncSession = None):
+    """
+    Получить сотрудника с группами по tg_id через кеш (см. db/employee_cache.py).
+    Возвращает неизменяемый снимок CachedEmployee или None
+    """
+    tg_id = str(tg_id)
+    cached = employee_cache.get(tg_id)
+    if cached is not MISSING:
+        return cached
+    generation = employee_cache.generation
+    async for session in get_session(session):
+        emp = await _load_employee(session, tg_id)
+        snapshot = CachedEmployee.from_orm(emp) if emp else None
+        employee_cache.put(tg_id, snapshot, generation)
+        return snapshot
 
-async def is_admin(tg_id: str):
-    emp = await get_employee_by_tg_id(tg_id)
+async def employee_has_group(tg_id: str, group_name: str, session: AsyncSession = None):
+    emp = await get_employee_by_tg_id(tg_id, session=session)
+    if not emp or not emp.groups:
+        return False
+    return any(g.name == group_name for g in emp.groups)
+
+async def is_admin(tg_id: str, session: AsyncSession = None):
+    emp = await get_employee_by_tg_id(tg_id, session=session)
     return emp.is_admin if emp else False
 
-async def has_access(tg_id: str, group_name: str):
+async def has_access(tg_id: str, group_name: str, session: AsyncSession = None):
     """
     Проверяет, есть ли у пользователя доступ к группе.
     Админы имеют доступ ко всем группам.
     """
-    emp = await get_employee_by_tg_id(tg_id)
+    emp = await get_employee_by_tg_id(tg_id, session=session)
     if not emp:
         return False
     
@@ -183,22 +244,24 @@ async def has_access(tg_id: str, group_name: str):
         return False
     return any(g.name == group_name for g in emp.groups)
 
-async def add_employee(tg_id: str, fio: str, is_admin_flag: bool = False):
-    async for session in get_session():
+async def add_employee(tg_id: str, fio: str, is_admin_flag: bool = False, session: AsyncSession = None):
+    async for session in get_session(session):
         emp = Employee(tg_id=tg_id, fio=fio, is_admin=is_admin_flag)
         session.add(emp)
-        await session.commit()
+        await commit(session)
+        invalidate_employee(tg_id, session)
         return emp
 
-async def remove_employee(tg_id: str):
-    async for session in get_session():
-        emp = await get_employee_by_tg_id(tg_id)
+async def remove_employee(tg_id: str, session: AsyncSession = None):
+    async for session in get_session(session):
+        emp = await _load_employee(session, tg_id)
         if emp:
             await session.delete(emp)
-            await session.commit()
+            await commit(session)
+            invalidate_employee(tg_id, session)
 
-async def add_group_to_employee(tg_id: str, group_name: str):
-    async for session in get_session():
+async def add_group_to_employee(tg_id: str, group_name: str, session: AsyncSession = None):
+    async for session in get_session(session):
         emp_result = await session.execute(select(Employee).where(Employee.tg_id == tg_id).options(selectinload(Employee.groups)))
         emp = emp_result.scalars().first()
         if not emp:
@@ -208,27 +271,29 @@ async def add_group_to_employee(tg_id: str, group_name: str):
         if not group:
             group = Group(name=group_name)
             session.add(group)
-            await session.commit()
+            await commit(session)
         if group not in emp.groups:
             emp.groups.append(group)
             session.add(emp)
-            await session.commit()
+            await commit(session)
+            invalidate_employee(tg_id, session)
         return True
 
-async def remove_group_from_employee(tg_id: str, group_name: str):
-    async for session in get_session():
-        emp = await get_employee_by_tg_id(tg_id)
+async def remove_group_from_employee(tg_id: str, group_name: str, session: AsyncSession = None):
+    async for session in get_session(session):
+        emp = await _load_employee(session, tg_id)
         if not emp:
             return False
         group = await session.execute(select(Group).where(Group.name == group_name))
         group = group.scalars().first()
         if group and group in emp.groups:
             emp.groups.remove(group)
-            await session.commit()
+            await commit(session)
+            invalidate_employee(tg_id, session)
         return True
 
-async def list_employees_with_groups():
-    async for session in get_session():
+async def list_employees_with_groups(session: AsyncSession = None):
+    async for session in get_session(session):
         stmt = select(Employee).options(selectinload(Employee.groups))
         result = await session.execute(stmt)
         employees = result.scalars().all()
@@ -242,143 +307,88 @@ async def list_employees_with_groups():
             for e in employees
         ]
 
-async def get_applications_by_queue_type(queue_type: str):
-    async for session in get_session():
+async def get_applications_by_queue_type(queue_type: str, session: AsyncSession = None):
+    async for session in get_session(session):
         stmt = select(Application).where(Application.queue_type == queue_type).order_by(Application.submitted_at.asc())
         result = await session.execute(stmt)
         return result.scalars().all()
 
-async def clear_queue_by_type(queue_type: str):
-    async for session in get_session():
+async def clear_queue_by_type(queue_type: str, session: AsyncSession = None):
+    async for session in get_session(session):
         await session.execute(
             Application.__table__.delete().where(Application.queue_type == queue_type)
         )
-        await session.commit()
+        # Следующая выгрузка 1С должна восстановить удаленные заявления целиком
+        for stmt in reset_manifest_stmts():
+            await session.execute(stmt)
+        await commit(session)
+        invalidate_statistics()
 
-async def import_applications_from_excel(file_path, queue_type: str, progress_callback=None):
+async def import_applications_from_excel(file_path, queue_type: str, progress_callback=None, cancel_key=None):
     import os
     from utils.excel import parse_lk_applications_from_excel, parse_epgu_applications_from_excel
+    progress = as_reporter(progress_callback)
+    # Разбор файла — вне цикла событий (большой файл — в пуле процессов), чтобы не блокировать бота
+    offload = should_offload(file_path)
     if queue_type == "lk":
-        applications = parse_lk_applications_from_excel(file_path)
+        applications = await run_in_worker(
+            run_parser, parse_lk_applications_from_excel, file_path, cancel_key=cancel_key, offload=offload
+        )
     elif queue_type == "epgu":
-        applications = parse_epgu_applications_from_excel(file_path)
+        applications = await run_in_worker(
+            run_parser, parse_epgu_applications_from_excel, file_path, cancel_key=cancel_key, offload=offload
+        )
     else:
         applications = []
     
     # Отправляем информацию о количестве строк для обработки
-    if progress_callback:
-        try:
-            await progress_callback(f"📊 Найдено строк для импорта: {len(applications)}\n💾 Начинаю работу с базой данных...")
-        except:
-            pass
+    progress.report(f"📊 Найдено строк для импорта: {len(applications)}\n💾 Начинаю работу с базой данных...")
     logger = logging.getLogger("epgu_import")
     logger.info(f"Импорт заявлений: очередь={queue_type}, всего строк в файле: {len(applications)}")
     added = 0
     skipped = 0
-    skipped_details = []
-    async for session in get_session():
-        if queue_type == "epgu":
-            # Получить все (fio, submitted_at) уже в базе для epgu, независимо от статуса
-            existing = await session.execute(
-                select(Application.fio, Application.submitted_at).where(
-                    Application.queue_type == "epgu"
-                )
-            )
-            existing_keys = set((fio, submitted_at) for fio, submitted_at in existing.fetchall())
-            processed_count = 0
-            for app in applications:
-                processed_count += 1
-                
-                # Показываем прогресс каждые 250 строк
-                if processed_count % 250 == 0 and progress_callback:
-                    try:
-                        await progress_callback(f"💾 Обрабатываю заявления: {processed_count}/{len(applications)}")
-                    except:
-                        pass
-                
-                key = (app["fio"], app["submitted_at"])
-                if key in existing_keys:
-                    skipped += 1
-                    skipped_details.append(f"{app['fio']} | {app['submitted_at']} (уже есть)")
-                    continue
-                new_app = Application(
-                    fio=app["fio"],
-                    submitted_at=app["submitted_at"],
-                    queue_type="epgu",
-                    status=ApplicationStatusEnum.QUEUED
-                )
-                session.add(new_app)
-                added += 1
-            await session.commit()
-            
-            # Отправляем финальное сообщение о завершении
-            if progress_callback:
-                try:
-                    await progress_callback(f"✅ Обработка завершена. Добавлено: {added}, пропущено: {skipped}")
-                except:
-                    pass
-            
-            logger.info(f"Добавлено заявлений: {added}, пропущено: {skipped}")
-            if skipped_details:
-                logger.info("Пропущенные строки (уже есть в базе):\n" + "\n".join(skipped_details))
-        else:
-            # Для ЛК проверяем только заявления в статусе QUEUED
-            existing = await session.execute(
-                select(Application.fio).where(
-                    Application.queue_type == queue_type,
-                    Application.status == ApplicationStatusEnum.QUEUED
-                )
-            )
-            existing_fios = set(fio for (fio,) in existing.fetchall())
+    with cancellation(cancel_key) as cancel:
+        async for session in get_session():
+            # Дедупликация выполняется в базе (db.imports): ЕПГУ — по (fio, submitted_at)
+            # независимо от статуса, ЛК — по ФИО среди заявлений в очереди
             processed_count = 0
-            for app in applications:
-                processed_count += 1
-                
-                # Показываем прогресс каждые 250 строк
-                if processed_count % 250 == 0 and progress_callback:
-                    try:
-                        await progress_callback(f"💾 Обрабатываю заявления: {processed_count}/{len(applications)}")
-                    except:
-                        pass
-                
-                if app["fio"] in existing_fios:
-                    skipped += 1
-                    continue
-                new_app = Application(
-                    fio=app["fio"],
-                    submitted_at=app["submitted_at"],
-                    queue_type=queue_type,
-                    is_priority=app.get("priority", False),
-                    status=ApplicationStatusEnum.QUEUED
-                )
-                session.add(new_app)
-                added += 1
+            for batch in batches(applications):
+                # Отмена до коммита откатывает всю загрузку
+                cancel.check()
+                if queue_type == "epgu":
+                    stmt = insert_epgu_applications_stmt(batch)
+                else:
+                    stmt = insert_queued_applications_stmt(batch, queue_type)
+                inserted = len((await session.execute(stmt)).scalars().all())
+                added += inserted
+                skipped += len(batch) - inserted
+                processed_count += len(batch)
+                progress.report(f"💾 Обрабатываю заявления: {processed_count}/{len(applications)}",
+                                done=processed_count, total=len(applications))
             await session.commit()
-            
+            invalidate_statistics()
+
             # Отправляем финальное сообщение о завершении
-            if progress_callback:
-                try:
-                    await progress_callback(f"✅ Обработка завершена. Добавлено: {added}, пропущено: {skipped}")
-                except:
-                    pass
-            
+            progress.report(f"✅ Обработка завершена. Добавлено: {added}, пропущено: {skipped}")
+            await progress.flush()
+
             logger.info(f"Добавлено заявлений: {added}, пропущено: {skipped}")
     logger.info(f"Импорт завершен: очередь={queue_type}, добавлено={added}, пропущено={skipped}")
     return added, skipped, len(applications)
 
-async def return_application_to_queue(app_id: int):
-    async for session in get_session():
+async def return_application_to_queue(app_id: int, session: AsyncSession = None):
+    async for session in get_session(session):
         stmt = update(Application).where(Application.id == app_id).values(
             status=ApplicationStatusEnum.QUEUED,
             processed_by_id=None,
             taken_at=None
         )
         await session.execute(stmt)
-        await session.commit()
+        await commit(session)
 
-async def get_current_work_day(employee_id: int):
+async def get_current_work_day(employee_id: int, session: AsyncSession = None):
     """Получить текущий рабочий день сотрудника"""
-    async for session in get_session():
+    async for session in get_session(session):
         today = get_moscow_date()
         today_start = datetime.combine(today, datetime.min.time())
         today_end = datetime.combine(today, datetime.max.time())
@@ -393,9 +403,9 @@ async def get_current_work_day(employee_id: int):
         
         return work_day
 
-async def start_work_day(employee_id: int):
+async def start_work_day(employee_id: int, session: AsyncSession = None):
     """Начать рабочий день"""
-    async for session in get_session():
+    async for session in get_session(session):
         today = get_moscow_date()
         today_start = datetime.combine(today, datetime.min.time())
         today_end = datetime.combine(today, datetime.max.time())
@@ -423,12 +433,12 @@ async def start_work_day(employee_id: int):
             status=WorkDayStatusEnum.ACTIVE
         )
         session.add(work_day)
-        await session.commit()
+        await commit(session)
         return work_day
 
-async def end_work_day(employee_id: int):
+async def end_work_day(employee_id: int, session: AsyncSession = None):
     """Завершить рабочий день"""
-    async for session in get_session():
+    async for session in get_session(session):
         # Получаем рабочий день в текущей сессии
         today = get_moscow_date()
         today_start = datetime.combine(today, datetime.min.time())
@@ -466,12 +476,12 @@ async def end_work_day(employee_id: int):
             total_work_seconds = int((work_day.end_time - work_day.start_time).total_seconds()) - work_day.total_break_time
             work_day.total_work_time = max(0, total_work_seconds)
         
-        await session.commit()
+        await commit(session)
         return work_day
 
-async def start_break(employee_id: int):
+async def start_break(employee_id: int, session: AsyncSession = None):
     """Начать перерыв"""
-    async for session in get_session():
+    async for session in get_session(session):
         # Получаем рабочий день в текущей сессии
         today = get_moscow_date()
         today_start = datetime.combine(today, datetime.min.time())
@@ -517,13 +527,13 @@ async def start_break(employee_id: int):
         
         session.add(work_break)
         
-        await session.commit()
+        await commit(session)
         logger.info(f"[start_break] Новый перерыв: break_id={work_break.id}, work_day_id={work_day.id}, start_time={work_break.start_time}")
         return work_break
 
-async def end_break(employee_id: int):
+async def end_break(employee_id: int, session: AsyncSession = None):
     """Завершить перерыв"""
-    async for session in get_session():
+    async for session in get_session(session):
         # Получаем рабочий день в текущей сессии
         today = get_moscow_date()
         today_start = datetime.combine(today, datetime.min.time())
@@ -563,13 +573,13 @@ async def end_break(employee_id: int):
         work_day.total_break_time += work_break.duration
         work_day.status = WorkDayStatusEnum.ACTIVE
         
-        await session.commit()
+        await commit(session)
         logger.info(f"[end_break] Завершен перерыв: break_id={work_break.id}, work_day_id={work_day.id}, start={work_break.start_time}, end={work_break.end_time}, duration={work_break.duration}")
         return work_break
 
-async def get_active_break(work_day_id: int):
+async def get_active_break(work_day_id: int, session: AsyncSession = None):
     """Получить активный перерыв для рабочего дня"""
-    async for session in get_session():
+    async for session in get_session(session):
         stmt = select(WorkBreak).where(
             WorkBreak.work_day_id == work_day_id,
             WorkBreak.end_time.is_(None)
@@ -582,9 +592,9 @@ async def get_active_break(work_day_id: int):
             logger.info(f"[get_active_break] Нет активного перерыва для work_day_id={work_day_id}")
         return break_obj
 
-async def increment_processed_applications(employee_id: int):
+async def increment_processed_applications(employee_id: int, session: AsyncSession = None):
     """Увеличить счетчик обработанных заявлений"""
-    async for session in get_session():
+    async for session in get_session(session):
         today = get_moscow_date()
         today_start = datetime.combine(today, datetime.min.time())
         today_end = datetime.combine(today, datetime.max.time())
@@ -603,7 +613,7 @@ async def increment_processed_applications(employee_id: int):
         if work_day:
             old_count = work_day.applications_processed
             work_day.applications_processed += 1
-            await session.commit()
+            await commit(session)
             logger.info(f"Счетчик увеличен: {old_count} -> {work_day.applications_processed} для work_day_id={work_day.id}")
             return True
         else:
@@ -616,141 +626,127 @@ async def increment_processed_applications(employee_id: int):
                 applications_processed=1  # Устанавливаем сразу 1
             )
             session.add(work_day)
-            await session.commit()
+            await commit(session)
             logger.info(f"Создан новый рабочий день с счетчиком=1 для employee_id={employee_id}, work_day_id={work_day.id}")
             return True
 
-async def get_work_day_report(employee_id: int, report_date: date = None):
-    """Получить отчет по рабочему дню"""
-    async for session in get_session():
+# Статусы, при которых фиксируется время обработки
+FINAL_STATUSES = [ApplicationStatusEnum.ACCEPTED, ApplicationStatusEnum.REJECTED, ApplicationStatusEnum.PROBLEM]
+
+async def decide_application(app_id: int, employee_id: int, decision: ApplicationStatusEnum, reason: str = None,
+                             field_patches: dict = None, queue_type: str = None, count_processed: bool = True,
+                             session: AsyncSession = None):
+    """
+    Решение по заявлению одним запросом в одной транзакции: смена статуса, дополнительные
+    поля (field_patches) и увеличение счетчика рабочего дня сотрудника (count_processed).
+
+    decision — новый статус; PROBLEM переводит заявление в проблемную очередь, как
+    update_application_status. queue_type — переместить заявление в другую очередь
+    со сбросом взятия в обработку, как update_application_queue_type.
+    Счетчик увеличивается, только если заявление найдено; рабочий день создается при отсутствии.
+    Возвращает обновленное заявление (для логирования) или None.
+    """
+    now = get_moscow_now()
+    values = {
+        "status": decision,
+        "status_reason": reason,
+        "processed_by_id": employee_id,
+        "processed_at": now if decision in FINAL_STATUSES or (queue_type and employee_id) else None
+    }
+    if queue_type:
+        values["queue_type"] = queue_type
+        values["taken_at"] = None
+    elif decision == ApplicationStatusEnum.PROBLEM:
+        values["queue_type"] = case(
+            (Application.queue_type.endswith("_problem", autoescape=True), Application.queue_type),
+            else_=Application.queue_type + "_problem"
+        )
+    for field, value in (field_patches or {}).items():
+        if field not in Application.__table__.c:
+            raise ValueError(f"Неизвестное поле заявления: {field}")
+        values[field] = value
+
+    applications = Application.__table__
+    decided = update(applications).where(applications.c.id == app_id).values(**values).returning(*applications.c).cte("decided")
+    stmt = select(aliased(Application, decided)).execution_options(populate_existing=True)
+
+    if count_processed and employee_id:
+        work_days = WorkDay.__table__
+        today = get_moscow_date()
+        today_work_day = select(work_days.c.id).where(
+            work_days.c.employee_id == employee_id,
+            work_days.c.date >= datetime.combine(today, datetime.min.time()),
+            work_days.c.date <= datetime.combine(today, datetime.max.time())
+        ).order_by(work_days.c.id).limit(1).scalar_subquery()
+        counted = update(work_days).where(
+            work_days.c.id == today_work_day,
+            exists(select(decided.c.id))
+        ).values(
+            applications_processed=func.coalesce(work_days.c.applications_processed, 0) + 1
+        ).returning(work_days.c.id).cte("counted")
+        # Если рабочего дня нет, создаем его сразу со счетчиком 1
+        created = insert(work_days).from_select(
+            ["employee_id", "date", "start_time", "status", "applications_processed"],
+            select(
+                literal(employee_id),
+                literal(now, work_days.c.date.type),
+                literal(now, work_days.c.start_time.type),
+                literal(WorkDayStatusEnum.ACTIVE, work_days.c.status.type),
+                literal(1)
+            ).where(exists(select(decided.c.id)), ~exists(select(counted.c.id)))
+        ).returning(work_days.c.id).cte("created")
+        stmt = stmt.add_cte(counted, created)
+
+    async for session in get_session(session):
+        result = await session.execute(stmt)
+        app = result.scalars().first()
+        await commit(session)
+        logger.info(f"Решение по заявлению: app_id={app_id}, decision={decision.name}, employee_id={employee_id}, found={app is not None}")
+        return app
+
+async def get_work_day_report(employee_id: int, report_date: date = None, session: AsyncSession = None):
+    """Получить отчет по рабочему дню (один запрос, см. db/work_reports.py)"""
+    async for session in get_session(session):
         if not report_date:
             report_date = get_moscow_date()
         
         today_start = datetime.combine(report_date, datetime.min.time())
         today_end = datetime.combine(report_date, datetime.max.time())
         
-        stmt = select(WorkDay).where(
-            WorkDay.employee_id == employee_id,
-            WorkDay.date >= today_start,
-            WorkDay.date <= today_end
-        ).options(selectinload(WorkDay.breaks))
-        result = await session.execute(stmt)
-        work_day = result.scalars().first()
-        
-        if not work_day:
-            return None
-        
-        # Пересчитываем время для активных дней
-        total_work_time = work_day.total_work_time
-        total_break_time = work_day.total_break_time
-        
-        if work_day.status.value in ["active", "paused"] and work_day.start_time and not work_day.end_time:
-            current_time = get_moscow_now()
-            
-            # Проверяем активный перерыв
-            stmt = select(WorkBreak).where(
-                WorkBreak.work_day_id == work_day.id,
-                WorkBreak.end_time.is_(None)
-            )
-            result = await session.execute(stmt)
-            active_break = result.scalars().first()
-            
-            # Добавляем время активного перерыва
-            if active_break and active_break.start_time:
-                total_break_time += int((current_time - active_break.start_time).total_seconds())
-            
-            # Пересчитываем общее время работы
-            elapsed_seconds = int((current_time - work_day.start_time).total_seconds())
-            total_work_time = elapsed_seconds - total_break_time
-        
-        return {
-            "employee_id": work_day.employee_id,
-            "date": work_day.date.date() if work_day.date else None,
-            "start_time": work_day.start_time,
-            "end_time": work_day.end_time,
-            "total_work_time": total_work_time,
-            "total_break_time": total_break_time,
-            "applications_processed": work_day.applications_processed,
-            "status": work_day.status.value,
-            "breaks": [
-                {
-                    "start_time": break_item.start_time,
-                    "end_time": break_item.end_time,
-                    "duration": break_item.duration
-                }
-                for break_item in work_day.breaks
-            ]
-        }
+        result = await session.execute(work_day_report_stmt(today_start, today_end, employee_id).limit(1))
+        row = result.first()
+        return build_work_day_report(row) if row else None
 
-async def get_all_work_days_report(report_date: date = None):
-    """Получить отчет по всем сотрудникам за день"""
-    async for session in get_session():
+async def get_all_work_days_report(report_date: date = None, session: AsyncSession = None):
+    """Получить отчет по всем сотрудникам за день (один запрос, см. db/work_reports.py)"""
+    async for session in get_session(session):
         if not report_date:
             report_date = get_moscow_date()
         
         today_start = datetime.combine(report_date, datetime.min.time())
         today_end = datetime.combine(report_date, datetime.max.time())
         
-        stmt = select(WorkDay).where(
-            WorkDay.date >= today_start,
-            WorkDay.date <= today_end
-        ).options(selectinload(WorkDay.employee), selectinload(WorkDay.breaks))
-        result = await session.execute(stmt)
-        work_days = result.scalars().all()
-        
-        reports = []
-        for work_day in work_days:
-            # Пересчитываем время для активных дней
-            total_work_time = work_day.total_work_time
-            total_break_time = work_day.total_break_time
-            
-            if work_day.status.value in ["active", "paused"] and work_day.start_time and not work_day.end_time:
-                current_time = get_moscow_now()
-                
-                # Проверяем активный перерыв
-                stmt = select(WorkBreak).where(
-                    WorkBreak.work_day_id == work_day.id,
-                    WorkBreak.end_time.is_(None)
-                )
-                result = await session.execute(stmt)
-                active_break = result.scalars().first()
-                
-                # Добавляем время активного перерыва
-                if active_break and active_break.start_time:
-                    total_break_time += int((current_time - active_break.start_time).total_seconds())
-                
-                # Пересчитываем общее время работы
-                elapsed_seconds = int((current_time - work_day.start_time).total_seconds())
-                total_work_time = elapsed_seconds - total_break_time
-            
-            report = {
-                "employee_fio": work_day.employee.fio,
-                "employee_tg_id": work_day.employee.tg_id,
-                "date": work_day.date.date() if work_day.date else None,
-                "start_time": work_day.start_time,
-                "end_time": work_day.end_time,
-                "total_work_time": total_work_time,
-                "total_break_time": total_break_time,
-                "applications_processed": work_day.applications_processed,
-                "status": work_day.status.value,
-                "breaks": [
-                    {
-                        "start_time": break_item.start_time,
-                        "end_time": break_item.end_time,
-                        "duration": break_item.duration
-                    }
-                    for break_item in work_day.breaks
-                ]
-            }
-            reports.append(report)
-        
-        return reports
+        result = await session.execute(work_day_report_stmt(today_start, today_end))
+        return [build_work_day_report(row) for row in result.all()]
 
-async def get_next_epgu_application(employee_id: int = None, bot=None):
+async def get_next_epgu_application(employee_id: int = None, bot=None, session: AsyncSession = None):
     """Получить следующее заявление из очереди ЕПГУ (не отложенное)"""
-    async for session in get_session():
+    async for session in get_session(session):
         # Получаем заявление из очереди ЕПГУ, которое не отложено
         now = get_moscow_now()
+        if employee_id:
+            dispatcher = get_dispatcher()
+            if dispatcher:
+                app = await dispatcher.claim(session, "epgu", employee_id, datetime.now(), postponed_before=now)
+            else:
+                # Сразу блокируем заявление за сотрудником одним UPDATE ... SKIP LOCKED
+                result = await session.execute(
+                    claim_next_application_stmt("epgu", employee_id, datetime.now(), postponed_before=now)
+                )
+                app = result.scalars().first()
+            await commit(session)
+            return app
+        
         stmt = select(Application).where(
             Application.queue_type == "epgu",
             Application.status == ApplicationStatusEnum.QUEUED,
@@ -760,20 +756,11 @@ async def get_next_epgu_application(employee_id: int = None, bot=None):
             Application.submitted_at.asc()
         )
         result = await session.execute(stmt)
-        app = result.scalars().first()
-        
-        if app and employee_id:
-            # Сразу блокируем заявление за сотрудником
-            app.status = ApplicationStatusEnum.IN_PROGRESS
-            app.processed_by_id = employee_id
-            app.taken_at = datetime.now()
-            await session.commit()
-        
-        return app
+        return result.scalars().first()
 
-async def update_application_queue_type(app_id: int, new_queue_type: str, employee_id: int = None, reason: str = None):
+async def update_application_queue_type(app_id: int, new_queue_type: str, employee_id: int = None, reason: str = None, session: AsyncSession = None):
     """Обновить тип очереди заявления (для перемещения между очередями ЕПГУ)"""
-    async for session in get_session():
+    async for session in get_session(session):
         stmt = update(Application).where(Application.id == app_id).values(
             queue_type=new_queue_type,
             status=ApplicationStatusEnum.QUEUED,
@@ -783,11 +770,11 @@ async def update_application_queue_type(app_id: int, new_queue_type: str, employ
             taken_at=None  # Сбрасываем взятие в обработку
         )
         await session.execute(stmt)
-        await session.commit()
+        await commit(session)
 
-async def postpone_application(app_id: int, employee_id: int = None):
+async def postpone_application(app_id: int, employee_id: int = None, session: AsyncSession = None):
     """Отложить заявление на сутки (для 'не дозвонились')"""
-    async for session in get_session():
+    async for session in get_session(session):
         from datetime import timedelta
         postponed_until = get_moscow_now() + timedelta(days=1)
         
@@ -799,128 +786,88 @@ async def postpone_application(app_id: int, employee_id: int = None):
             taken_at=None
         )
         await session.execute(stmt)
-        await session.commit()
+        await commit(session)
 
-async def get_applications_statistics_by_queue(report_date: date = None):
+async def get_applications_statistics_by_queue(report_date: date = None, session: AsyncSession = None):
     """Получить статистику по заявлениям в разных очередях за день"""
-    async for session in get_session():
+    async for session in get_session(session):
         if not report_date:
             report_date = get_moscow_date()
         
         today_start = datetime.combine(report_date, datetime.min.time())
         today_end = datetime.combine(report_date, datetime.max.time())
         
-        # Статистика по обработанным заявлениям (по processed_at)
-        stmt = select(Application.queue_type, Application.processed_by_id).where(
-            Application.processed_at >= today_start,
-            Application.processed_at <= today_end
-        ).options(selectinload(Application.processed_by))
-        result = await session.execute(stmt)
-        processed_apps = result.scalars().all()
-        
-        # Группируем по очередям
-        queue_stats = {}
-        for app in processed_apps:
-            queue_type = app.queue_type
-            if queue_type not in queue_stats:
-                queue_stats[queue_type] = {
-                    'total': 0,
-                    'by_employee': {}
-                }
-            queue_stats[queue_type]['total'] += 1
-            
-            if app.processed_by:
-                emp_fio = app.processed_by.fio or f"ID:{app.processed_by.id}"
-                if emp_fio not in queue_stats[queue_type]['by_employee']:
-                    queue_stats[queue_type]['by_employee'][emp_fio] = 0
-                queue_stats[queue_type]['by_employee'][emp_fio] += 1
-        
-        return queue_stats
+        # Обработанные заявления (по processed_at), сгруппированные по очереди и сотруднику
+        result = await session.execute(processed_by_queue_stmt(today_start, today_end))
+        return build_processed_report(result.all())
 
-async def get_applications_by_fio_and_queue(fio: str, queue_type: str):
-    """Получить заявления по ФИО в определенной очереди"""
-    async for session in get_session():
-        stmt = select(Application).where(
-            Application.fio.ilike(f"%{fio}%"),
-            Application.queue_type == queue_type
-        ).options(selectinload(Application.processed_by)).order_by(Application.is_priority.desc(), Application.submitted_at.asc())
+async def get_applications_by_fio_and_queue(fio: str, queue_type: str, session: AsyncSession = None):
+    """Получить заявления по ФИО в определенной очереди (подстрока, см. db/search.py)"""
+    if not is_searchable(fio):
+        return []
+    async for session in get_session(session):
+        stmt = search_applications_stmt(fio, queue_type).options(
+            selectinload(Application.processed_by)
+        ).order_by(Application.is_priority.desc(), Application.submitted_at.asc())
         result = await session.execute(stmt)
         apps = result.scalars().all()
         
         # Возвращаем ORM объекты с загруженными связанными данными
         return apps
 
-async def get_queue_statistics(queue_type: str):
-    """Получить статистику по очереди"""
-    async for session in get_session():
-        from sqlalchemy import func
-        
-        # Подсчитываем заявления по статусам
-        queued_count = await session.execute(
-            select(func.count(Application.id)).where(
-                Application.queue_type == queue_type,
-                Application.status == ApplicationStatusEnum.QUEUED
-            )
-        )
-        queued_count = queued_count.scalar()
-        
-        in_progress_count = await session.execute(
-            select(func.count(Application.id)).where(
-                Application.queue_type == queue_type,
-                Application.status == ApplicationStatusEnum.IN_PROGRESS
-            )
-        )
-        in_progress_count = in_progress_count.scalar()
-        
-        accepted_count = await session.execute(
-            select(func.count(Application.id)).where(
-                Application.queue_type == queue_type,
-                Application.status == ApplicationStatusEnum.ACCEPTED
-            )
-        )
-        accepted_count = accepted_count.scalar()
-        
-        rejected_count = await session.execute(
-            select(func.count(Application.id)).where(
-                Application.queue_type == queue_type,
-                Application.status == ApplicationStatusEnum.REJECTED
-            )
-        )
-        rejected_count = rejected_count.scalar()
-        
-        problem_count = await session.execute(
-            select(func.count(Application.id)).where(
-                Application.queue_type == queue_type,
-                Application.status == ApplicationStatusEnum.PROBLEM
-            )
-        )
-        problem_count = problem_count.scalar()
-        
+async def get_queue_statistics(queue_type: str, session: AsyncSession = None):
+    """Получить статистику по очереди (из общего снимка статистики, см. db/statistics.py)"""
+    async for session in get_session(session):
+        snapshot = await get_statistics_snapshot(session)
+        stats = snapshot.queue(queue_type)
         return {
-            'queued': queued_count,
-            'in_progress': in_progress_count,
-            'accepted': accepted_count,
-            'rejected': rejected_count,
-            'problem': problem_count
+            'queued': stats.queued,
+            'in_progress': stats.in_progress,
+            'accepted': stats.accepted,
+            'rejected': stats.rejected,
+            'problem': stats.problem
         }
 
-async def get_problem_applications(queue_type: str):
+async def get_statistics(session: AsyncSession = None):
+    """Снимок статистики по всем очередям и статусам"""
+    async for session in get_session(session):
+        return await get_statistics_snapshot(session)
+
+async def reconcile_queue_counters():
+    """
+    Сверить счетчики queue_counters с таблицей applications и свернуть журнал приращений.
+    Возвращает список расхождений (queue_type, status, counted, actual) до сверки
+    """
     async for session in get_session():
+        # Один снимок для сверки, удаления журнала и пересчета
+        await session.connection(execution_options={"isolation_level": "REPEATABLE READ"})
+        result = await session.execute(text(RECONCILE_DRIFT_SQL))
+        drift = result.all()
+        await session.execute(text(RECONCILE_DELETE_SQL))
+        await session.execute(text(RECONCILE_INSERT_SQL))
+        await session.commit()
+        if drift:
+            invalidate_statistics()
+            logger.warning(f"Счетчики очередей исправлены: {[tuple(row) for row in drift]}")
+        return drift
+
+async def get_problem_applications(queue_type: str, session: AsyncSession = None):
+    async for session in get_session(session):
         stmt = select(Application).where(
             Application.queue_type == f"{queue_type}_problem"
         ).options(selectinload(Application.processed_by)).order_by(Application.submitted_at.asc())
         result = await session.execute(stmt)
         return result.scalars().all()
 
-async def get_application_by_id(app_id: int):
+async def get_application_by_id(app_id: int, session: AsyncSession = None):
     """Получить заявление по ID"""
-    async for session in get_session():
+    async for session in get_session(session):
         stmt = select(Application).where(Application.id == app_id).options(selectinload(Application.processed_by))
         result = await session.execute(stmt)
         return result.scalars().first()
 
-async def update_problem_status(app_id: int, status: str, comment: str = None, responsible: str = None):
-    async for session in get_session():
+async def update_problem_status(app_id: int, status: str, comment: str = None, responsible: str = None, session: AsyncSession = None):
+    async for session in get_session(session):
         stmt = select(Application).where(Application.id == app_id)
         result = await session.execute(stmt)
         app = result.scalars().first()
@@ -943,36 +890,74 @@ async def update_problem_status(app_id: int, status: str, comment: str = None, r
                 app.problem_responsible = responsible
         else:
             app.problem_status = ProblemStatusEnum.NEW
-        await session.commit()
+        await commit(session)
         return app
 
-async def search_applications_by_fio(fio: str):
-    """Поиск заявлений по ФИО во всех очередях"""
-    async for session in get_session():
-        stmt = select(Application).where(
-            Application.fio.ilike(f"%{fio}%")
-        ).options(selectinload(Application.processed_by)).order_by(Application.submitted_at.desc())
+async def search_applications(query: str, queue_types=None, statuses=None, limit: int = None, cursor: tuple = None,
+                              by_email: bool = False, backward: bool = False, session: AsyncSession = None):
+    """
+    Поиск заявлений по подстроке ФИО (или email) сразу в нескольких очередях одним
+    запросом (см. search_applications_page_stmt). queue_types/statuses — None для
+    всех; cursor — search_cursor последнего заявления предыдущей страницы (при
+    backward — первого заявления следующей). Результат всегда в прямом порядке
+    """
+    if not is_searchable(query):
+        return []
+    async for session in get_session(session):
+        stmt = search_applications_page_stmt(
+            query, queue_types, statuses, limit=limit, cursor=cursor, by_email=by_email, backward=backward
+        ).options(selectinload(Application.processed_by))
         result = await session.execute(stmt)
-        return result.scalars().all()
+        apps = list(result.scalars().all())
+        if backward:
+            apps.reverse()
+        return apps
+
+async def search_applications_page(query: str, queue_types=None, cursor: tuple = None, backward: bool = False,
+                                   page_size: int = SEARCH_PAGE_SIZE, session: AsyncSession = None):
+    """
+    Страница результатов поиска одним запросом (page_size + 1 строка — для
+    признака следующей страницы). Возвращает (заявления, есть_предыдущая, есть_следующая)
+    """
+    apps = await search_applications(
+        query, queue_types, limit=page_size + 1, cursor=cursor, backward=backward, session=session
+    )
+    has_more = len(apps) > page_size
+    if backward:
+        # Лишняя строка — в начале: она относится к еще более ранней странице
+        apps = apps[-page_size:] if has_more else apps
+        return apps, has_more, cursor is not None
+    return apps[:page_size], cursor is not None, has_more
 
-async def update_application_field(app_id: int, field: str, value):
+async def update_application_field(app_id: int, field: str, value, session: AsyncSession = None):
     """Обновить любое поле заявления"""
-    async for session in get_session():
+    async for session in get_session(session):
         stmt = select(Application).where(Application.id == app_id)
         result = await session.execute(stmt)
         app = result.scalars().first()
         if not app:
             return False
         
-        if hasattr(app, field):
-            setattr(app, field, value)
-            await session.commit()
-            return True
-        return False
+        if not hasattr(app, field):
+            return False
+        try:
+            # Точка сохранения: нарушение ограничения не откатывает остальную единицу работы
+            async with session.begin_nested():
+                setattr(app, field, value)
+        except IntegrityError:
+            # Например, в очереди ЕПГУ уже есть заявление с теми же ФИО и датой подачи
+            return False
+        await commit(session)
+        return True
+
+async def get_epgu_duplicate_id(app_id: int, session: AsyncSession = None):
+    """id заявления ЕПГУ с теми же ФИО и датой подачи, что у app_id, или None"""
+    async for session in get_session(session):
+        return await session.scalar(epgu_duplicate_stmt(app_id))
 
-async def delete_application(app_id: int):
+async def delete_application(app_id: int, session: AsyncSession = None):
     """Удалить заявление"""
-    async for session in get_session():
+    async for session in get_session(session):
         stmt = select(Application).where(Application.id == app_id)
         result = await session.execute(stmt)
         app = result.scalars().first()
@@ -980,38 +965,42 @@ async def delete_application(app_id: int):
             return False
         
         await session.delete(app)
-        await session.commit()
+        for stmt in reset_manifest_stmts():
+            await session.execute(stmt)
+        await commit(session)
+        invalidate_statistics()
         return True
 
-async def get_all_employees():
+async def get_all_employees(session: AsyncSession = None):
     """Получить всех сотрудников для назначения ответственных"""
-    async for session in get_session():
+    async for session in get_session(session):
         stmt = select(Employee).order_by(Employee.fio)
         result = await session.execute(stmt)
         return result.scalars().all()
 
-async def update_employee_fio(tg_id: str, new_fio: str):
+async def update_employee_fio(tg_id: str, new_fio: str, session: AsyncSession = None):
     """Обновить ФИО сотрудника"""
-    async for session in get_session():
+    async for session in get_session(session):
         stmt = select(Employee).where(Employee.tg_id == tg_id)
         result = await session.execute(stmt)
         emp = result.scalars().first()
         if emp:
             emp.fio = new_fio
-            await session.commit()
+            await commit(session)
+            invalidate_employee(tg_id, session)
             return True
         return False
 
-async def get_employee_by_id(employee_id: int):
+async def get_employee_by_id(employee_id: int, session: AsyncSession = None):
     """Получить сотрудника по ID"""
-    async for session in get_session():
+    async for session in get_session(session):
         stmt = select(Employee).where(Employee.id == employee_id)
         result = await session.execute(stmt)
         return result.scalars().first()
 
-async def admin_start_work_day(employee_id: int):
+async def admin_start_work_day(employee_id: int, session: AsyncSession = None):
     """Админское начало рабочего дня для сотрудника"""
-    async for session in get_session():
+    async for session in get_session(session):
         # Проверяем, есть ли уже активный рабочий день
         current_date = get_moscow_date()
         stmt = select(WorkDay).where(
@@ -1033,12 +1022,12 @@ async def admin_start_work_day(employee_id: int):
             status="active"
         )
         session.add(work_day)
-        await session.commit()
+        await commit(session)
         return work_day, "Рабочий день успешно начат"
 
-async def admin_end_work_day(employee_id: int):
+async def admin_end_work_day(employee_id: int, session: AsyncSession = None):
     """Админское завершение рабочего дня для сотрудника"""
-    async for session in get_session():
+    async for session in get_session(session):
         # Находим активный рабочий день
         current_date = get_moscow_date()
         stmt = select(WorkDay).where(
@@ -1061,7 +1050,7 @@ async def admin_end_work_day(employee_id: int):
             work_time = work_day.end_time - work_day.start_time
             work_day.total_work_time = work_time.total_seconds() / 3600  # в часах
         
-        await session.commit()
+        await commit(session)
         return work_day, "Рабочий день успешно завершен"
 
 async def clear_work_time_data():
@@ -1094,23 +1083,23 @@ async def clear_work_time_data():
                 "message": f"Ошибка при очистке: {str(e)}"
             }
 
-async def escalate_application(app_id: int):
+async def escalate_application(app_id: int, session: AsyncSession = None):
     """Выставить приоритет заявлению по app_id"""
-    async for session in get_session():
+    async for session in get_session(session):
         stmt = select(Application).where(Application.id == app_id)
         result = await session.execute(stmt)
         app = result.scalars().first()
         if app:
             app.is_priority = True
-            await session.commit()
+            await commit(session)
             return True
         return False
 
-async def get_overdue_mail_applications(days_threshold: int = 3):
+async def get_overdue_mail_applications(days_threshold: int = 3, session: AsyncSession = None):
     """
     Получить заявления в очереди почты, которые ждут ответа более указанного количества дней
     """
-    async for session in get_session():
+    async for session in get_session(session):
         from datetime import timedelta
         threshold_date = get_moscow_now() - timedelta(days=days_threshold)
         
@@ -1270,267 +1259,249 @@ async def manual_cleanup_expired_applications(bot=None):
     
     return expired_apps
 
-async def import_1c_applications_from_excel(file_path, progress_callback=None):
+async def notify_overdue_mail_applications(bot=None, days_threshold: int = 3):
+    """Напомнить в админ-чат о заявлениях почты, ожидающих ответа дольше days_threshold дней"""
+    overdue_apps = await get_overdue_mail_applications(days_threshold)
+    if overdue_apps and bot:
+        from config import ADMIN_CHAT_ID
+        if ADMIN_CHAT_ID:
+            await bot.send_message(
+                ADMIN_CHAT_ID,
+                f"📮 В очереди почты {len(overdue_apps)} заявлений ждут ответа более {days_threshold} дней.\n"
+                f"Выгрузка: админ-панель → «📮 Экспорт просроченных заявлений почты»"
+            )
+    return len(overdue_apps)
+
+async def import_1c_applications_from_excel(file_path, progress_callback=None, cancel_key=None):
     """
-    Импорт заявлений из выгрузки 1С с проверкой изменений
+    Импорт заявлений из выгрузки 1С с проверкой изменений.
+    Строки, не изменившиеся с прошлых загрузок, пропускаются по отпечаткам (манифест
+    загрузок), остальные загружаются во временную таблицу и сопоставляются с базой
+    несколькими операторами над множествами (db.imports), а не запросом на строку
     """
-    from utils.excel import parse_1c_applications_from_excel
-    from sqlalchemy.future import select
-    # Собираем все ФИО из всех очередей
-    existing_fios_by_queue = {}
-    async for session in get_session():
-        for queue in ["lk_problem", "epgu_mail", "epgu_problem", "epgu", "lk"]:
-            result = await session.execute(
-                select(Application.fio).where(Application.queue_type == queue)
-            )
-            existing_fios_by_queue[queue] = set(fio for (fio,) in result.fetchall())
-        break  # только один раз, не для каждой сессии
-    # Парсим файл с callback для обновления прогресса и фильтрацией по ФИО
-    parsed_data = await parse_1c_applications_from_excel(file_path, progress_callback, existing_fios_by_queue)
+    from utils.excel import parse_1c_applications_from_excel, file_sha256
     logger = logging.getLogger("1c_import")
+    progress = as_reporter(progress_callback)
+    # Хеш — чтение файла без разбора: в потоке, процесс пула не нужен
+    file_hash = await run_in_worker(run_parser, file_sha256, file_path, cancel_key=cancel_key, offload=False)
+    async for session in get_session():
+        last_hash = (await session.execute(last_upload_hash_stmt(IMPORT_SOURCE_1C))).scalar()
+    if last_hash == file_hash:
+        # Тот же файл, что и в прошлый раз: разбирать и сравнивать нечего
+        logger.info("Импорт заявлений из 1С: файл не изменился с прошлой загрузки")
+        progress.report("⏭ Файл не изменился с прошлой загрузки — изменений нет")
+        await progress.flush()
+        results = {queue_type: {'added': 0, 'updated': 0, 'skipped': 0, 'total': 0} for queue_type in STAGED_QUEUES}
+        results['manifest'] = {'unchanged': 0, 'total': 0, 'same_file': True}
+        return results
+
+    # ФИО, уже стоящие в очередях, отсекаются в базе (drop_known_fios_stmt)
+    parsed_data = await parse_1c_applications_from_excel(file_path, progress, cancel_key=cancel_key)
+    fingerprints = [app['fingerprint'] for queue_type in STAGED_QUEUES for app in parsed_data.get(queue_type, [])]
+    async for session in get_session():
+        known = set((await session.execute(known_fingerprints_stmt(IMPORT_SOURCE_1C, fingerprints))).scalars().all())
+    unchanged = 0
+    for queue_type in STAGED_QUEUES:
+        delta = [app for app in parsed_data.get(queue_type, []) if app['fingerprint'] not in known]
+        unchanged += len(parsed_data.get(queue_type, [])) - len(delta)
+        parsed_data[queue_type] = delta
+    skip_rate = unchanged / len(fingerprints) * 100 if fingerprints else 0
+    logger.info(f"Импорт заявлений из 1С: без изменений {unchanged} из {len(fingerprints)} строк ({skip_rate:.0f}%)")
     logger.info(f"Импорт заявлений из 1С: ЛК={len(parsed_data['lk'])}, ЕПГУ={len(parsed_data['epgu'])}, UNKNOWN={len(parsed_data.get('unknown', []))}")
     
     # Отправляем информацию о начале работы с БД
-    if progress_callback:
-        try:
-            await progress_callback(f"💾 Начинаю работу с базой данных...\nЛК: {len(parsed_data['lk'])} заявлений\nЕПГУ: {len(parsed_data['epgu'])}\nНеизвестный способ: {len(parsed_data.get('unknown', []))}")
-        except:
-            pass
+    progress.report(f"⏭ Без изменений с прошлых загрузок: {unchanged} из {len(fingerprints)} ({skip_rate:.0f}%)\n💾 Начинаю работу с базой данных...\nЛК: {len(parsed_data['lk'])} заявлений\nЕПГУ: {len(parsed_data['epgu'])}\nНеизвестный способ: {len(parsed_data.get('unknown', []))}")
     
     results = {}
+    rows = staging_rows(parsed_data)
     
-    async for session in get_session():
-        # Обрабатываем ЛК заявления
-        lk_added = 0
-        lk_updated = 0
-        lk_skipped = 0
-        lk_processed = 0
-        for app in parsed_data['lk']:
-            lk_processed += 1
-            if lk_processed % 250 == 0 and progress_callback:
-                try:
-                    await progress_callback(f"💾 Обрабатываю ЛК заявления: {lk_processed}/{len(parsed_data['lk'])}")
-                except:
-                    pass
-            existing = await session.execute(
-                select(Application).where(
-                    Application.fio == app['fio'],
-                    Application.queue_type == 'lk'
-                )
-            )
-            existing_app = existing.scalars().first()
-            if existing_app:
-                if existing_app.status.value != app['status'] or existing_app.is_priority != app['is_priority']:
-                    existing_app.status = ApplicationStatusEnum(app['status'])
-                    existing_app.is_priority = app['is_priority']
-                    if app['status_reason']:
-                        existing_app.status_reason = app['status_reason']
-                    if app['status'] in ['accepted', 'rejected']:
-                        existing_app.processed_at = get_moscow_now()
-                    lk_updated += 1
-                    logger.info(f"Обновлено ЛК заявление: {app['fio']} - {app['status']}")
-                else:
-                    lk_skipped += 1
-            else:
-                new_app = Application(
-                    fio=app['fio'],
-                    submitted_at=app['submitted_at'],
-                    queue_type='lk',
-                    status=ApplicationStatusEnum(app['status']),
-                    is_priority=app['is_priority'],
-                    status_reason=app['status_reason']
-                )
-                if app['status'] in ['accepted', 'rejected']:
-                    new_app.processed_at = get_moscow_now()
-                session.add(new_app)
-                lk_added += 1
-                logger.info(f"Добавлено ЛК заявление: {app['fio']} - {app['status']}")
-        # Обрабатываем ЕПГУ заявления
-        epgu_added = 0
-        epgu_updated = 0
-        epgu_skipped = 0
-        if progress_callback:
-            try:
-                await progress_callback(f"✅ ЛК заявления обработаны\n💾 Начинаю обработку ЕПГУ заявлений...")
-            except:
-                pass
-        epgu_processed = 0
-        for app in parsed_data['epgu']:
-            epgu_processed += 1
-            if epgu_processed % 250 == 0 and progress_callback:
-                try:
-                    await progress_callback(f"💾 Обрабатываю ЕПГУ заявления: {epgu_processed}/{len(parsed_data['epgu'])}")
-                except:
-                    pass
-            existing = await session.execute(
-                select(Application).where(
-                    Application.fio == app['fio'],
-                    Application.submitted_at == app['submitted_at'],
-                    Application.queue_type == 'epgu'
-                )
+    with cancellation(cancel_key) as cancel:
+        async for session in get_session():
+            # Временная таблица удаляется при коммите (ON COMMIT DROP)
+            await session.execute(CreateTable(staging_1c))
+            for batch in batches(rows):
+                # Отмена до коммита откатывает всю загрузку
+                cancel.check()
+                await session.execute(insert(staging_1c), batch)
+            await session.execute(drop_known_fios_stmt())
+            totals = {queue_type: total for queue_type, total, _ in await session.execute(staged_totals_stmt())}
+            duplicates = Counter((await session.execute(drop_duplicates_stmt())).scalars().all())
+            for queue_type in STAGED_QUEUES:
+                await session.execute(mark_matched_stmt(queue_type))
+            matched = {queue_type: n for queue_type, _, n in await session.execute(staged_totals_stmt())}
+            progress.report(f"💾 Строки выгрузки загружены: {sum(totals.values())}\n💾 Обновляю и добавляю заявления...")
+            now = get_moscow_now()
+            for queue_type in STAGED_QUEUES:
+                cancel.check()
+                updated = len((await session.execute(update_matched_stmt(queue_type, now))).scalars().all())
+                results[queue_type] = {
+                    'added': 0,
+                    'updated': updated,
+                    'skipped': duplicates[queue_type] + matched.get(queue_type, 0) - updated,
+                    'total': totals.get(queue_type, 0)
+                }
+            for queue_type in (await session.execute(insert_unmatched_stmt(now))).scalars().all():
+                results[queue_type]['added'] += 1
+            # Манифест: загрузка и отпечатки примененных строк — в той же транзакции
+            upload = ImportUpload(
+                source=IMPORT_SOURCE_1C,
+                file_hash=file_hash,
+                uploaded_at=now,
+                total_rows=len(fingerprints),
+                changed_rows=len(rows)
             )
-            existing_app = existing.scalars().first()
-            if existing_app:
-                if existing_app.status.value != app['status']:
-                    existing_app.status = ApplicationStatusEnum(app['status'])
-                    if app['status_reason']:
-                        existing_app.status_reason = app['status_reason']
-                    if app['status'] in ['accepted', 'rejected']:
-                        existing_app.processed_at = get_moscow_now()
-                    epgu_updated += 1
-                    logger.info(f"Обновлено ЕПГУ заявление: {app['fio']} - {app['status']}")
-                else:
-                    epgu_skipped += 1
-            else:
-                new_app = Application(
-                    fio=app['fio'],
-                    submitted_at=app['submitted_at'],
-                    queue_type='epgu',
-                    status=ApplicationStatusEnum(app['status']),
-                    is_priority=app['is_priority'],
-                    status_reason=app['status_reason']
-                )
-                if app['status'] in ['accepted', 'rejected']:
-                    new_app.processed_at = get_moscow_now()
-                session.add(new_app)
-                epgu_added += 1
-                logger.info(f"Добавлено ЕПГУ заявление: {app['fio']} - {app['status']}")
-        # Обрабатываем UNKNOWN заявления
-        unknown_added = 0
-        unknown_updated = 0
-        unknown_skipped = 0
-        unknown_list = parsed_data.get('unknown', [])
-        if unknown_list:
-            if progress_callback:
-                try:
-                    await progress_callback(f"✅ ЕПГУ заявления обработаны\n💾 Начинаю обработку заявлений с неизвестным способом подачи...")
-                except:
-                    pass
-            unknown_processed = 0
-            for app in unknown_list:
-                unknown_processed += 1
-                if unknown_processed % 250 == 0 and progress_callback:
-                    try:
-                        await progress_callback(f"💾 Обрабатываю unknown заявления: {unknown_processed}/{len(unknown_list)}")
-                    except:
-                        pass
-                existing = await session.execute(
-                    select(Application).where(
-                        Application.fio == app['fio'],
-                        Application.submitted_at == app['submitted_at'],
-                        Application.queue_type == 'unknown'
-                    )
-                )
-                existing_app = existing.scalars().first()
-                if existing_app:
-                    # Для unknown обновляем только статус_reason
-                    if existing_app.status.value != app['status'] or existing_app.status_reason != app['status_reason']:
-                        existing_app.status = ApplicationStatusEnum(app['status'])
-                        existing_app.status_reason = app['status_reason']
-                        unknown_updated += 1
-                        logger.info(f"Обновлено unknown заявление: {app['fio']} - {app['status']}")
-                    else:
-                        unknown_skipped += 1
-                else:
-                    new_app = Application(
-                        fio=app['fio'],
-                        submitted_at=app['submitted_at'],
-                        queue_type='unknown',
-                        status=ApplicationStatusEnum(app['status']),
-                        is_priority=app['is_priority'],
-                        status_reason=app['status_reason']
-                    )
-                    session.add(new_app)
-                    unknown_added += 1
-                    logger.info(f"Добавлено unknown заявление: {app['fio']} - {app['status']}")
-        await session.commit()
-        if progress_callback:
-            try:
-                await progress_callback(f"✅ Работа с базой данных завершена\n💾 Сохраняю изменения...")
-            except:
-                pass
-        results = {
-            'lk': {
-                'added': lk_added,
-                'updated': lk_updated,
-                'skipped': lk_skipped,
-                'total': len(parsed_data['lk'])
-            },
-            'epgu': {
-                'added': epgu_added,
-                'updated': epgu_updated,
-                'skipped': epgu_skipped,
-                'total': len(parsed_data['epgu'])
-            },
-            'unknown': {
-                'added': unknown_added,
-                'updated': unknown_updated,
-                'skipped': unknown_skipped,
-                'total': len(unknown_list)
-            }
-        }
-        logger.info(f"Импорт завершен: ЛК добавлено={lk_added}, обновлено={lk_updated}, пропущено={lk_skipped}")
-        logger.info(f"Импорт завершен: ЕПГУ добавлено={epgu_added}, обновлено={epgu_updated}, пропущено={epgu_skipped}")
-        logger.info(f"Импорт завершен: UNKNOWN добавлено={unknown_added}, обновлено={unknown_updated}, пропущено={unknown_skipped}")
+            session.add(upload)
+            await session.flush()
+            changed = [app['fingerprint'] for queue_type in STAGED_QUEUES for app in parsed_data.get(queue_type, [])]
+            for batch in batches(changed):
+                await session.execute(record_fingerprints_stmt(IMPORT_SOURCE_1C, batch, upload.id))
+            cancel.check()
+            await session.commit()
+            invalidate_statistics()
+            results['manifest'] = {'unchanged': unchanged, 'total': len(fingerprints), 'same_file': False}
+            progress.report(f"✅ Работа с базой данных завершена\n💾 Сохраняю изменения...")
+            await progress.flush()
+            for queue_type, name in [('lk', 'ЛК'), ('epgu', 'ЕПГУ'), ('unknown', 'UNKNOWN')]:
+                r = results[queue_type]
+                logger.info(f"Импорт завершен: {name} добавлено={r['added']}, обновлено={r['updated']}, пропущено={r['skipped']}")
     return results 
 
-async def import_epgu_mail_applications_from_excel(file_path, employee_name: str, progress_callback=None):
-    from db.models import Application, ApplicationStatusEnum
-    from sqlalchemy.future import select
-    from db.session import get_session
-    import datetime
+async def import_epgu_mail_applications_from_excel(file_path, employee_name: str, progress_callback=None, cancel_key=None):
+    """
+    Импорт очереди ЕПГУ (почта): заявления ЕПГУ с email из файла переносятся в epgu_mail,
+    для остальных email создаются новые заявления. Один UPDATE и пакетные INSERT в одной
+    транзакции; в лог — одно сообщение с итогами и файлом подробностей
+    """
     logger = get_logger()
-    data = parse_epgu_mail_applications_from_excel(file_path)
-    added = 0
-    moved = 0
-    skipped = 0
-    async for session in get_session():
-        for item in data:
-            fio = item.get("fio")
-            email = item.get("email")
-            if not email:
-                skipped += 1
-                continue
-            # Найти заявление в epgu с этим email
-            result = await session.execute(
-                select(Application).where(
-                    Application.queue_type == "epgu",
-                    Application.email == email
-                )
-            )
-            app = result.scalars().first()
-            if app:
-                app.queue_type = "epgu_mail"
-                await session.commit()
-                moved += 1
-                if logger:
-                    await logger.log_epgu_mail_queue(employee_name, app.id, app.fio, "Перенос из epgu по email")
-                continue
-            # Если не найдено — создать новое
-            new_app = Application(
-                fio=fio,
-                email=email,
-                submitted_at=datetime.datetime.now(),
-                queue_type="epgu_mail",
-                status=ApplicationStatusEnum.QUEUED
-            )
-            session.add(new_app)
+    progress = as_reporter(progress_callback)
+    data = await run_in_worker(
+        run_parser, parse_epgu_mail_applications_from_excel, file_path,
+        cancel_key=cancel_key, offload=should_offload(file_path)
+    )
+    # Строки без email и повторы email в файле (после нормализации) пропускаются
+    rows = {}
+    for item in data:
+        if item.get("email") and normalize_email(item["email"]):
+            rows.setdefault(normalize_email(item["email"]), item)
+    skipped = len(data) - len(rows)
+    with cancellation(cancel_key) as cancel:
+        async for session in get_session():
+            moved_apps = (await session.execute(move_epgu_to_mail_stmt(rows))).all() if rows else []
+            moved_emails = {app.email_norm for app in moved_apps}
+            new_rows = [item for email, item in rows.items() if email not in moved_emails]
+            added_apps = []
+            now = datetime.now()
+            for batch in batches(new_rows):
+                # Отмена до коммита откатывает и перенос, и добавление
+                cancel.check()
+                added_apps.extend((await session.execute(insert_mail_applications_stmt(batch, now))).all())
+            cancel.check()
             await session.commit()
-            added += 1
-            if logger:
-                await logger.log_epgu_mail_queue(employee_name, new_app.id, fio, "Создано новое по email")
-        if progress_callback:
-            try:
-                await progress_callback(f"Добавлено новых: {added}, перенесено: {moved}, пропущено: {skipped}")
-            except:
-                pass
+            invalidate_statistics()
+    added, moved = len(added_apps), len(moved_apps)
+    progress.report(f"Добавлено новых: {added}, перенесено: {moved}, пропущено: {skipped}")
+    await progress.flush()
+    if logger and (added or moved):
+        details = [(app.id, app.fio, app.email, "Перенос из epgu по email") for app in moved_apps]
+        details += [(app.id, app.fio, app.email, "Создано новое по email") for app in added_apps]
+        await logger.log_epgu_mail_import(employee_name, added, moved, skipped, details)
     return {"added": added, "moved": moved, "skipped": skipped, "total": len(data)} 
 
-async def get_applications_by_email_and_queue(email: str, queue_type: str):
-    async for session in get_session():
-        stmt = select(Application).where(
-            Application.email.ilike(f"%{email}%"),
-            Application.queue_type == queue_type
-        ).options(selectinload(Application.processed_by)).order_by(Application.is_priority.desc(), Application.submitted_at.asc())
+async def enqueue_import_job(kind: str, file_path: str, file_name: str, created_by: str, employee_name: str = None,
+                             chat_id: int = None, message_id: int = None, session: AsyncSession = None):
+    """Поставить файл в очередь фонового импорта (выполняет utils.import_jobs)"""
+    async for session in get_session(session):
+        job = ImportJob(
+            kind=kind,
+            file_path=file_path,
+            file_name=file_name,
+            status=ImportJobStatusEnum.QUEUED,
+            created_by=created_by,
+            employee_name=employee_name,
+            chat_id=chat_id,
+            message_id=message_id,
+            created_at=get_moscow_now()
+        )
+        session.add(job)
+        await commit(session)
+        return job
+
+async def get_import_jobs(limit: int = 10, session: AsyncSession = None):
+    """Последние задания импорта, новые первыми"""
+    async for session in get_session(session):
+        result = await session.execute(select(ImportJob).order_by(ImportJob.id.desc()).limit(limit))
+        return result.scalars().all()
+
+async def get_queued_import_jobs(session: AsyncSession = None):
+    """Ожидающие задания импорта в порядке постановки"""
+    async for session in get_session(session):
+        result = await session.execute(
+            select(ImportJob).where(ImportJob.status == ImportJobStatusEnum.QUEUED).order_by(ImportJob.id)
+        )
+        return result.scalars().all()
+
+async def start_import_job(job_id: int, session: AsyncSession = None):
+    """Перевести задание в RUNNING, если оно еще ожидает. Возвращает задание или None"""
+    async for session in get_session(session):
+        result = await session.execute(
+            update(ImportJob).where(
+                ImportJob.id == job_id,
+                ImportJob.status == ImportJobStatusEnum.QUEUED
+            ).values(
+                status=ImportJobStatusEnum.RUNNING,
+                started_at=get_moscow_now()
+            ).returning(ImportJob).execution_options(synchronize_session=False)
+        )
+        job = result.scalars().first()
+        await commit(session)
+        return job
+
+async def update_import_job(job_id: int, session: AsyncSession = None, **values):
+    """Записать прогресс или итог задания импорта"""
+    async for session in get_session(session):
+        await session.execute(update(ImportJob).where(ImportJob.id == job_id).values(**values))
+        await commit(session)
+
+async def requeue_interrupted_import_jobs(session: AsyncSession = None):
+    """Вернуть в очередь задания, прерванные остановкой бота. Возвращает их число"""
+    async for session in get_session(session):
+        result = await session.execute(
+            update(ImportJob).where(ImportJob.status == ImportJobStatusEnum.RUNNING).values(
+                status=ImportJobStatusEnum.QUEUED,
+                started_at=None,
+                progress="Прервано перезапуском бота, задание будет выполнено заново"
+            ).returning(ImportJob.id)
+        )
+        count = len(result.scalars().all())
+        await commit(session)
+        return count
+
+async def cancel_queued_import_job(job_id: int, session: AsyncSession = None) -> bool:
+    """Отменить задание импорта, если оно еще не начато. Возвращает True, если отменено"""
+    async for session in get_session(session):
+        result = await session.execute(
+            update(ImportJob).where(
+                ImportJob.id == job_id,
+                ImportJob.status == ImportJobStatusEnum.QUEUED
+            ).values(
+                status=ImportJobStatusEnum.CANCELLED,
+                finished_at=get_moscow_now()
+            ).returning(ImportJob.file_path)
+        )
+        file_path = result.scalars().first()
+        await commit(session)
+        if file_path is None:
+            return False
+        if os.path.exists(file_path):
+            os.unlink(file_path)
+        return True
+
+async def get_applications_by_email_and_queue(email: str, queue_type: str, session: AsyncSession = None):
+    if not is_searchable(email):
+        return []
+    async for session in get_session(session):
+        stmt = search_applications_stmt(email, queue_type, by_email=True).options(
+            selectinload(Application.processed_by)
+        ).order_by(Application.is_priority.desc(), Application.submitted_at.asc())
         result = await session.execute(stmt)
         return result.scalars().all() 
\ No newline at end of file
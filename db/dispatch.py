@@ -0,0 +1,72 @@
+from sqlalchemy import select, update
+from .models import Application, ApplicationStatusEnum
+
+
+def next_application_candidate_stmt(queue_type: str, postponed_before=None):
+    """
+    SELECT id следующего заявления в порядке выдачи (приоритет, дата подачи)
+    с FOR UPDATE SKIP LOCKED. Этот запрос покрывается индексом ix_applications_dispatch.
+    postponed_before: для ЕПГУ — не выдавать заявления, отложенные позже этого момента
+    """
+    stmt = select(Application.id).where(
+        Application.queue_type == queue_type,
+        Application.status == ApplicationStatusEnum.QUEUED
+    )
+    if postponed_before is not None:
+        stmt = stmt.where(
+            Application.postponed_until.is_(None) | (Application.postponed_until <= postponed_before)
+        )
+    return stmt.order_by(
+        Application.is_priority.desc(),
+        Application.submitted_at.asc()
+    ).limit(1).with_for_update(skip_locked=True)
+
+
+def claim_next_application_stmt(queue_type: str, employee_id: int, taken_at, postponed_before=None):
+    """
+    Атомарно взять следующее заявление из очереди одним оператором:
+    UPDATE ... WHERE id = (SELECT ... FOR UPDATE SKIP LOCKED LIMIT 1) RETURNING ...
+
+    Строки, заблокированные параллельными операторами, пропускаются, поэтому
+    два сотрудника никогда не получат одно и то же заявление.
+    Используется и ботом (async), и веб-интерфейсом (sync).
+    """
+    candidate = next_application_candidate_stmt(queue_type, postponed_before).scalar_subquery()
+
+    return update(Application).where(
+        Application.id == candidate,
+        Application.status == ApplicationStatusEnum.QUEUED
+    ).values(
+        status=ApplicationStatusEnum.IN_PROGRESS,
+        processed_by_id=employee_id,
+        taken_at=taken_at
+    ).returning(Application).execution_options(synchronize_session=False)
+
+
+def claim_application_stmt(app_id: int, queue_type: str, employee_id: int, taken_at, postponed_before=None):
+    """
+    Подтвердить выдачу конкретного заявления (кандидата из диспетчера в памяти).
+    UPDATE сработает только если заявление все еще в очереди queue_type, не отложено
+    и не заблокировано другой транзакцией (FOR UPDATE SKIP LOCKED, как в
+    claim_next_application_stmt), иначе вернется пустой результат и диспетчер
+    возьмет следующего кандидата.
+    """
+    candidate = select(Application.id).where(
+        Application.id == app_id,
+        Application.queue_type == queue_type,
+        Application.status == ApplicationStatusEnum.QUEUED
+    )
+    if postponed_before is not None:
+        candidate = candidate.where(
+            Application.postponed_until.is_(None) | (Application.postponed_until <= postponed_before)
+        )
+    candidate = candidate.with_for_update(skip_locked=True).scalar_subquery()
+
+    return update(Application).where(
+        Application.id == candidate,
+        Application.status == ApplicationStatusEnum.QUEUED
+    ).values(
+        status=ApplicationStatusEnum.IN_PROGRESS,
+        processed_by_id=employee_id,
+        taken_at=taken_at
+    ).returning(Application).execution_options(synchronize_session=False)
@@ -0,0 +1,271 @@
+"""
+Диспетчер выдачи заявлений в памяти процесса бота.
+
+Для каждой очереди (queue_type) хранится куча кандидатов (не приоритетное, дата подачи, id),
+загруженная при старте. Следующий кандидат достается за O(log n), а выдача подтверждается
+одним UPDATE с проверкой статуса (claim_application_stmt), поэтому устаревшая куча
+может привести только к лишней попытке, но не к выдаче чужого заявления. Выданное
+заявление убирается из диспетчера только после коммита сессии; при откате оно
+возвращается в кучу на свое место.
+
+Куча поддерживается в актуальном состоянии через LISTEN/NOTIFY: триггер на таблице
+applications отправляет событие при вставке, удалении и изменении статуса, очереди,
+приоритета или даты откладывания — это покрывает импорт, эскалацию, возврат в очередь
+и изменения из веб-интерфейса. Раз в RESYNC_INTERVAL секунд кучи перестраиваются целиком.
+
+Диспетчер необязателен: включается переменной DISPATCHER_ENABLED, а без него
+выдача идет обычным запросом claim_next_application_stmt.
+"""
+import asyncio
+import heapq
+import json
+import logging
+from collections import defaultdict
+from datetime import datetime
+
+from sqlalchemy import event, select
+from .models import Application, ApplicationStatusEnum
+from .session import engine, AsyncSessionLocal
+from .dispatch import claim_application_stmt, claim_next_application_stmt
+from .notify import (
+    QUEUE_NOTIFY_CHANNEL, QUEUE_NOTIFY_TRIGGER, QUEUE_NOTIFY_FUNCTION_SQL, QUEUE_NOTIFY_TRIGGER_SQL,
+    ensure_trigger, drop_trigger
+)
+
+logger = logging.getLogger(__name__)
+
+RESYNC_INTERVAL = 300  # Полная пересборка куч, секунд
+MAX_CLAIM_ATTEMPTS = 20  # Попыток подтвердить кандидата до перехода на обычный запрос
+CLAIMS_INFO_KEY = "dispatcher_claims"  # session.info: выданные, но еще не закоммиченные заявления
+
+def _parse_datetime(value):
+    return datetime.fromisoformat(value) if value else None
+
+
+def _heap_key(app_id: int, is_priority, submitted_at):
+    # heapq — min-куча, поэтому приоритетные (False) идут первыми
+    return (not is_priority, submitted_at or datetime.max, app_id)
+
+
+class ApplicationDispatcher:
+    def __init__(self):
+        self._heaps = defaultdict(list)  # queue_type -> [(не приоритетное, submitted_at, id)]
+        self._entries = {}  # id -> (queue_type, ключ в куче, postponed_until)
+        self._pending_events = None  # события, пришедшие во время пересборки
+        self._listen_conn = None
+        self._resync_task = None
+        self.ready = False
+
+    async def start(self):
+        await self._ensure_trigger()
+        await self._listen()
+        await self.reload()
+        self._resync_task = asyncio.create_task(self._resync_loop())
+
+    async def stop(self):
+        self.ready = False
+        if self._resync_task:
+            self._resync_task.cancel()
+            self._resync_task = None
+        if self._listen_conn is not None:
+            await self._listen_conn.close()
+            self._listen_conn = None
+
+    async def _ensure_trigger(self):
+        async with engine.begin() as conn:
+            await ensure_trigger(conn, QUEUE_NOTIFY_TRIGGER, QUEUE_NOTIFY_FUNCTION_SQL, QUEUE_NOTIFY_TRIGGER_SQL)
+
+    async def _listen(self):
+        conn = await engine.connect()
+        raw = await conn.get_raw_connection()
+        await raw.driver_connection.add_listener(QUEUE_NOTIFY_CHANNEL, self._on_notify)
+        self._listen_conn = conn
+
+    def _listener_alive(self):
+        if self._listen_conn is None or self._listen_conn.closed:
+            return False
+        raw = self._listen_conn.sync_connection.connection
+        return not raw.driver_connection.is_closed()
+
+    async def reload(self):
+        """Перестроить кучи по текущему состоянию таблицы"""
+        self._pending_events = []
+        try:
+            async with AsyncSessionLocal() as session:
+                result = await session.execute(
+                    select(
+                        Application.id,
+                        Application.queue_type,
+                        Application.is_priority,
+                        Application.submitted_at,
+                        Application.postponed_until
+                    ).where(Application.status == ApplicationStatusEnum.QUEUED)
+                )
+                rows = result.all()
+        except Exception:
+            self._pending_events = None
+            raise
+
+        heaps = defaultdict(list)
+        entries = {}
+        for app_id, queue_type, is_priority, submitted_at, postponed_until in rows:
+            key = _heap_key(app_id, is_priority, submitted_at)
+            heaps[queue_type].append(key)
+            entries[app_id] = (queue_type, key, postponed_until)
+        for heap in heaps.values():
+            heapq.heapify(heap)
+
+        self._heaps = heaps
+        self._entries = entries
+        # События, пришедшие во время загрузки, применяем поверх в порядке коммитов
+        pending, self._pending_events = self._pending_events, None
+        for payload in pending:
+            self._apply_event(payload)
+        self.ready = True
+        logger.info(f"Диспетчер заявлений: загружено {len(entries)} заявлений в очереди")
+
+    async def _resync_loop(self):
+        while True:
+            await asyncio.sleep(RESYNC_INTERVAL)
+            try:
+                if not self._listener_alive():
+                    # Пока нет LISTEN, кучи могут устареть — выдаем обычным запросом
+                    self.ready = False
+                    if self._listen_conn is not None:
+                        await self._listen_conn.close()
+                    await self._listen()
+                await self.reload()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.ready = False
+                logger.error(f"Ошибка синхронизации диспетчера заявлений: {e}")
+
+    def _on_notify(self, connection, pid, channel, payload):
+        try:
+            event = json.loads(payload)
+        except ValueError:
+            return
+        if self._pending_events is not None:
+            self._pending_events.append(event)
+        else:
+            self._apply_event(event)
+
+    def _apply_event(self, event):
+        app_id = event["id"]
+        if event.get("status") != ApplicationStatusEnum.QUEUED.name:
+            self._entries.pop(app_id, None)
+            return
+
+        queue_type = event["queue_type"]
+        key = _heap_key(app_id, event.get("is_priority"), _parse_datetime(event.get("submitted_at")))
+        previous = self._entries.get(app_id)
+        self._entries[app_id] = (queue_type, key, _parse_datetime(event.get("postponed_until")))
+        # Старую запись в куче не ищем: она будет пропущена при извлечении как устаревшая
+        if previous is None or previous[0] != queue_type or previous[1] != key:
+            heapq.heappush(self._heaps[queue_type], key)
+
+    def _pop_candidate(self, queue_type: str, postponed_before, deferred: list):
+        heap = self._heaps.get(queue_type)
+        while heap:
+            key = heapq.heappop(heap)
+            entry = self._entries.get(key[2])
+            if entry is None or entry[0] != queue_type or entry[1] != key:
+                continue  # устаревшая запись
+            postponed_until = entry[2]
+            if postponed_before is not None and postponed_until and postponed_until > postponed_before:
+                deferred.append(key)
+                continue
+            return key
+        return None
+
+    async def claim(self, session, queue_type: str, employee_id: int, taken_at, postponed_before=None):
+        """
+        Выдать сотруднику следующее заявление очереди. Коммит выполняет вызывающий код.
+        Если куча пуста или кандидаты не подтвердились, выдача идет обычным запросом.
+        """
+        if self.ready:
+            deferred = []
+            try:
+                for _ in range(MAX_CLAIM_ATTEMPTS):
+                    key = self._pop_candidate(queue_type, postponed_before, deferred)
+                    if key is None:
+                        break
+                    result = await session.execute(
+                        claim_application_stmt(key[2], queue_type, employee_id, taken_at, postponed_before)
+                    )
+                    app = result.scalars().first()
+                    if app:
+                        self._track_claim(session, queue_type, key)
+                        return app
+                    # Не в очереди (придет NOTIFY) или заблокировано другой транзакцией,
+                    # которая может откатиться, — возвращаем в кучу
+                    deferred.append(key)
+            finally:
+                for key in deferred:
+                    heapq.heappush(self._heaps[queue_type], key)
+
+        result = await session.execute(
+            claim_next_application_stmt(queue_type, employee_id, taken_at, postponed_before=postponed_before)
+        )
+        return result.scalars().first()
+
+    def _track_claim(self, session, queue_type: str, key):
+        """Убрать заявление после коммита сессии, вернуть в кучу при откате"""
+        claims = session.info.get(CLAIMS_INFO_KEY)
+        if claims is None:
+            claims = session.info[CLAIMS_INFO_KEY] = []
+            event.listen(session.sync_session, "after_commit", self._on_commit)
+            event.listen(session.sync_session, "after_transaction_end", self._on_transaction_end)
+        claims.append((queue_type, key))
+
+    def _on_commit(self, session):
+        claims = session.info[CLAIMS_INFO_KEY]
+        for _, key in claims:
+            self._entries.pop(key[2], None)
+        claims.clear()
+
+    def _on_transaction_end(self, session, transaction):
+        if transaction.parent is not None:
+            return  # точка сохранения, внешняя транзакция продолжается
+        # Откат: заявление осталось в очереди, а NOTIFY не будет
+        claims = session.info[CLAIMS_INFO_KEY]
+        for queue_type, key in claims:
+            entry = self._entries.get(key[2])
+            if entry is not None and entry[0] == queue_type and entry[1] == key:
+                heapq.heappush(self._heaps[queue_type], key)
+        claims.clear()
+
+
+_dispatcher = None
+
+
+def get_dispatcher():
+    """Получить запущенный диспетчер или None, если он выключен"""
+    return _dispatcher
+
+
+async def start_dispatcher():
+    global _dispatcher
+    dispatcher = ApplicationDispatcher()
+    try:
+        await dispatcher.start()
+    except Exception as e:
+        await dispatcher.stop()
+        logger.error(f"Не удалось запустить диспетчер заявлений, выдача пойдет запросами к БД: {e}")
+        return None
+    _dispatcher = dispatcher
+    return dispatcher
+
+
+async def drop_dispatcher_trigger():
+    """Диспетчер выключен — убрать его триггер, чтобы запись в applications не слала NOTIFY"""
+    async with engine.begin() as conn:
+        await drop_trigger(conn, QUEUE_NOTIFY_TRIGGER)
+
+
+async def stop_dispatcher():
+    global _dispatcher
+    if _dispatcher is not None:
+        await _dispatcher.stop()
+        _dispatcher = None
@@ -0,0 +1,123 @@
+"""
+Кеш сотрудников и их групп по tg_id для проверки доступа в хендлерах бота.
+
+В кеше хранятся неизменяемые снимки (CachedEmployee), а не ORM-объекты: снимок
+не привязан к сессии и безопасно используется параллельными апдейтами.
+Записи живут EMPLOYEE_CACHE_TTL секунд, размер ограничен EMPLOYEE_CACHE_SIZE (LRU).
+Изменения сотрудников через db.crud сбрасывают запись сразу; изменения из
+веб-интерфейса (другой процесс) становятся видны не позже чем через TTL.
+"""
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+from sqlalchemy import event
+from config import EMPLOYEE_CACHE_TTL, EMPLOYEE_CACHE_SIZE
+from .session import UNIT_OF_WORK
+
+
+@dataclass(frozen=True)
+class CachedGroup:
+    id: int
+    name: str
+
+
+@dataclass(frozen=True)
+class CachedEmployee:
+    id: int
+    tg_id: str
+    fio: str
+    is_admin: bool
+    groups: Tuple[CachedGroup, ...]
+
+    @classmethod
+    def from_orm(cls, emp):
+        return cls(
+            id=emp.id,
+            tg_id=emp.tg_id,
+            fio=emp.fio,
+            is_admin=bool(emp.is_admin),
+            groups=tuple(CachedGroup(id=g.id, name=g.name) for g in emp.groups)
+        )
+
+
+MISSING = object()
+
+
+class EmployeeCache:
+    def __init__(self, ttl: float, maxsize: int):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._data = OrderedDict()  # tg_id -> (expires_at, CachedEmployee или None)
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def generation(self):
+        """Номер поколения: увеличивается при каждом сбросе записей"""
+        return self._generation
+
+    def get(self, tg_id: str):
+        """Вернуть снимок (или None для неизвестного tg_id) либо MISSING, если записи нет"""
+        item = self._data.get(tg_id)
+        if item is None or item[0] < time.monotonic():
+            if item is not None:
+                del self._data[tg_id]
+            self.misses += 1
+            return MISSING
+        self._data.move_to_end(tg_id)
+        self.hits += 1
+        return item[1]
+
+    def put(self, tg_id: str, value: Optional[CachedEmployee], generation: int):
+        """
+        Сохранить снимок, загруженный при поколении generation.
+        Если с тех пор был сброс, данные могли устареть — не сохраняем
+        """
+        if self.ttl <= 0 or generation != self._generation:
+            return
+        self._data[tg_id] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(tg_id)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def invalidate(self, tg_id: str = None):
+        """Сбросить запись сотрудника или весь кеш"""
+        self._generation += 1
+        if tg_id is None:
+            self._data.clear()
+        else:
+            self._data.pop(str(tg_id), None)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0
+        }
+
+
+employee_cache = EmployeeCache(EMPLOYEE_CACHE_TTL, EMPLOYEE_CACHE_SIZE)
+
+
+def invalidate_employee(tg_id: str, session=None):
+    """
+    Сбросить кеш сотрудника после его изменения. Внутри единицы работы запись
+    сбрасывается еще раз после коммита: до него параллельный апдейт мог
+    прочитать и закешировать старые данные
+    """
+    employee_cache.invalidate(tg_id)
+    if session is not None and session.info.get(UNIT_OF_WORK):
+        event.listen(
+            session.sync_session, "after_commit",
+            lambda _: employee_cache.invalidate(tg_id), once=True
+        )
+
+
+def get_employee_cache_stats():
+    """Счетчики попаданий/промахов кеша сотрудников"""
+    return employee_cache.stats()
@@ -0,0 +1,320 @@
+"""
+Импорт заявлений операторами над множествами вместо построчной работы с ORM.
+
+Загрузка очереди из Excel — пакетная вставка одним оператором на пакет.
+
+Правила дедупликации выполняются в базе, без загрузки существующих ключей в память:
+- ЕПГУ: заявление определяется (fio_norm, submitted_at) независимо от статуса — уникальный
+  индекс ux_applications_epgu_fio_norm_submitted и INSERT ... ON CONFLICT DO NOTHING;
+- ЛК: ФИО не должно повторяться среди заявлений в очереди (QUEUED). Правило зависит
+  от статуса, поэтому выражено через NOT EXISTS, а не уникальным индексом — иначе
+  возврат заявления в очередь нарушал бы ограничение.
+
+RETURNING id возвращает только вставленные строки: добавлено = число id,
+пропущено = размер пакета минус добавлено.
+
+Выгрузка 1С сопоставляется с базой через временную таблицу (см. ниже), а строки,
+не изменившиеся с прошлых загрузок, отсекаются по отпечаткам еще до нее.
+"""
+from sqlalchemy import (
+    select, update, delete, exists, literal, values, column, case, func, and_, or_, null, false,
+    Table, MetaData, Column, Integer, BigInteger, String, DateTime, Boolean, Text, Computed, any_, bindparam
+)
+from sqlalchemy.dialects.postgresql import insert, ARRAY
+from sqlalchemy.orm import aliased
+from .models import (
+    Application, ApplicationStatusEnum, ImportUpload, ImportFingerprint, FIO_NORM_SQL, normalized_fio
+)
+
+IMPORT_BATCH_SIZE = 1000  # Строк в одном INSERT (ограничение числа параметров asyncpg — 32767)
+
+
+def batches(rows, size: int = IMPORT_BATCH_SIZE):
+    for start in range(0, len(rows), size):
+        yield rows[start:start + size]
+
+
+def insert_epgu_applications_stmt(rows):
+    """INSERT пакета заявлений ЕПГУ; дубликаты по (fio_norm, submitted_at) пропускаются"""
+    return insert(Application).values([
+        {
+            "fio": row["fio"],
+            "submitted_at": row["submitted_at"],
+            "queue_type": "epgu",
+            "status": ApplicationStatusEnum.QUEUED,
+        }
+        for row in rows
+    ]).on_conflict_do_nothing(
+        index_elements=[Application.fio_norm, Application.submitted_at],
+        index_where=Application.queue_type == "epgu"
+    ).returning(Application.id)
+
+
+def epgu_duplicate_stmt(app_id: int):
+    """
+    SELECT id заявления ЕПГУ с теми же (fio_norm, submitted_at), что у app_id:
+    перенос app_id в очередь ЕПГУ нарушил бы ux_applications_epgu_fio_norm_submitted
+    """
+    target = select(Application.fio_norm, Application.submitted_at).where(Application.id == app_id).subquery()
+    return select(Application.id).where(
+        Application.queue_type == "epgu",
+        Application.id != app_id,
+        Application.fio_norm == target.c.fio_norm,
+        Application.submitted_at == target.c.submitted_at
+    ).limit(1)
+
+
+def insert_queued_applications_stmt(rows, queue_type: str):
+    """
+    INSERT ... SELECT пакета заявлений в очередь queue_type: пропускаются ФИО, уже
+    стоящие в этой очереди в статусе QUEUED, и повторы ФИО внутри пакета
+    """
+    batch = values(
+        column("fio", String),
+        column("submitted_at", DateTime),
+        column("is_priority", Boolean),
+        name="batch"
+    ).data([(row["fio"], row["submitted_at"], bool(row.get("priority", False))) for row in rows])
+    queued = exists().where(
+        Application.queue_type == queue_type,
+        Application.status == ApplicationStatusEnum.QUEUED,
+        Application.fio_norm == normalized_fio(batch.c.fio)
+    )
+    source = select(
+        batch.c.fio,
+        batch.c.submitted_at,
+        batch.c.is_priority,
+        literal(queue_type, String),
+        literal(ApplicationStatusEnum.QUEUED, Application.status.type)
+    ).where(~queued).distinct(normalized_fio(batch.c.fio)).order_by(normalized_fio(batch.c.fio))
+    return insert(Application).from_select(
+        ["fio", "submitted_at", "is_priority", "queue_type", "status"], source
+    ).returning(Application.id)
+
+
+# --- Импорт выгрузки 1С через временную таблицу ---------------------------------------
+#
+# Разобранные строки загружаются во временную таблицу import_1c_staging, после чего
+# распределяются на вставку/обновление/пропуск несколькими операторами над множествами
+# вместо SELECT на каждую строку. Правила совпадают с построчным импортом:
+# - строки, ФИО которых уже есть в очередях SKIP_FIO_QUEUES, не импортируются и не
+#   входят в итоги;
+# - ЛК сопоставляется по ФИО, ЕПГУ и unknown — по (ФИО, дата подачи); ФИО сравниваются
+#   нормализованными (fio_norm);
+# - при повторе ключа внутри выгрузки берется последняя строка, остальные — пропущены.
+
+SKIP_FIO_QUEUES = ["lk_problem", "epgu_mail", "epgu_problem", "epgu", "lk"]
+STAGED_QUEUES = ["lk", "epgu", "unknown"]
+
+staging_1c = Table(
+    "import_1c_staging", MetaData(),
+    Column("ord", Integer, nullable=False),
+    Column("fio", String, nullable=False),
+    Column("fio_norm", String, Computed(FIO_NORM_SQL, persisted=True)),
+    Column("submitted_at", DateTime, nullable=False),
+    Column("queue_type", String, nullable=False),
+    Column("status", Application.status.type, nullable=False),
+    Column("is_priority", Boolean, nullable=False),
+    Column("status_reason", Text),
+    Column("matched", Boolean, nullable=False, server_default=false()),
+    prefixes=["TEMPORARY"],
+    postgresql_on_commit="DROP"
+)
+
+_FINISHED = [ApplicationStatusEnum.ACCEPTED, ApplicationStatusEnum.REJECTED]
+
+
+def staging_rows(parsed_data):
+    """Строки для загрузки в import_1c_staging в порядке выгрузки внутри каждой очереди"""
+    rows = []
+    for queue_type in STAGED_QUEUES:
+        for app in parsed_data.get(queue_type, []):
+            rows.append({
+                "ord": len(rows),
+                "fio": app["fio"],
+                "submitted_at": app["submitted_at"],
+                "queue_type": queue_type,
+                "status": ApplicationStatusEnum(app["status"]),
+                "is_priority": bool(app["is_priority"]),
+                "status_reason": app["status_reason"],
+            })
+    return rows
+
+
+def _key_match(queue_type: str, table, application=Application):
+    """Условие совпадения строки table с заявлением очереди queue_type"""
+    match = [application.queue_type == queue_type, application.fio_norm == table.c.fio_norm]
+    if queue_type != "lk":
+        match.append(application.submitted_at == table.c.submitted_at)
+    return and_(*match)
+
+
+def drop_known_fios_stmt():
+    """Убрать строки с ФИО, уже присутствующими в очередях SKIP_FIO_QUEUES"""
+    return delete(staging_1c).where(
+        exists().where(
+            Application.queue_type.in_(SKIP_FIO_QUEUES),
+            Application.fio_norm == staging_1c.c.fio_norm
+        )
+    )
+
+
+def drop_duplicates_stmt():
+    """Оставить последнюю строку для каждого ключа; RETURNING очередь удаленных повторов"""
+    later = staging_1c.alias("later")
+    return delete(staging_1c).where(
+        later.c.queue_type == staging_1c.c.queue_type,
+        later.c.fio_norm == staging_1c.c.fio_norm,
+        or_(staging_1c.c.queue_type == "lk", later.c.submitted_at == staging_1c.c.submitted_at),
+        later.c.ord > staging_1c.c.ord
+    ).returning(staging_1c.c.queue_type)
+
+
+def mark_matched_stmt(queue_type: str):
+    """Отметить строки очереди queue_type, для которых заявление уже есть в базе"""
+    return update(staging_1c).where(
+        staging_1c.c.queue_type == queue_type,
+        exists().where(_key_match(queue_type, staging_1c))
+    ).values(matched=True)
+
+
+def update_matched_stmt(queue_type: str, now):
+    """
+    UPDATE ... FROM import_1c_staging для изменившихся заявлений очереди.
+    Каждая строка выгрузки обновляет одно заявление — с наименьшим id среди
+    совпавших (как .first() построчного импорта), а после drop_duplicates_stmt
+    каждое заявление совпадает не более чем с одной строкой. RETURNING ord —
+    строки выгрузки, по которым было обновление, без повторов
+    """
+    s = staging_1c
+    candidate = aliased(Application)
+    first_match = select(func.min(candidate.id)).where(
+        _key_match(queue_type, s, candidate)
+    ).correlate(s).scalar_subquery()
+    finished_at = case((s.c.status.in_(_FINISHED), now), else_=Application.processed_at)
+    if queue_type == "lk":
+        changed = or_(Application.status.is_distinct_from(s.c.status), Application.is_priority.is_distinct_from(s.c.is_priority))
+        values = {
+            "status": s.c.status,
+            "is_priority": s.c.is_priority,
+            "status_reason": func.coalesce(func.nullif(s.c.status_reason, ""), Application.status_reason),
+            "processed_at": finished_at,
+        }
+    elif queue_type == "epgu":
+        changed = Application.status.is_distinct_from(s.c.status)
+        values = {
+            "status": s.c.status,
+            "status_reason": func.coalesce(func.nullif(s.c.status_reason, ""), Application.status_reason),
+            "processed_at": finished_at,
+        }
+    else:
+        # Для unknown переносятся статус и причина как есть
+        changed = or_(Application.status.is_distinct_from(s.c.status), Application.status_reason.is_distinct_from(s.c.status_reason))
+        values = {"status": s.c.status, "status_reason": s.c.status_reason}
+    return update(Application).where(
+        s.c.queue_type == queue_type,
+        Application.id == first_match,
+        changed
+    ).values(**values).returning(s.c.ord).execution_options(synchronize_session=False)
+
+
+def insert_unmatched_stmt(now):
+    """INSERT ... SELECT новых заявлений из строк без совпадений; RETURNING очередь"""
+    s = staging_1c
+    source = select(
+        s.c.fio,
+        s.c.submitted_at,
+        s.c.queue_type,
+        s.c.status,
+        s.c.is_priority,
+        s.c.status_reason,
+        case((s.c.status.in_(_FINISHED), now), else_=null())
+    ).where(s.c.matched == false()).order_by(s.c.ord)
+    return insert(Application).from_select(
+        ["fio", "submitted_at", "queue_type", "status", "is_priority", "status_reason", "processed_at"], source
+    ).returning(Application.queue_type)
+
+
+def staged_totals_stmt():
+    """Число строк и число совпавших с базой строк по очередям"""
+    return select(
+        staging_1c.c.queue_type,
+        func.count(),
+        func.count().filter(staging_1c.c.matched)
+    ).group_by(staging_1c.c.queue_type)
+
+
+# --- Манифест загрузок ----------------------------------------------------------------
+#
+# Для каждой загрузки хранится хеш файла (import_uploads), для каждой примененной
+# строки — ее отпечаток (import_fingerprints). Повторная загрузка того же файла не
+# разбирается, а строки с известными отпечатками не попадают в import_1c_staging:
+# время импорта пропорционально числу изменившихся строк. Статусы, измененные
+# сотрудниками после импорта, неизменившаяся строка 1С не перезаписывает.
+# Удаление заявлений сбрасывает манифест (reset_manifest_stmts), чтобы следующая
+# загрузка восстановила их полностью.
+
+IMPORT_SOURCE_1C = "1c"
+
+
+def last_upload_hash_stmt(source: str):
+    return select(ImportUpload.file_hash).where(
+        ImportUpload.source == source
+    ).order_by(ImportUpload.id.desc()).limit(1)
+
+
+def known_fingerprints_stmt(source: str, fingerprints):
+    """Известные отпечатки из fingerprints — одним параметром-массивом"""
+    return select(ImportFingerprint.fingerprint).where(
+        ImportFingerprint.source == source,
+        ImportFingerprint.fingerprint == any_(bindparam("fingerprints", list(fingerprints), type_=ARRAY(BigInteger)))
+    )
+
+
+def record_fingerprints_stmt(source: str, fingerprints, upload_id: int):
+    return insert(ImportFingerprint).values([
+        {"source": source, "fingerprint": fingerprint, "upload_id": upload_id}
+        for fingerprint in fingerprints
+    ]).on_conflict_do_nothing()
+
+
+def reset_manifest_stmts():
+    """Забыть все загрузки и отпечатки (после удаления заявлений)"""
+    return [delete(ImportFingerprint), delete(ImportUpload)]
+
+
+# --- Импорт очереди ЕПГУ (почта) ------------------------------------------------------
+
+def normalize_email(email: str) -> str:
+    """То же, что EMAIL_NORM_SQL: без пробелов по краям, в нижнем регистре"""
+    return email.strip(" ").lower()
+
+
+def move_epgu_to_mail_stmt(emails):
+    """
+    Перенести в epgu_mail заявления ЕПГУ с email из списка (нормализованные, см.
+    normalize_email) — одно заявление на email. RETURNING id, fio, email, email_norm
+    """
+    candidates = select(Application.id).where(
+        Application.queue_type == "epgu",
+        Application.email_norm == any_(bindparam("emails", list(emails), type_=ARRAY(String)))
+    ).distinct(Application.email_norm).order_by(Application.email_norm, Application.id)
+    return update(Application).where(
+        Application.id.in_(candidates.scalar_subquery())
+    ).values(queue_type="epgu_mail").returning(
+        Application.id, Application.fio, Application.email, Application.email_norm
+    ).execution_options(synchronize_session=False)
+
+
+def insert_mail_applications_stmt(rows, submitted_at):
+    """INSERT пакета новых заявлений очереди epgu_mail; RETURNING id, fio, email"""
+    return insert(Application).values([
+        {
+            "fio": row["fio"],
+            "email": row["email"],
+            "submitted_at": submitted_at,
+            "queue_type": "epgu_mail",
+            "status": ApplicationStatusEnum.QUEUED,
+        }
+        for row in rows
+    ]).returning(Application.id, Application.fio, Application.email)
@@ -0,0 +1,329 @@
+"""
+Индекс заявителей в памяти процесса бота для inline-поиска (@bot Иванов).
+
+Inline-запрос приходит на каждое нажатие клавиши, и ответ нужен в пределах таймаута
+Telegram, поэтому поиск идет не в Postgres, а по индексу: для каждого заявления
+хранится (ФИО, email, очередь, статус) и токены — слова нормализованного ФИО и части
+email. Токены лежат в отсортированном списке, префикс ищется бинарным поиском;
+запрос из нескольких слов — пересечение по каждому слову (в любом порядке).
+
+Индекс загружается при старте и поддерживается через LISTEN/NOTIFY, как диспетчер
+выдачи (db/dispatcher.py): триггеры уровня оператора на applications (db/notify.py)
+сообщают id вставленных, удаленных и измененных (ФИО, email, очередь, статус)
+заявлений, а индекс перечитывает их текущее состояние пакетом. Раз в RESYNC_INTERVAL
+секунд индекс перестраивается целиком. Пока индекс не готов, inline-поиск идет
+запросом к БД.
+
+Индекс необязателен: включается переменной LOOKUP_INDEX_ENABLED; при выключенном
+индексе бот удаляет его триггеры (drop_lookup_triggers).
+"""
+import asyncio
+import heapq
+import logging
+import re
+import sys
+from bisect import bisect_left, insort
+from collections import defaultdict
+from typing import List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import select
+from .models import Application
+from .session import engine, AsyncSessionLocal
+from .notify import (
+    LOOKUP_NOTIFY_CHANNEL, LOOKUP_NOTIFY_FUNCTION_SQL, LOOKUP_NOTIFY_TRIGGERS_SQL, LOOKUP_ROW_TRIGGER,
+    ensure_triggers, drop_trigger
+)
+
+logger = logging.getLogger(__name__)
+
+RESYNC_INTERVAL = 600  # Полная пересборка индекса, секунд
+REFRESH_BATCH = 1000  # id в одном запросе перечитывания измененных заявлений
+
+_TOKEN_SPLIT = re.compile(r"[^\w]+")
+
+
+def normalize_query(value: str) -> str:
+    """То же, что FIO_NORM_SQL: пробелы схлопнуты, нижний регистр, «ё» -> «е»"""
+    return " ".join(value.split()).lower().replace("ё", "е")
+
+
+def _tokens(fio_norm: Optional[str], email_norm: Optional[str]) -> Tuple[str, ...]:
+    """Слова ФИО (и части слов через дефис), email целиком и его части"""
+    tokens = set()
+    for word in (fio_norm or "").split():
+        tokens.add(word)
+        tokens.update(part for part in _TOKEN_SPLIT.split(word) if part)
+    if email_norm:
+        tokens.add(email_norm)
+        tokens.update(part for part in _TOKEN_SPLIT.split(email_norm) if part)
+    # Фамилии и имена повторяются: одна строка на все заявления
+    return tuple(sys.intern(token) for token in tokens)
+
+
+class LookupEntry(NamedTuple):
+    id: int
+    fio: str
+    email: Optional[str]
+    queue_type: str
+    status: str
+    tokens: Tuple[str, ...]
+
+
+_ENTRY_COLUMNS = (
+    Application.id,
+    Application.fio,
+    Application.fio_norm,
+    Application.email,
+    Application.email_norm,
+    Application.queue_type,
+    Application.status
+)
+
+
+def _entry(row) -> LookupEntry:
+    app_id, fio, fio_norm, email, email_norm, queue_type, status = row
+    return LookupEntry(
+        app_id, fio or "", email, sys.intern(queue_type), status.value if status else "",
+        _tokens(fio_norm, email_norm)
+    )
+
+
+class ApplicantIndex:
+    def __init__(self):
+        self._entries = {}  # id -> LookupEntry
+        self._postings = defaultdict(set)  # токен -> id заявлений
+        self._tokens: List[str] = []  # отсортированные токены для поиска по префиксу
+        self._dirty = set()  # id из уведомлений, еще не перечитанные из базы
+        self._reloading = False
+        self._refresh_task = None
+        self._listen_conn = None
+        self._resync_task = None
+        self.ready = False
+
+    async def start(self):
+        await self._ensure_triggers()
+        await self._listen()
+        await self.reload()
+        self._resync_task = asyncio.create_task(self._resync_loop())
+
+    async def stop(self):
+        self.ready = False
+        for task in (self._resync_task, self._refresh_task):
+            if task:
+                task.cancel()
+        self._resync_task = self._refresh_task = None
+        if self._listen_conn is not None:
+            await self._listen_conn.close()
+            self._listen_conn = None
+
+    async def _ensure_triggers(self):
+        async with engine.begin() as conn:
+            await drop_trigger(conn, LOOKUP_ROW_TRIGGER)
+            await ensure_triggers(conn, LOOKUP_NOTIFY_FUNCTION_SQL, LOOKUP_NOTIFY_TRIGGERS_SQL)
+
+    async def _listen(self):
+        conn = await engine.connect()
+        raw = await conn.get_raw_connection()
+        await raw.driver_connection.add_listener(LOOKUP_NOTIFY_CHANNEL, self._on_notify)
+        self._listen_conn = conn
+
+    def _listener_alive(self):
+        if self._listen_conn is None or self._listen_conn.closed:
+            return False
+        raw = self._listen_conn.sync_connection.connection
+        return not raw.driver_connection.is_closed()
+
+    async def reload(self):
+        """Перестроить индекс по текущему состоянию таблицы"""
+        self._reloading = True
+        try:
+            # Перечитывание, начатое до загрузки, применяется до замены индекса
+            if self._refresh_task is not None and not self._refresh_task.done():
+                await asyncio.wait([self._refresh_task])
+            async with AsyncSessionLocal() as session:
+                result = await session.stream(select(*_ENTRY_COLUMNS).execution_options(yield_per=10000))
+                entries = {}
+                postings = defaultdict(set)
+                async for row in result:
+                    entry = _entry(row)
+                    entries[entry.id] = entry
+                    for token in entry.tokens:
+                        postings[token].add(entry.id)
+        finally:
+            self._reloading = False
+
+        self._entries = entries
+        self._postings = postings
+        self._tokens = sorted(postings)
+        # id из уведомлений, пришедших во время загрузки, перечитываются поверх
+        self._schedule_refresh()
+        self.ready = True
+        stats = self.stats()
+        logger.info(
+            f"Индекс заявителей: загружено {stats['entries']} заявлений, "
+            f"{stats['tokens']} токенов, ~{stats['memory_mb']} МБ"
+        )
+
+    async def _resync_loop(self):
+        while True:
+            await asyncio.sleep(RESYNC_INTERVAL)
+            try:
+                if not self._listener_alive():
+                    # Пока нет LISTEN, индекс может устареть — ищем запросами к БД
+                    self.ready = False
+                    if self._listen_conn is not None:
+                        await self._listen_conn.close()
+                    await self._listen()
+                await self.reload()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.ready = False
+                logger.error(f"Ошибка синхронизации индекса заявителей: {e}")
+
+    def _on_notify(self, connection, pid, channel, payload):
+        try:
+            self._dirty.update(int(app_id) for app_id in payload.split(","))
+        except ValueError:
+            return
+        self._schedule_refresh()
+
+    def _schedule_refresh(self):
+        if self._dirty and not self._reloading and (self._refresh_task is None or self._refresh_task.done()):
+            self._refresh_task = asyncio.create_task(self._refresh())
+
+    async def _refresh(self):
+        """Перечитать заявления из уведомлений: найденные обновить, остальные удалить"""
+        while self._dirty and not self._reloading:
+            ids, self._dirty = self._dirty, set()
+            try:
+                async with AsyncSessionLocal() as session:
+                    rows = []
+                    batch = sorted(ids)
+                    for start in range(0, len(batch), REFRESH_BATCH):
+                        result = await session.execute(
+                            select(*_ENTRY_COLUMNS).where(Application.id.in_(batch[start:start + REFRESH_BATCH]))
+                        )
+                        rows.extend(result.all())
+            except Exception as e:
+                # Повторим со следующим уведомлением или пересборкой
+                self._dirty |= ids
+                logger.error(f"Ошибка обновления индекса заявителей: {e}")
+                return
+            for row in rows:
+                entry = _entry(row)
+                ids.discard(entry.id)
+                self._put(entry)
+            for app_id in ids:
+                self._remove(app_id)
+
+    def _remove(self, app_id: int):
+        entry = self._entries.pop(app_id, None)
+        if entry is None:
+            return
+        for token in entry.tokens:
+            ids = self._postings.get(token)
+            if ids is not None:
+                ids.discard(app_id)
+                # Пустой токен остается в отсортированном списке до пересборки
+                if not ids:
+                    del self._postings[token]
+
+    def _put(self, entry: LookupEntry):
+        self._remove(entry.id)
+        self._entries[entry.id] = entry
+        for token in entry.tokens:
+            if token not in self._postings:
+                position = bisect_left(self._tokens, token)
+                if position == len(self._tokens) or self._tokens[position] != token:
+                    insort(self._tokens, token)
+            self._postings[token].add(entry.id)
+
+    def _prefix_ids(self, prefix: str) -> set:
+        """id заявлений, у которых есть токен, начинающийся с prefix"""
+        ids = set()
+        position = bisect_left(self._tokens, prefix)
+        while position < len(self._tokens) and self._tokens[position].startswith(prefix):
+            ids |= self._postings.get(self._tokens[position], set())
+            position += 1
+        return ids
+
+    def search(self, query: str, queue_types=None, limit: int = 50) -> List[LookupEntry]:
+        """
+        Заявления, у которых каждое слово запроса — префикс какого-либо токена,
+        в очередях queue_types (None — все). Сначала заявления в очереди и в
+        обработке, затем по ФИО
+        """
+        words = sorted(set(normalize_query(query).split()), key=len, reverse=True)
+        if not words:
+            return []
+        # Самое длинное слово обычно самое избирательное: по нему берем кандидатов,
+        # остальные проверяем по токенам кандидата
+        candidates = self._prefix_ids(words[0])
+        rest = words[1:]
+        allowed = set(queue_types) if queue_types is not None else None
+        matches = []
+        for app_id in candidates:
+            entry = self._entries.get(app_id)
+            if entry is None or (allowed is not None and entry.queue_type not in allowed):
+                continue
+            if all(any(token.startswith(word) for token in entry.tokens) for word in rest):
+                matches.append(entry)
+        return heapq.nsmallest(
+            limit, matches, key=lambda e: (e.status not in ("queued", "in_progress"), e.fio, e.id)
+        )
+
+    def stats(self):
+        """Размер индекса и оценка занимаемой памяти (контейнеры, записи и строки)"""
+        size = sys.getsizeof(self._entries) + sys.getsizeof(self._postings) + sys.getsizeof(self._tokens)
+        strings = set()
+        for entry in self._entries.values():
+            size += sys.getsizeof(entry) + sys.getsizeof(entry.tokens) + sys.getsizeof(entry.id)
+            for value in (entry.fio, entry.email):
+                if value:
+                    size += sys.getsizeof(value)
+            strings.update(entry.tokens)
+        for ids in self._postings.values():
+            size += sys.getsizeof(ids)
+        size += sum(sys.getsizeof(token) for token in strings)
+        return {
+            "ready": self.ready,
+            "entries": len(self._entries),
+            "tokens": len(self._postings),
+            "memory_mb": round(size / 1024 / 1024, 1)
+        }
+
+
+_index: Optional[ApplicantIndex] = None
+
+
+def get_applicant_index() -> Optional[ApplicantIndex]:
+    """Получить запущенный индекс или None, если он выключен"""
+    return _index
+
+
+async def start_applicant_index():
+    global _index
+    index = ApplicantIndex()
+    try:
+        await index.start()
+    except Exception as e:
+        await index.stop()
+        logger.error(f"Не удалось построить индекс заявителей, inline-поиск пойдет запросами к БД: {e}")
+        return None
+    _index = index
+    return index
+
+
+async def drop_lookup_triggers():
+    """Индекс выключен — убрать его триггеры, чтобы запись в applications не слала NOTIFY"""
+    async with engine.begin() as conn:
+        for name in (LOOKUP_ROW_TRIGGER, *LOOKUP_NOTIFY_TRIGGERS_SQL):
+            await drop_trigger(conn, name)
+
+
+async def stop_applicant_index():
+    global _index
+    if _index is not None:
+        await _index.stop()
+        _index = None
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, ForeignKey, Text, Enum
+from sqlalchemy import Column, Integer, BigInteger, String, DateTime, Boolean, ForeignKey, Text, Enum, Index, Computed, DDL, event, func
 from sqlalchemy.orm import declarative_base, relationship
 import enum
 
@@ -11,6 +11,13 @@ class ApplicationStatusEnum(enum.Enum):
     REJECTED = "rejected"
     PROBLEM = "problem"
 
+class ImportJobStatusEnum(enum.Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
 class WorkDayStatusEnum(enum.Enum):
     ACTIVE = "active"
     PAUSED = "paused"
@@ -30,11 +37,30 @@ class EPGUActionEnum(enum.Enum):
     ERROR = "ERROR"  # Ошибка
     REJECTED = "REJECTED"  # Отклонено
 
+# Нормализация ФИО и email для точного сопоставления: пробелы по краям и повторные
+# пробелы, регистр, «ё» -> «е». Колонки fio_norm/email_norm вычисляет сама база
+# (GENERATED ... STORED) при любой записи; при поиске то же выражение применяется
+# к параметру (normalized_fio/normalized_email), поэтому обе стороны совпадают.
+# Выражения SQL и функции ниже должны оставаться одинаковыми
+FIO_NORM_SQL = "lower(translate(regexp_replace(btrim(fio), '\\s+', ' ', 'g'), 'Ёё', 'Ее'))"
+EMAIL_NORM_SQL = "lower(btrim(email))"
+
+
+def normalized_fio(value):
+    return func.lower(func.translate(func.regexp_replace(func.btrim(value), r"\s+", " ", "g"), "Ёё", "Ее"))
+
+
+def normalized_email(value):
+    return func.lower(func.btrim(value))
+
+
 class Application(Base):
     __tablename__ = "applications"
     id = Column(Integer, primary_key=True)
     fio = Column(String, nullable=False)
     email = Column(String, nullable=True)  # Новый email для поиска и импорта
+    fio_norm = Column(String, Computed(FIO_NORM_SQL, persisted=True))
+    email_norm = Column(String, Computed(EMAIL_NORM_SQL, persisted=True))
     submitted_at = Column(DateTime, nullable=False)
     is_priority = Column(Boolean, default=False)
     status = Column(Enum(ApplicationStatusEnum), default=ApplicationStatusEnum.QUEUED)
@@ -58,6 +84,109 @@ class Application(Base):
     scans_confirmed = Column(Boolean, default=False)  # Сканы подтверждены
     signature_confirmed = Column(Boolean, default=False)  # Подпись подтверждена
 
+# Индекс для выдачи заявлений: только QUEUED, в порядке выдачи (приоритет, дата подачи).
+# id и postponed_until включены: кандидат выбирается обходом индекса без сортировки (FOR UPDATE
+# все равно читает строку из таблицы, поэтому это обычный index scan, а не index-only)
+Index(
+    "ix_applications_dispatch",
+    Application.queue_type,
+    Application.is_priority.desc(),
+    Application.submitted_at.asc(),
+    postgresql_include=["id", "postponed_until"],
+    postgresql_where=Application.status == ApplicationStatusEnum.QUEUED
+)
+# Точные совпадения по ФИО и email (импорт, приоритет, поиск по ФИО в очереди)
+Index("ix_applications_queue_fio_norm", Application.queue_type, Application.fio_norm)
+Index("ix_applications_queue_email_norm", Application.queue_type, Application.email_norm)
+# Поиск по подстроке ФИО и email (LIKE '%...%', см. db/search.py): триграммные GIN-индексы
+Index(
+    "ix_applications_fio_norm_trgm",
+    Application.fio_norm,
+    postgresql_using="gin",
+    postgresql_ops={"fio_norm": "gin_trgm_ops"}
+)
+Index(
+    "ix_applications_email_norm_trgm",
+    Application.email_norm,
+    postgresql_using="gin",
+    postgresql_ops={"email_norm": "gin_trgm_ops"}
+)
+# Заявление ЕПГУ однозначно определяется ФИО и датой подачи (правило дедупликации импорта);
+# импорт вставляет строки через INSERT ... ON CONFLICT DO NOTHING по этому индексу
+Index(
+    "ux_applications_epgu_fio_norm_submitted",
+    Application.fio_norm,
+    Application.submitted_at,
+    unique=True,
+    postgresql_where=Application.queue_type == "epgu"
+)
+# Индекс для возврата в очередь заявлений, слишком долго находящихся в обработке
+Index(
+    "ix_applications_in_progress_taken_at",
+    Application.taken_at,
+    postgresql_where=Application.status == ApplicationStatusEnum.IN_PROGRESS
+)
+
+class QueueCounter(Base):
+    """
+    Счетчики заявлений по очереди и статусу (журнал приращений).
+    Строки добавляются триггером на applications, текущее значение — SUM(n) по
+    (queue_type, status); задача сверки периодически сворачивает журнал
+    в одну строку на пару и исправляет расхождения (см. db/counters.py)
+    """
+    __tablename__ = "queue_counters"
+    id = Column(Integer, primary_key=True)
+    queue_type = Column(String, nullable=False)
+    status = Column(Enum(ApplicationStatusEnum), nullable=True)
+    n = Column(Integer, nullable=False, default=0)
+
+class ImportUpload(Base):
+    """Манифест загрузки выгрузки: хеш файла и сколько строк в ней изменилось"""
+    __tablename__ = "import_uploads"
+    id = Column(Integer, primary_key=True)
+    source = Column(String, nullable=False)  # '1c'
+    file_hash = Column(String(64), nullable=False)
+    uploaded_at = Column(DateTime, nullable=False)
+    total_rows = Column(Integer, nullable=False, default=0)
+    changed_rows = Column(Integer, nullable=False, default=0)
+
+class ImportFingerprint(Base):
+    """Отпечатки строк, уже примененных импортом: такие строки при повторной загрузке пропускаются"""
+    __tablename__ = "import_fingerprints"
+    source = Column(String, primary_key=True)
+    fingerprint = Column(BigInteger, primary_key=True)
+    upload_id = Column(Integer, ForeignKey("import_uploads.id"), nullable=False)
+
+class ImportJob(Base):
+    """
+    Задание импорта файла, загруженного администратором. Выполняется фоновым
+    исполнителем бота (utils/import_jobs.py) и переживает перезапуск бота
+    """
+    __tablename__ = "import_jobs"
+    id = Column(Integer, primary_key=True)
+    kind = Column(String, nullable=False)  # '1c', 'lk', 'epgu', 'epgu_mail'
+    file_path = Column(String, nullable=False)
+    file_name = Column(String, nullable=True)
+    status = Column(Enum(ImportJobStatusEnum), nullable=False, default=ImportJobStatusEnum.QUEUED)
+    created_by = Column(String, nullable=False)  # tg_id администратора
+    employee_name = Column(String, nullable=True)
+    chat_id = Column(BigInteger, nullable=True)  # Сообщение, в котором показывается прогресс
+    message_id = Column(Integer, nullable=True)
+    created_at = Column(DateTime, nullable=False)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+    total_rows = Column(Integer, nullable=True)
+    progress = Column(Text, nullable=True)  # Последнее сообщение о прогрессе
+    result = Column(Text, nullable=True)  # JSON с итогами импорта
+    error = Column(Text, nullable=True)
+
+# Исполнитель выбирает следующее задание среди ожидающих
+Index(
+    "ix_import_jobs_queued",
+    ImportJob.id,
+    postgresql_where=ImportJob.status == ImportJobStatusEnum.QUEUED
+)
+
 class Group(Base):
     __tablename__ = "groups"
     id = Column(Integer, primary_key=True)
@@ -101,4 +230,7 @@ class WorkBreak(Base):
     work_day = relationship("WorkDay", back_populates="breaks")
     start_time = Column(DateTime, nullable=False)  # Время начала перерыва
     end_time = Column(DateTime, nullable=True)  # Время окончания перерыва
-    duration = Column(Integer, default=0)  # Продолжительность перерыва в секундах 
\ No newline at end of file
+    duration = Column(Integer, default=0)  # Продолжительность перерыва в секундах 
+
+# Классы операторов gin_trgm_ops нужны индексам поиска до создания таблиц
+event.listen(Base.metadata, "before_create", DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
@@ -0,0 +1,137 @@
+"""
+Триггеры LISTEN/NOTIFY на applications для структур в памяти процесса бота.
+
+Определения хранятся только здесь: их используют и бот при старте (ensure_triggers /
+drop_trigger), и миграции Alembic (синхронно, через op.execute). Триггер нужен
+только включенному потребителю: при выключенном диспетчере или индексе заявителей
+бот удаляет его триггеры, чтобы запись в applications не платила за уведомления,
+которые никто не слушает.
+"""
+from sqlalchemy import text
+
+QUEUE_NOTIFY_CHANNEL = "application_queue"
+QUEUE_NOTIFY_TRIGGER = "applications_queue_notify"
+
+# Событие для диспетчера заявлений в памяти бота (db/dispatcher.py)
+QUEUE_NOTIFY_FUNCTION_SQL = f"""
+CREATE OR REPLACE FUNCTION notify_application_queue() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        PERFORM pg_notify('{QUEUE_NOTIFY_CHANNEL}', json_build_object('id', OLD.id)::text);
+        RETURN OLD;
+    END IF;
+    PERFORM pg_notify('{QUEUE_NOTIFY_CHANNEL}', json_build_object(
+        'id', NEW.id,
+        'queue_type', NEW.queue_type,
+        'status', NEW.status,
+        'is_priority', NEW.is_priority,
+        'submitted_at', NEW.submitted_at,
+        'postponed_until', NEW.postponed_until
+    )::text);
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql
+"""
+
+QUEUE_NOTIFY_TRIGGER_SQL = f"""
+CREATE TRIGGER {QUEUE_NOTIFY_TRIGGER}
+AFTER INSERT OR DELETE OR UPDATE OF status, queue_type, is_priority, submitted_at, postponed_until
+ON applications
+FOR EACH ROW EXECUTE FUNCTION notify_application_queue()
+"""
+
+LOOKUP_NOTIFY_CHANNEL = "application_lookup"
+LOOKUP_NOTIFY_IDS = 500  # id в одном уведомлении (размер NOTIFY ограничен 8000 байт)
+
+# Событие для индекса заявителей (db/lookup.py): только id измененных заявлений через
+# запятую — индекс сам читает их текущее состояние. Триггеры уровня оператора с таблицами
+# переходов, как у счетчиков (db/counters.py): массовый импорт дает несколько
+# уведомлений, а не одно на строку
+LOOKUP_NOTIFY_FUNCTION_SQL = f"""
+CREATE OR REPLACE FUNCTION notify_application_lookup() RETURNS trigger AS $$
+DECLARE
+    ids text;
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        FOR ids IN
+            SELECT string_agg(id::text, ',') FROM (
+                SELECT id, (row_number() OVER () - 1) / {LOOKUP_NOTIFY_IDS} AS part FROM new_rows
+            ) AS changed GROUP BY part
+        LOOP
+            PERFORM pg_notify('{LOOKUP_NOTIFY_CHANNEL}', ids);
+        END LOOP;
+    ELSIF TG_OP = 'DELETE' THEN
+        FOR ids IN
+            SELECT string_agg(id::text, ',') FROM (
+                SELECT id, (row_number() OVER () - 1) / {LOOKUP_NOTIFY_IDS} AS part FROM old_rows
+            ) AS changed GROUP BY part
+        LOOP
+            PERFORM pg_notify('{LOOKUP_NOTIFY_CHANNEL}', ids);
+        END LOOP;
+    ELSE
+        -- Только строки, у которых изменились поля индекса
+        FOR ids IN
+            SELECT string_agg(id::text, ',') FROM (
+                SELECT n.id, (row_number() OVER () - 1) / {LOOKUP_NOTIFY_IDS} AS part
+                FROM new_rows AS n JOIN old_rows AS o ON o.id = n.id
+                WHERE (n.fio, n.email, n.queue_type, n.status) IS DISTINCT FROM (o.fio, o.email, o.queue_type, o.status)
+            ) AS changed GROUP BY part
+        LOOP
+            PERFORM pg_notify('{LOOKUP_NOTIFY_CHANNEL}', ids);
+        END LOOP;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+"""
+
+# Построчный триггер первой версии индекса; функция теперь уровня оператора,
+# поэтому он удаляется вместе с установкой новых
+LOOKUP_ROW_TRIGGER = "applications_lookup_notify"
+
+# Триггер с таблицами переходов может обслуживать только одно событие
+LOOKUP_NOTIFY_TRIGGERS_SQL = {
+    "applications_lookup_insert": """
+        CREATE TRIGGER applications_lookup_insert
+        AFTER INSERT ON applications
+        REFERENCING NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION notify_application_lookup()
+    """,
+    "applications_lookup_update": """
+        CREATE TRIGGER applications_lookup_update
+        AFTER UPDATE ON applications
+        REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION notify_application_lookup()
+    """,
+    "applications_lookup_delete": """
+        CREATE TRIGGER applications_lookup_delete
+        AFTER DELETE ON applications
+        REFERENCING OLD TABLE AS old_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION notify_application_lookup()
+    """,
+}
+
+TRIGGER_EXISTS_SQL = "SELECT 1 FROM pg_trigger WHERE tgname = :name AND NOT tgisinternal"
+
+
+def drop_trigger_sql(name: str) -> str:
+    return f"DROP TRIGGER IF EXISTS {name} ON applications"
+
+
+async def ensure_trigger(conn, name: str, function_sql: str, trigger_sql: str):
+    """Создать функцию и триггер, если его нет (conn — AsyncConnection)"""
+    await ensure_triggers(conn, function_sql, {name: trigger_sql})
+
+
+async def ensure_triggers(conn, function_sql: str, triggers: dict):
+    """Создать функцию и недостающие триггеры {имя: DDL} (conn — AsyncConnection)"""
+    await conn.execute(text(function_sql))
+    for name, trigger_sql in triggers.items():
+        exists = await conn.scalar(text(TRIGGER_EXISTS_SQL), {"name": name})
+        if not exists:
+            await conn.execute(text(trigger_sql))
+
+
+async def drop_trigger(conn, name: str):
+    """Удалить триггер выключенного потребителя (функция остается)"""
+    await conn.execute(text(drop_trigger_sql(name)))
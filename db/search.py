@@ -0,0 +1,151 @@
+"""
+Поиск заявлений по подстроке ФИО или email.
+
+Поиск идет по нормализованным колонкам fio_norm/email_norm (см. db/models.py):
+запрос нормализуется тем же выражением, экранируется и сравнивается через
+LIKE '%...%'. Такой LIKE обслуживают GIN-индексы pg_trgm (ix_applications_*_trgm),
+поэтому поиск не сканирует всю таблицу. Индекс помогает только запросам от трех
+символов (меньше одной триграммы) — более короткие запросы не выполняются.
+
+Результаты search_applications_stmt упорядочены по сходству с запросом (similarity):
+точное совпадение ФИО выше частичного; вызывающий код добавляет свой порядок для
+равных по сходству. search_applications_page_stmt ищет сразу в нескольких очередях
+одним запросом и отдает результаты страницами в порядке выдачи (приоритет, дата
+подачи, id) — по этому порядку строится курсор следующей страницы (search_cursor).
+
+Модуль используется и ботом (async), и веб-интерфейсом (sync), поэтому здесь только
+построители запросов без привязки к сессии.
+"""
+from datetime import datetime
+from sqlalchemy import select, func, literal, and_, or_
+from .models import Application, normalized_fio, normalized_email
+
+SEARCH_MIN_LENGTH = 3  # Короче одной триграммы индекс не используется
+SEARCH_PAGE_SIZE = 10  # Заявлений на странице результатов поиска в боте
+
+LIKE_ESCAPE = "\\"
+
+
+def is_searchable(query: str) -> bool:
+    """Достаточно ли длинный запрос для поиска по подстроке"""
+    return bool(query) and len(query.strip()) >= SEARCH_MIN_LENGTH
+
+
+def is_email_query(query: str) -> bool:
+    """Похож ли запрос на email (как в поиске очереди почты)"""
+    return "@" in query and "." in query
+
+
+def escape_like(value: str) -> str:
+    """Экранировать символы шаблона LIKE во вводе пользователя"""
+    return (
+        value.replace(LIKE_ESCAPE, LIKE_ESCAPE * 2)
+        .replace("%", LIKE_ESCAPE + "%")
+        .replace("_", LIKE_ESCAPE + "_")
+    )
+
+
+def _search_column(by_email: bool):
+    if by_email:
+        return Application.email_norm, normalized_email
+    return Application.fio_norm, normalized_fio
+
+
+def search_condition(query: str, by_email: bool = False):
+    """Условие «ФИО (или email при by_email) содержит query»; обслуживается индексом pg_trgm"""
+    column, normalize = _search_column(by_email)
+    # Нормализация не затрагивает символы экранирования, поэтому шаблон строится
+    # из экранированного запроса
+    pattern = literal("%").concat(normalize(escape_like(query.strip()))).concat("%")
+    return column.like(pattern, escape=LIKE_ESCAPE)
+
+
+def search_applications_stmt(query: str, queue_type: str = None, by_email: bool = False):
+    """
+    SELECT заявлений, у которых ФИО (или email при by_email) содержит query,
+    по убыванию сходства. queue_type ограничивает поиск одной очередью.
+    Запрос короче SEARCH_MIN_LENGTH не должен сюда попадать (см. is_searchable)
+    """
+    column, normalize = _search_column(by_email)
+    stmt = select(Application).where(search_condition(query, by_email))
+    if queue_type is not None:
+        stmt = stmt.where(Application.queue_type == queue_type)
+    return stmt.order_by(func.similarity(column, normalize(query.strip())).desc())
+
+
+# Порядок страниц поиска: как при выдаче — приоритетные, затем более ранние; id
+# делает порядок строгим. NULL в is_priority считается «не приоритетное»
+_search_priority = func.coalesce(Application.is_priority, False)
+
+
+def search_cursor(app) -> tuple:
+    """Курсор страницы поиска после заявления app: (приоритет, дата подачи, id)"""
+    return bool(app.is_priority), app.submitted_at, app.id
+
+
+_CURSOR_TIME_FORMAT = "%Y%m%d%H%M%S%f"
+
+
+def encode_search_cursor(cursor: tuple) -> str:
+    """Курсор -> строка для callback_data (не длиннее 40 байт)"""
+    is_priority, submitted_at, app_id = cursor
+    return f"{int(is_priority)}_{app_id}_{submitted_at.strftime(_CURSOR_TIME_FORMAT)}"
+
+
+def decode_search_cursor(value: str) -> tuple:
+    """Строка из encode_search_cursor -> курсор; ValueError при неверном формате"""
+    is_priority, app_id, submitted_at = value.split("_")
+    return is_priority == "1", datetime.strptime(submitted_at, _CURSOR_TIME_FORMAT), int(app_id)
+
+
+def page_cursors(apps, has_prev: bool, has_next: bool):
+    """Строковые курсоры кнопок «назад»/«вперед» страницы apps (None — кнопки нет)"""
+    if not apps:
+        return None, None
+    prev_cursor = encode_search_cursor(search_cursor(apps[0])) if has_prev else None
+    next_cursor = encode_search_cursor(search_cursor(apps[-1])) if has_next else None
+    return prev_cursor, next_cursor
+
+
+def search_applications_page_stmt(query: str, queue_types=None, statuses=None, limit: int = None,
+                                  cursor: tuple = None, by_email: bool = False, backward: bool = False):
+    """
+    SELECT заявлений, содержащих query в ФИО (или email), в очередях queue_types
+    и статусах statuses (None — любые) одним запросом, в порядке (приоритет desc,
+    дата подачи, id). cursor — search_cursor последнего заявления предыдущей
+    страницы: возвращаются строки строго после него (keyset, без OFFSET).
+    backward — строки строго перед cursor в обратном порядке (предыдущая страница)
+    """
+    stmt = select(Application).where(search_condition(query, by_email))
+    if queue_types is not None:
+        stmt = stmt.where(Application.queue_type.in_(list(queue_types)))
+    if statuses is not None:
+        stmt = stmt.where(Application.status.in_(list(statuses)))
+    if cursor is not None:
+        is_priority, submitted_at, app_id = cursor
+        if backward:
+            in_group = or_(
+                Application.submitted_at < submitted_at,
+                and_(Application.submitted_at == submitted_at, Application.id < app_id)
+            )
+            # Перед приоритетным — только приоритетные, перед обычным — все приоритетные
+            if is_priority:
+                stmt = stmt.where(_search_priority.is_(True), in_group)
+            else:
+                stmt = stmt.where(or_(_search_priority.is_(True), in_group))
+        else:
+            in_group = or_(
+                Application.submitted_at > submitted_at,
+                and_(Application.submitted_at == submitted_at, Application.id > app_id)
+            )
+            if is_priority:
+                stmt = stmt.where(or_(_search_priority.is_(False), in_group))
+            else:
+                stmt = stmt.where(_search_priority.is_(False), in_group)
+    if backward:
+        stmt = stmt.order_by(_search_priority.asc(), Application.submitted_at.desc(), Application.id.desc())
+    else:
+        stmt = stmt.order_by(_search_priority.desc(), Application.submitted_at.asc(), Application.id.asc())
+    if limit is not None:
+        stmt = stmt.limit(limit)
+    return stmt
@@ -5,6 +5,21 @@ from config import DB_DSN
 engine = create_async_engine(DB_DSN, echo=True, future=True)
 AsyncSessionLocal = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
 
-async def get_session():
+# Ключ в session.info: сессия принадлежит единице работы (одному апдейту бота),
+# коммит выполняет тот, кто ее открыл
+UNIT_OF_WORK = "unit_of_work"
+
+async def get_session(session: AsyncSession = None):
+    # Если передана сессия единицы работы — используем ее, не открывая новое подключение
+    if session is not None:
+        yield session
+        return
     async with AsyncSessionLocal() as session:
-        yield session 
\ No newline at end of file
+        yield session
+
+async def commit(session: AsyncSession):
+    """Зафиксировать изменения. Внутри единицы работы только flush — коммит будет один, в конце"""
+    if session.info.get(UNIT_OF_WORK):
+        await session.flush()
+    else:
+        await session.commit()
@@ -0,0 +1,163 @@
+"""
+Статистика по очередям для бота (async) и веб-интерфейса (sync).
+
+Все пары (queue_type, status) считаются одним запросом GROUP BY по счетчикам
+queue_counters (см. db/counters.py) и возвращаются неизменяемым снимком
+StatisticsSnapshot. Снимок кешируется на STATISTICS_CACHE_TTL секунд: параллельные
+запросы (несколько открытых дашбордов, меню бота) ждут одно вычисление, а не
+запускают свое.
+"""
+import asyncio
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict
+
+from sqlalchemy import select, func
+from config import STATISTICS_CACHE_TTL
+from .models import Application, Employee
+from .counters import queue_counts_stmt, counts_by_queue
+
+
+@dataclass(frozen=True)
+class QueueStats:
+    queue_type: str
+    queued: int = 0
+    in_progress: int = 0
+    accepted: int = 0
+    rejected: int = 0
+    problem: int = 0
+
+    @property
+    def completed(self):
+        return self.accepted + self.rejected
+
+    @property
+    def total(self):
+        return self.queued + self.in_progress + self.accepted + self.rejected + self.problem
+
+    def as_dict(self):
+        return {
+            "queue_type": self.queue_type,
+            "total": self.total,
+            "queued": self.queued,
+            "in_progress": self.in_progress,
+            "accepted": self.accepted,
+            "rejected": self.rejected,
+            "problem": self.problem
+        }
+
+
+@dataclass(frozen=True)
+class StatisticsSnapshot:
+    queues: Dict[str, QueueStats] = field(default_factory=dict)
+    created_at: float = 0.0
+
+    def queue(self, queue_type: str) -> QueueStats:
+        """Статистика очереди (нулевая, если заявлений в ней нет)"""
+        return self.queues.get(queue_type) or QueueStats(queue_type)
+
+
+def statistics_stmt():
+    """Один запрос: SUM счетчиков по всем парам (queue_type, status)"""
+    return queue_counts_stmt()
+
+
+def build_snapshot(rows) -> StatisticsSnapshot:
+    queues = {
+        queue_type: QueueStats(queue_type, **counts)
+        for queue_type, counts in counts_by_queue(rows).items()
+    }
+    return StatisticsSnapshot(queues=queues, created_at=time.time())
+
+
+class _SnapshotCache:
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._snapshot = None
+        self._expires_at = 0.0
+        self.thread_lock = threading.Lock()
+        self._async_lock = None
+
+    def fresh(self):
+        if self._snapshot is not None and time.monotonic() < self._expires_at:
+            return self._snapshot
+        return None
+
+    def store(self, snapshot: StatisticsSnapshot):
+        self._snapshot = snapshot
+        self._expires_at = time.monotonic() + self.ttl
+        return snapshot
+
+    def invalidate(self):
+        self._expires_at = 0.0
+
+    @property
+    def async_lock(self):
+        if self._async_lock is None:
+            self._async_lock = asyncio.Lock()
+        return self._async_lock
+
+
+_cache = _SnapshotCache(STATISTICS_CACHE_TTL)
+
+
+def get_statistics_snapshot_sync(db) -> StatisticsSnapshot:
+    """Снимок статистики для синхронной сессии (веб-интерфейс)"""
+    snapshot = _cache.fresh()
+    if snapshot:
+        return snapshot
+    with _cache.thread_lock:
+        # Пока ждали блокировку, снимок мог посчитать другой поток
+        snapshot = _cache.fresh()
+        if snapshot:
+            return snapshot
+        return _cache.store(build_snapshot(db.execute(statistics_stmt()).all()))
+
+
+async def get_statistics_snapshot(session) -> StatisticsSnapshot:
+    """Снимок статистики для асинхронной сессии (бот)"""
+    snapshot = _cache.fresh()
+    if snapshot:
+        return snapshot
+    async with _cache.async_lock:
+        snapshot = _cache.fresh()
+        if snapshot:
+            return snapshot
+        result = await session.execute(statistics_stmt())
+        return _cache.store(build_snapshot(result.all()))
+
+
+def invalidate_statistics():
+    """Сбросить кешированный снимок (например, после импорта или очистки очереди)"""
+    _cache.invalidate()
+
+
+def processed_by_queue_stmt(start, end):
+    """
+    Обработанные за период заявления: один GROUP BY по очереди и сотруднику.
+    Строки: queue_type, employee_id, employee_fio, n
+    """
+    return select(
+        Application.queue_type,
+        Employee.id,
+        Employee.fio,
+        func.count(Application.id)
+    ).outerjoin(
+        Employee, Employee.id == Application.processed_by_id
+    ).where(
+        Application.processed_at >= start,
+        Application.processed_at <= end
+    ).group_by(Application.queue_type, Employee.id, Employee.fio)
+
+
+def build_processed_report(rows):
+    """Строки processed_by_queue_stmt -> {queue_type: {'total': n, 'by_employee': {fio: n}}}"""
+    report = {}
+    for queue_type, employee_id, employee_fio, n in rows:
+        queue_report = report.setdefault(queue_type, {'total': 0, 'by_employee': {}})
+        queue_report['total'] += n
+        if employee_id is not None:
+            emp_fio = employee_fio or f"ID:{employee_id}"
+            queue_report['by_employee'][emp_fio] = queue_report['by_employee'].get(emp_fio, 0) + n
+    return report
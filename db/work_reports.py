@@ -0,0 +1,102 @@
+"""
+Отчеты по рабочему времени за день одним запросом.
+
+Рабочие дни соединяются с сотрудниками и с перерывами, агрегированными по дню:
+сумма закрытых перерывов, начало открытого перерыва и списки начала/окончания/
+длительности в порядке начала. Для незавершенных дней (активный или на паузе) время
+перерывов и работы досчитывается в SQL относительно now() по московскому времени,
+как get_moscow_now; для завершенных берутся сохраненные итоги. Результат — строки,
+которые build_work_day_report превращает в словари отчета.
+"""
+from sqlalchemy import select, func, case, and_, cast, Integer
+from sqlalchemy.dialects.postgresql import aggregate_order_by
+from .models import WorkDay, WorkBreak, Employee, WorkDayStatusEnum
+
+MOSCOW_TZ = "Europe/Moscow"
+
+
+def _seconds_between(start, end):
+    """Целые секунды между двумя timestamp (как int(timedelta.total_seconds()))"""
+    return cast(func.floor(func.extract("epoch", end - start)), Integer)
+
+
+def work_day_report_stmt(day_start, day_end, employee_id: int = None):
+    """
+    SELECT рабочих дней за период [day_start, day_end] (одного сотрудника, если
+    задан employee_id) с сотрудником, итогами времени и перерывами — одним запросом
+    """
+    day_filter = [WorkDay.date >= day_start, WorkDay.date <= day_end]
+    if employee_id is not None:
+        day_filter.append(WorkDay.employee_id == employee_id)
+
+    def ordered(column):
+        return func.array_agg(aggregate_order_by(column, WorkBreak.start_time, WorkBreak.id))
+
+    breaks = select(
+        WorkBreak.work_day_id,
+        func.sum(WorkBreak.duration).filter(WorkBreak.end_time.isnot(None)).label("closed_break_time"),
+        func.max(WorkBreak.start_time).filter(WorkBreak.end_time.is_(None)).label("open_break_start"),
+        ordered(WorkBreak.start_time).label("break_starts"),
+        ordered(WorkBreak.end_time).label("break_ends"),
+        ordered(WorkBreak.duration).label("break_durations")
+    ).join(WorkDay, WorkDay.id == WorkBreak.work_day_id).where(*day_filter).group_by(WorkBreak.work_day_id).subquery()
+
+    now = func.timezone(MOSCOW_TZ, func.now())
+    is_open = and_(
+        WorkDay.status.in_([WorkDayStatusEnum.ACTIVE, WorkDayStatusEnum.PAUSED]),
+        WorkDay.start_time.isnot(None),
+        WorkDay.end_time.is_(None)
+    )
+    # Закрытые перерывы плюс текущий открытый
+    open_break_time = case(
+        (breaks.c.open_break_start.isnot(None), _seconds_between(breaks.c.open_break_start, now)),
+        else_=0
+    )
+    live_break_time = func.coalesce(breaks.c.closed_break_time, 0) + open_break_time
+    total_break_time = case((is_open, live_break_time), else_=WorkDay.total_break_time)
+    total_work_time = case(
+        (is_open, _seconds_between(WorkDay.start_time, now) - live_break_time),
+        else_=WorkDay.total_work_time
+    )
+
+    return select(
+        WorkDay.employee_id,
+        Employee.fio.label("employee_fio"),
+        Employee.tg_id.label("employee_tg_id"),
+        WorkDay.date,
+        WorkDay.start_time,
+        WorkDay.end_time,
+        total_work_time.label("total_work_time"),
+        total_break_time.label("total_break_time"),
+        WorkDay.applications_processed,
+        WorkDay.status,
+        breaks.c.break_starts,
+        breaks.c.break_ends,
+        breaks.c.break_durations
+    ).join(
+        Employee, Employee.id == WorkDay.employee_id
+    ).outerjoin(
+        breaks, breaks.c.work_day_id == WorkDay.id
+    ).where(*day_filter).order_by(WorkDay.id)
+
+
+def build_work_day_report(row) -> dict:
+    """Строка work_day_report_stmt -> словарь отчета по рабочему дню"""
+    return {
+        "employee_id": row.employee_id,
+        "employee_fio": row.employee_fio,
+        "employee_tg_id": row.employee_tg_id,
+        "date": row.date.date() if row.date else None,
+        "start_time": row.start_time,
+        "end_time": row.end_time,
+        "total_work_time": row.total_work_time,
+        "total_break_time": row.total_break_time,
+        "applications_processed": row.applications_processed,
+        "status": row.status.value,
+        "breaks": [
+            {"start_time": start_time, "end_time": end_time, "duration": duration}
+            for start_time, end_time, duration in zip(
+                row.break_starts or [], row.break_ends or [], row.break_durations or []
+            )
+        ]
+    }
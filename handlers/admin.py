@@ -1,22 +1,27 @@
 from aiogram import Router, F
+from aiogram.filters import Command
 from aiogram.types import CallbackQuery, Message, InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 from db.crud import (
-    add_employee, remove_employee, add_group_to_employee, remove_group_from_employee, list_employees_with_groups, is_admin, get_employee_by_tg_id, get_applications_by_queue_type, clear_queue_by_type, import_applications_from_excel, import_1c_applications_from_excel, get_all_work_days_report,
-    get_applications_statistics_by_queue, search_applications_by_fio, update_application_field, delete_application, get_all_employees, export_overdue_mail_applications_to_excel, create_database_backup,
-    update_employee_fio, get_employee_by_id, admin_start_work_day, admin_end_work_day, clear_work_time_data, import_epgu_mail_applications_from_excel
+    add_employee, remove_employee, add_group_to_employee, remove_group_from_employee, list_employees_with_groups, is_admin, get_employee_by_tg_id, get_applications_by_queue_type, clear_queue_by_type, get_all_work_days_report,
+    get_applications_statistics_by_queue, get_statistics, search_applications, update_application_field, delete_application, get_all_employees, export_overdue_mail_applications_to_excel, create_database_backup,
+    update_employee_fio, get_employee_by_id, admin_start_work_day, admin_end_work_day, clear_work_time_data,
+    get_import_jobs, cancel_queued_import_job, get_epgu_duplicate_id
 )
-from keyboards.admin import admin_main_menu_keyboard, admin_staff_menu_keyboard, admin_queue_menu_keyboard, admin_queue_type_keyboard, admin_queue_pagination_keyboard, group_choice_keyboard, admin_reports_menu_keyboard, admin_search_applications_keyboard, admin_application_edit_keyboard, admin_queue_choice_keyboard, admin_status_choice_keyboard, admin_problem_status_choice_keyboard, admin_cancel_keyboard, admin_chat_settings_keyboard, admin_thread_settings_keyboard, admin_employee_selection_keyboard, admin_work_time_management_keyboard
+from keyboards.admin import admin_main_menu_keyboard, admin_staff_menu_keyboard, admin_queue_menu_keyboard, admin_queue_type_keyboard, admin_queue_pagination_keyboard, group_choice_keyboard, admin_reports_menu_keyboard, admin_search_applications_keyboard, admin_application_edit_keyboard, admin_queue_choice_keyboard, admin_status_choice_keyboard, admin_problem_status_choice_keyboard, admin_cancel_keyboard, admin_chat_settings_keyboard, admin_thread_settings_keyboard, admin_employee_selection_keyboard, admin_work_time_management_keyboard, admin_import_progress_keyboard
 from keyboards.main import main_menu_keyboard
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 from sqlalchemy import select
 from db.crud import Application, ApplicationStatusEnum, get_application_by_id
+from db.search import is_searchable, SEARCH_MIN_LENGTH
+from db.lookup import get_applicant_index
 from datetime import date, datetime
-from utils.logger import get_logger
+from utils.excel import upload_suffix
+from utils.workers import cancel_jobs
+from utils.import_jobs import submit_import_job, job_file_path, format_import_job
 import logging
 import os
-import tempfile
 import json
 
 router = Router()
@@ -60,6 +65,23 @@ cancel_keyboard = InlineKeyboardMarkup(inline_keyboard=[
     [InlineKeyboardButton(text="Отмена", callback_data="admin_menu")]
 ])
 
+@router.message(Command("lookupstats"))
+async def admin_lookup_stats(message: Message):
+    """Размер и память индекса заявителей для inline-поиска"""
+    if not await check_admin(message.from_user.id):
+        return
+    index = get_applicant_index()
+    if index is None:
+        await message.answer("Индекс заявителей выключен (LOOKUP_INDEX_ENABLED), inline-поиск идет запросами к БД.")
+        return
+    stats = index.stats()
+    await message.answer(
+        f"🔎 Индекс заявителей: {'готов' if stats['ready'] else 'перестраивается'}\n"
+        f"Заявлений: {stats['entries']}\n"
+        f"Токенов: {stats['tokens']}\n"
+        f"Память: ~{stats['memory_mb']} МБ"
+    )
+
 @router.callback_query(F.data == "admin_menu")
 async def admin_menu(callback: CallbackQuery, state: FSMContext):
     if not await check_admin(callback.from_user.id):
@@ -326,7 +348,7 @@ async def admin_queue_type_action(callback: CallbackQuery, state: FSMContext):
         await callback.message.edit_text(f"Вы уверены, что хотите очистить очередь {queue_type}?", reply_markup=kb)
     elif action == "upload":
         await state.set_state(AdminQueueStates.waiting_upload_file)
-        await callback.message.edit_text(f"Отправьте Excel-файл для загрузки заявлений в очередь {queue_type}.", reply_markup=admin_queue_menu_keyboard())
+        await callback.message.edit_text(f"Отправьте Excel-файл (.xlsx, .xls), CSV/TSV или .zip с таблицей для загрузки заявлений в очередь {queue_type}.", reply_markup=admin_queue_menu_keyboard())
 
 @router.callback_query(F.data.startswith("admin_queue_page_"))
 async def admin_queue_page(callback: CallbackQuery, state: FSMContext):
@@ -370,84 +392,45 @@ async def admin_confirm_clear_queue(callback: CallbackQuery, state: FSMContext):
     await callback.message.edit_text(f"Очередь {queue_type} очищена!", reply_markup=admin_queue_menu_keyboard())
     await state.clear()
 
+async def save_import_upload(message: Message) -> str:
+    """Сохранить загруженный документ в каталог заданий импорта; возвращает путь"""
+    file = await message.bot.download(message.document)
+    file_path = job_file_path(upload_suffix(message.document.file_name))
+    with open(file_path, "wb") as f:
+        f.write(file.getvalue())
+    return file_path
+
 @router.message(AdminQueueStates.waiting_upload_file)
 async def admin_upload_queue_file(message: Message, state: FSMContext):
     data = await state.get_data()
     queue_type = data.get("queue_type")
     if not message.document:
-        await message.answer("Пожалуйста, отправьте Excel-файл.")
+        await message.answer("Пожалуйста, отправьте Excel-файл, CSV/TSV или .zip с таблицей.")
         return
-    progress_msg = await message.answer("📄 Документ получен. Начинаю скачивание и обработку...")
+    progress_msg = await message.answer("📄 Документ получен. Ставлю импорт в очередь...")
     try:
-        file = await message.bot.download(message.document)
-        import os
-        import tempfile
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.xlsx') as tmp:
-            tmp.write(file.getvalue())
-            tmp_path = tmp.name
-        # Создаем callback для обновления сообщения о прогрессе
-        async def update_progress_message(text):
-            try:
-                await progress_msg.edit_text(
-                    f"📄 Документ получен. Начинаю скачивание и обработку...\n\n{text}",
-                    reply_markup=admin_queue_menu_keyboard()
-                )
-            except Exception:
-                pass  # Игнорируем ошибки обновления
-        if queue_type == "epgu_mail":
-            from db.crud import import_epgu_mail_applications_from_excel
-            from db.crud import get_employee_by_tg_id
-            emp = await get_employee_by_tg_id(str(message.from_user.id))
-            employee_name = emp.fio if emp else str(message.from_user.id)
-            result = await import_epgu_mail_applications_from_excel(tmp_path, employee_name, update_progress_message)
-            os.unlink(tmp_path)
-            added = result.get('added', '?')
-            moved = result.get('moved', '?')
-            skipped = result.get('skipped', '?')
-            total = result.get('total', '?')
-            await progress_msg.edit_text(
-                f"Импорт завершён для очереди: {queue_type}.\n"
-                f"Всего строк: {total}\n"
-                f"Добавлено новых: {added}\n"
-                f"Перенесено из epgu: {moved}\n"
-                f"Пропущено: {skipped}",
-                reply_markup=admin_queue_menu_keyboard()
-            )
-            await state.clear()
-            return
-        from db.crud import import_applications_from_excel
-        result = await import_applications_from_excel(tmp_path, queue_type, update_progress_message)
-        os.unlink(tmp_path)
-        if isinstance(result, dict):
-            added = result.get('added', '?')
-            skipped = result.get('skipped', '?')
-            total = result.get('total', '?')
-        elif isinstance(result, tuple) and len(result) == 3:
-            added, skipped, total = result
-        else:
-            added = skipped = total = '?'
-        telegram_logger = get_logger()
-        if telegram_logger and added and added != '?' and int(added) > 0:
-            emp = await get_employee_by_tg_id(str(message.from_user.id))
-            if emp:
-                await telegram_logger.log_queue_updated(queue_type, emp.fio, int(added))
+        file_path = await save_import_upload(message)
+        emp = await get_employee_by_tg_id(str(message.from_user.id))
+        # Импорт выполняется фоновым исполнителем, прогресс и отчет — в этом же сообщении
+        job = await submit_import_job(
+            queue_type, file_path, message.document.file_name, str(message.from_user.id),
+            employee_name=emp.fio if emp else str(message.from_user.id),
+            chat_id=progress_msg.chat.id, message_id=progress_msg.message_id
+        )
         await progress_msg.edit_text(
-            f"Импорт завершён для очереди: {queue_type}.\n"
-            f"Всего строк: {total}\n"
-            f"Добавлено: {added}\n"
-            f"Пропущено: {skipped}",
-            reply_markup=admin_queue_menu_keyboard()
+            f"📥 Задание импорта #{job.id} поставлено в очередь ({queue_type}).\n"
+            "Прогресс и итог появятся в этом сообщении.",
+            reply_markup=admin_import_progress_keyboard(job.id)
         )
-        await state.clear()
     except Exception as e:
-        await progress_msg.edit_text(f"Ошибка при импорте: {e}", reply_markup=admin_queue_menu_keyboard())
-        await state.clear()
+        await progress_msg.edit_text(f"Ошибка при постановке импорта: {e}", reply_markup=admin_queue_menu_keyboard())
+    await state.clear()
 
 @router.callback_query(F.data == "admin_upload_1c")
 async def admin_upload_1c(callback: CallbackQuery, state: FSMContext):
     await state.set_state(AdminQueueStates.waiting_1c_upload_file)
     await callback.message.edit_text(
-        "Отправьте Excel-файл с выгрузкой из 1С для импорта заявлений ЛК и ЕПГУ.\n\n"
+        "Отправьте выгрузку из 1С (.xlsx, .xls, CSV/TSV или .zip) для импорта заявлений ЛК и ЕПГУ.\n\n"
         "Функция автоматически:\n"
         "• Определит тип очереди по способу подачи\n"
         "• Обработает статусы заявлений\n"
@@ -459,84 +442,63 @@ async def admin_upload_1c(callback: CallbackQuery, state: FSMContext):
 @router.message(AdminQueueStates.waiting_1c_upload_file)
 async def admin_upload_1c_file(message: Message, state: FSMContext):
     if not message.document:
-        await message.answer("Пожалуйста, отправьте Excel-файл с выгрузкой из 1С.")
+        await message.answer("Пожалуйста, отправьте файл с выгрузкой из 1С (.xlsx, .xls, CSV/TSV или .zip).")
         return
     
-    progress_msg = await message.answer("📄 Документ получен. Начинаю обработку выгрузки 1С...\n\n⏳ Обработка может занять некоторое время для больших файлов.")
+    progress_msg = await message.answer("📄 Документ получен. Ставлю импорт выгрузки 1С в очередь...")
     
     try:
-        file = await message.bot.download(message.document)
-        import os
-        import tempfile
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.xlsx') as tmp:
-            tmp.write(file.getvalue())
-            tmp_path = tmp.name
-        
-        # Создаем callback для обновления сообщения о прогрессе
-        async def update_progress_message(text):
-            try:
-                await progress_msg.edit_text(
-                    f"📄 Документ получен. Начинаю обработку выгрузки 1С...\n\n⏳ Обработка может занять некоторое время для больших файлов.\n\n{text}",
-                    reply_markup=admin_queue_menu_keyboard()
-                )
-            except Exception:
-                pass  # Игнорируем ошибки обновления
-        
-        # Импортируем заявления из 1С
-        result = await import_1c_applications_from_excel(tmp_path, update_progress_message)
-        os.unlink(tmp_path)
-        
-        # Формируем отчет
-        report_text = "📊 Импорт выгрузки 1С завершён\n\n"
-        
-        # ЛК заявления
-        lk_data = result.get('lk', {})
-        lk_added = lk_data.get('added', 0)
-        lk_updated = lk_data.get('updated', 0)
-        lk_skipped = lk_data.get('skipped', 0)
-        lk_total = lk_data.get('total', 0)
-        
-        report_text += f"📱 ЛК заявления:\n"
-        report_text += f"   Всего обработано: {lk_total}\n"
-        report_text += f"   Добавлено: {lk_added}\n"
-        report_text += f"   Обновлено: {lk_updated}\n"
-        report_text += f"   Пропущено: {lk_skipped}\n\n"
-        
-        # ЕПГУ заявления
-        epgu_data = result.get('epgu', {})
-        epgu_added = epgu_data.get('added', 0)
-        epgu_updated = epgu_data.get('updated', 0)
-        epgu_skipped = epgu_data.get('skipped', 0)
-        epgu_total = epgu_data.get('total', 0)
-        
-        report_text += f"🌐 ЕПГУ заявления:\n"
-        report_text += f"   Всего обработано: {epgu_total}\n"
-        report_text += f"   Добавлено: {epgu_added}\n"
-        report_text += f"   Обновлено: {epgu_updated}\n"
-        report_text += f"   Пропущено: {epgu_skipped}\n\n"
-        
-        # Логируем обновление очередей
-        telegram_logger = get_logger()
-        if telegram_logger:
-            emp = await get_employee_by_tg_id(str(message.from_user.id))
-            if emp:
-                if lk_added > 0 or lk_updated > 0:
-                    await telegram_logger.log_queue_updated('lk', emp.fio, lk_added + lk_updated)
-                if epgu_added > 0 or epgu_updated > 0:
-                    await telegram_logger.log_queue_updated('epgu', emp.fio, epgu_added + epgu_updated)
-        
+        file_path = await save_import_upload(message)
+        emp = await get_employee_by_tg_id(str(message.from_user.id))
+        # Импорт выполняется фоновым исполнителем, прогресс и отчет — в этом же сообщении
+        job = await submit_import_job(
+            "1c", file_path, message.document.file_name, str(message.from_user.id),
+            employee_name=emp.fio if emp else str(message.from_user.id),
+            chat_id=progress_msg.chat.id, message_id=progress_msg.message_id
+        )
         await progress_msg.edit_text(
-            report_text,
-            reply_markup=admin_queue_menu_keyboard()
+            f"📥 Задание импорта #{job.id} (выгрузка 1С) поставлено в очередь.\n"
+            "⏳ Обработка может занять некоторое время для больших файлов — прогресс и итог появятся в этом сообщении.",
+            reply_markup=admin_import_progress_keyboard(job.id)
         )
-        await state.clear()
-        
     except Exception as e:
         await progress_msg.edit_text(
-            f"❌ Ошибка при импорте выгрузки 1С: {str(e)}", 
+            f"❌ Ошибка при постановке импорта выгрузки 1С: {str(e)}", 
             reply_markup=admin_queue_menu_keyboard()
         )
-        await state.clear()
+    await state.clear()
+
+@router.callback_query(F.data.startswith("admin_cancel_import_"))
+async def admin_cancel_import(callback: CallbackQuery, state: FSMContext):
+    if not await check_admin(callback.from_user.id):
+        return
+    job_id = int(callback.data.replace("admin_cancel_import_", ""))
+    # Ожидающее задание снимается сразу, выполняемое прервется
+    # на ближайшей проверке флага отмены
+    cancelled = await cancel_queued_import_job(job_id)
+    if cancel_jobs(job_id) or cancelled:
+        await callback.answer("Отменяю импорт...")
+    else:
+        await callback.answer("Нет выполняемого импорта", show_alert=True)
+
+@router.callback_query(F.data == "admin_import_jobs")
+async def admin_import_jobs(callback: CallbackQuery, state: FSMContext):
+    if not await check_admin(callback.from_user.id):
+        return
+    jobs = await get_import_jobs(limit=10)
+    if not jobs:
+        text = "📥 Заданий импорта пока нет."
+    else:
+        text = "📥 Последние задания импорта:\n\n" + "\n\n".join(format_import_job(job) for job in jobs)
+    keyboard = InlineKeyboardMarkup(inline_keyboard=[
+        [InlineKeyboardButton(text="🔄 Обновить", callback_data="admin_import_jobs")],
+        [InlineKeyboardButton(text="🔙 Назад", callback_data="admin_queue_menu")]
+    ])
+    try:
+        await callback.message.edit_text(text, reply_markup=keyboard)
+    except Exception:
+        pass  # Сообщение не изменилось
+    await callback.answer()
 
 @router.callback_query(F.data == "admin_reports_menu")
 async def admin_reports_menu(callback: CallbackQuery, state: FSMContext):
@@ -692,33 +654,34 @@ async def admin_applications_report(callback: CallbackQuery, state: FSMContext):
     if not await check_admin(callback.from_user.id):
         return
     
-    # Получаем отчет по заявлениям за сегодня
+    # Получаем отчет по заявлениям за сегодня и текущее состояние очередей
     queue_stats = await get_applications_statistics_by_queue()
+    snapshot = await get_statistics()
     
-    if not queue_stats:
-        await callback.message.edit_text(
-            "Нет данных о заявлениях за сегодня.",
-            reply_markup=admin_reports_menu_keyboard()
-        )
-        return
+    # Сортируем очереди для красивого отображения
+    queue_order = ['lk', 'epgu', 'epgu_mail', 'epgu_problem']
+    queue_names = {
+        'lk': 'ЛК',
+        'epgu': 'ЕПГУ',
+        'epgu_mail': 'ЕПГУ (почта)',
+        'epgu_problem': 'ЕПГУ (проблемы)'
+    }
     
     # Формируем отчет по заявлениям
     report_text = f"📋 ОТЧЕТ ПО ЗАЯВЛЕНИЯМ за {date.today().strftime('%d.%m.%Y')}\n\n"
     
-    total_applications = 0
+    report_text += "📥 Сейчас в очередях:\n"
+    for queue_type in queue_order:
+        current = snapshot.queue(queue_type)
+        report_text += f"   {queue_names[queue_type]}: в очереди {current.queued}, в работе {current.in_progress}\n"
+    report_text += "\n"
     
-    # Сортируем очереди для красивого отображения
-    queue_order = ['lk', 'epgu', 'epgu_mail', 'epgu_problem']
+    total_applications = 0
     
     for queue_type in queue_order:
         if queue_type in queue_stats:
             stats = queue_stats[queue_type]
-            queue_name = {
-                'lk': 'ЛК',
-                'epgu': 'ЕПГУ',
-                'epgu_mail': 'ЕПГУ (почта)',
-                'epgu_problem': 'ЕПГУ (проблемы)'
-            }.get(queue_type, queue_type)
+            queue_name = queue_names.get(queue_type, queue_type)
             
             report_text += f"📊 {queue_name}: {stats['total']} заявлений\n"
             
@@ -947,11 +910,11 @@ async def admin_search_by_fio_process(message: Message, state: FSMContext):
         return
     
     fio = message.text.strip()
-    if not fio:
-        await message.answer("Пожалуйста, введите ФИО для поиска.", reply_markup=admin_cancel_keyboard())
+    if not is_searchable(fio):
+        await message.answer(f"Пожалуйста, введите ФИО для поиска (не менее {SEARCH_MIN_LENGTH} символов).", reply_markup=admin_cancel_keyboard())
         return
     
-    applications = await search_applications_by_fio(fio)
+    applications = await search_applications(fio)
     
     if not applications:
         await message.answer(
@@ -1156,6 +1119,16 @@ async def admin_set_queue(callback: CallbackQuery, state: FSMContext):
         await callback.message.edit_text("❌ Неизвестный тип очереди", reply_markup=admin_cancel_keyboard())
         return
     
+    if queue_type == "epgu":
+        # В очереди ЕПГУ заявление уникально по ФИО и дате подачи
+        duplicate_id = await get_epgu_duplicate_id(app_id)
+        if duplicate_id:
+            await callback.message.edit_text(
+                f"❌ В очереди ЕПГУ уже есть заявление #{duplicate_id} с тем же ФИО и датой подачи",
+                reply_markup=admin_cancel_keyboard()
+            )
+            return
+    
     success = await update_application_field(app_id, "queue_type", queue_type)
     if success:
         queue_name = {
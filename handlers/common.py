@@ -2,6 +2,7 @@ from aiogram import Router, F
 from aiogram.types import Message, CallbackQuery
 from aiogram.filters import Command
 from aiogram.exceptions import TelegramNetworkError, TelegramAPIError
+from sqlalchemy.ext.asyncio import AsyncSession
 from db.crud import get_employee_by_tg_id, start_work_day, end_work_day, start_break, end_break, get_current_work_day, get_work_day_report, get_moscow_now, get_active_break
 from keyboards.main import main_menu_keyboard
 from keyboards.work_time import work_time_keyboard, work_status_keyboard
@@ -54,8 +55,8 @@ async def safe_edit_message(callback: CallbackQuery, text: str, reply_markup=Non
 
 @router.message(Command("start"))
 @router.message(Command("help"))
-async def start_handler(message: Message):
-    emp = await get_employee_by_tg_id(str(message.from_user.id))
+async def start_handler(message: Message, session: AsyncSession):
+    emp = await get_employee_by_tg_id(str(message.from_user.id), session=session)
     if not emp:
         return
     is_admin = emp.is_admin
@@ -66,8 +67,8 @@ async def start_handler(message: Message):
     )
 
 @router.callback_query(F.data == "main_menu")
-async def main_menu_callback(callback: CallbackQuery):
-    emp = await get_employee_by_tg_id(str(callback.from_user.id))
+async def main_menu_callback(callback: CallbackQuery, session: AsyncSession):
+    emp = await get_employee_by_tg_id(str(callback.from_user.id), session=session)
     if not emp:
         return
     is_admin = emp.is_admin
@@ -78,15 +79,15 @@ async def main_menu_callback(callback: CallbackQuery):
     )
 
 @router.callback_query(F.data == "work_time_menu")
-async def work_time_menu(callback: CallbackQuery):
-    emp = await get_employee_by_tg_id(str(callback.from_user.id))
+async def work_time_menu(callback: CallbackQuery, session: AsyncSession):
+    emp = await get_employee_by_tg_id(str(callback.from_user.id), session=session)
     if not emp:
         return
     
-    current_work_day = await get_current_work_day(emp.id)
+    current_work_day = await get_current_work_day(emp.id, session=session)
     if current_work_day:
         # Проверяем, есть ли активный перерыв
-        active_break = await get_active_break(current_work_day.id)
+        active_break = await get_active_break(current_work_day.id, session=session)
         
         # Определяем статус для отображения
         display_status = current_work_day.status.value
@@ -136,12 +137,12 @@ async def work_time_menu(callback: CallbackQuery):
         )
 
 @router.callback_query(F.data == "start_work_day")
-async def start_work_day_handler(callback: CallbackQuery):
-    emp = await get_employee_by_tg_id(str(callback.from_user.id))
+async def start_work_day_handler(callback: CallbackQuery, session: AsyncSession):
+    emp = await get_employee_by_tg_id(str(callback.from_user.id), session=session)
     if not emp:
         return
     
-    work_day = await start_work_day(emp.id)
+    work_day = await start_work_day(emp.id, session=session)
     if work_day:
         # Логируем событие
         telegram_logger = get_logger()
@@ -159,13 +160,13 @@ async def start_work_day_handler(callback: CallbackQuery):
         await callback.answer("Рабочий день уже начат!", show_alert=True)
 
 @router.callback_query(F.data == "confirm_end_work_day")
-async def confirm_end_work_day_handler(callback: CallbackQuery):
-    emp = await get_employee_by_tg_id(str(callback.from_user.id))
+async def confirm_end_work_day_handler(callback: CallbackQuery, session: AsyncSession):
+    emp = await get_employee_by_tg_id(str(callback.from_user.id), session=session)
     if not emp:
         return
     
     # Проверяем, есть ли активный рабочий день
-    current_work_day = await get_current_work_day(emp.id)
+    current_work_day = await get_current_work_day(emp.id, session=session)
     if not current_work_day or current_work_day.end_time:
         await callback.answer("Нет активного рабочего дня!")
         return
@@ -179,16 +180,16 @@ async def confirm_end_work_day_handler(callback: CallbackQuery):
     )
 
 @router.callback_query(F.data == "cancel_end_work_day")
-async def cancel_end_work_day_handler(callback: CallbackQuery):
-    emp = await get_employee_by_tg_id(str(callback.from_user.id))
+async def cancel_end_work_day_handler(callback: CallbackQuery, session: AsyncSession):
+    emp = await get_employee_by_tg_id(str(callback.from_user.id), session=session)
     if not emp:
         return
     
     # Возвращаемся к статусу рабочего дня
-    current_work_day = await get_current_work_day(emp.id)
+    current_work_day = await get_current_work_day(emp.id, session=session)
     if current_work_day:
         # Проверяем, есть ли активный перерыв
-        active_break = await get_active_break(current_work_day.id)
+        active_break = await get_active_break(current_work_day.id, session=session)
         
         # Определяем статус для отображения
         display_status = current_work_day.status.value
@@ -237,12 +238,12 @@ async def cancel_end_work_day_handler(callback: CallbackQuery):
         )
 
 @router.callback_query(F.data == "end_work_day")
-async def end_work_day_handler(callback: CallbackQuery):
-    emp = await get_employee_by_tg_id(str(callback.from_user.id))
+async def end_work_day_handler(callback: CallbackQuery, session: AsyncSession):
+    emp = await get_employee_by_tg_id(str(callback.from_user.id), session=session)
     if not emp:
         return
     
-    work_day = await end_work_day(emp.id)
+    work_day = await end_work_day(emp.id, session=session)
     if work_day:
         work_time_str = f"{work_day.total_work_time // 3600:02d}:{(work_day.total_work_time % 3600) // 60:02d}"
         break_time_str = f"{work_day.total_break_time // 3600:02d}:{(work_day.total_break_time % 3600) // 60:02d}"
@@ -267,15 +268,15 @@ async def end_work_day_handler(callback: CallbackQuery):
         await callback.answer("Рабочий день не найден!", show_alert=True)
 
 @router.callback_query(F.data == "start_break")
-async def start_break_handler(callback: CallbackQuery):
-    emp = await get_employee_by_tg_id(str(callback.from_user.id))
+async def start_break_handler(callback: CallbackQuery, session: AsyncSession):
+    emp = await get_employee_by_tg_id(str(callback.from_user.id), session=session)
     if not emp:
         return
-    work_break = await start_break(emp.id)
+    work_break = await start_break(emp.id, session=session)
     if work_break:
         # Показываем обновленный статус рабочего дня
-        current_work_day = await get_current_work_day(emp.id)
-        active_break = await get_active_break(current_work_day.id)
+        current_work_day = await get_current_work_day(emp.id, session=session)
+        active_break = await get_active_break(current_work_day.id, session=session)
         display_status = current_work_day.status.value
         if active_break and current_work_day.status.value == "active":
             display_status = "paused"
@@ -313,18 +314,18 @@ async def start_break_handler(callback: CallbackQuery):
         await callback.answer("Не удалось начать перерыв!", show_alert=True)
 
 @router.callback_query(F.data == "end_break")
-async def end_break_handler(callback: CallbackQuery):
+async def end_break_handler(callback: CallbackQuery, session: AsyncSession):
     try:
-        emp = await get_employee_by_tg_id(str(callback.from_user.id))
+        emp = await get_employee_by_tg_id(str(callback.from_user.id), session=session)
         if not emp:
             print("[end_break_handler] Нет сотрудника")
             return
-        work_break = await end_break(emp.id)
+        work_break = await end_break(emp.id, session=session)
         print(f"[end_break_handler] work_break: {work_break}")
         if work_break:
             # Показываем обновленный статус рабочего дня
-            current_work_day = await get_current_work_day(emp.id)
-            active_break = await get_active_break(current_work_day.id)
+            current_work_day = await get_current_work_day(emp.id, session=session)
+            active_break = await get_active_break(current_work_day.id, session=session)
             display_status = current_work_day.status.value
             current_time = get_moscow_now()
             total_work_seconds = current_work_day.total_work_time
@@ -366,12 +367,12 @@ async def end_break_handler(callback: CallbackQuery):
         await callback.answer(f"Ошибка: {e}", show_alert=True)
 
 @router.callback_query(F.data == "work_report")
-async def work_report_handler(callback: CallbackQuery):
-    emp = await get_employee_by_tg_id(str(callback.from_user.id))
+async def work_report_handler(callback: CallbackQuery, session: AsyncSession):
+    emp = await get_employee_by_tg_id(str(callback.from_user.id), session=session)
     if not emp:
         return
     
-    report = await get_work_day_report(emp.id)
+    report = await get_work_day_report(emp.id, session=session)
     if report:
         work_time_str = f"{report['total_work_time'] // 3600:02d}:{(report['total_work_time'] % 3600) // 60:02d}"
         break_time_str = f"{report['total_break_time'] // 3600:02d}:{(report['total_break_time'] % 3600) // 60:02d}"
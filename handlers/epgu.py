@@ -3,24 +3,25 @@ from aiogram.filters import Command
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 from aiogram.types import Message, CallbackQuery
+from sqlalchemy.ext.asyncio import AsyncSession
 from db.crud import (
     get_next_epgu_application, 
     update_application_status, 
-    update_application_queue_type,
     postpone_application,
     get_employee_by_tg_id, 
     has_access, 
     return_application_to_queue, 
-    increment_processed_applications,
     update_application_field,
     get_application_by_id,
-    get_applications_by_fio_and_queue,
+    search_applications_page,
     escalate_application,
     get_moscow_now,
-    get_queue_statistics
+    get_queue_statistics,
+    decide_application
 )
 from db.models import ApplicationStatusEnum, EPGUActionEnum
-from keyboards.epgu import epgu_queue_keyboard, epgu_decision_keyboard, epgu_reason_keyboard, epgu_escalate_keyboard, epgu_search_results_keyboard
+from db.search import is_searchable, page_cursors, decode_search_cursor, SEARCH_MIN_LENGTH
+from keyboards.epgu import epgu_queue_keyboard, epgu_decision_keyboard, epgu_reason_keyboard, epgu_search_results_keyboard, epgu_search_page_keyboard
 from keyboards.main import main_menu_keyboard
 from config import ADMIN_CHAT_ID
 from utils.logger import get_logger
@@ -35,15 +36,31 @@ class EPGUStates(StatesGroup):
     waiting_reason = State()
     waiting_search_fio = State()
 
+SEARCH_STATUS_EMOJI = {
+    'queued': '⏳',
+    'in_progress': '🔄',
+    'accepted': '✅',
+    'rejected': '❌',
+    'problem': '⚠️'
+}
+
+SEARCH_STATUS_TEXT = {
+    'queued': 'В очереди',
+    'in_progress': 'В обработке',
+    'accepted': 'Принято',
+    'rejected': 'Отклонено',
+    'problem': 'Проблемное'
+}
+
 @router.callback_query(F.data == "epgu_menu")
-async def epgu_menu_entry(callback: CallbackQuery, state: FSMContext):
+async def epgu_menu_entry(callback: CallbackQuery, state: FSMContext, session: AsyncSession):
     try:
-        emp = await get_employee_by_tg_id(str(callback.from_user.id))
-        if not emp or not await has_access(str(callback.from_user.id), "epgu"):
+        emp = await get_employee_by_tg_id(str(callback.from_user.id), session=session)
+        if not emp or not await has_access(str(callback.from_user.id), "epgu", session=session):
             return
         
         # Получаем статистику по очереди ЕПГУ
-        stats = await get_queue_statistics("epgu")
+        stats = await get_queue_statistics("epgu", session=session)
         
         text = "🏛️ <b>Очередь ЕПГУ</b>\n\n"
         
@@ -68,11 +85,11 @@ async def epgu_menu_entry(callback: CallbackQuery, state: FSMContext):
         print(traceback.format_exc())
 
 @router.callback_query(F.data == "epgu_next")
-async def get_epgu_application(callback: CallbackQuery, state: FSMContext):
-    emp = await get_employee_by_tg_id(str(callback.from_user.id))
-    if not emp or not await has_access(str(callback.from_user.id), "epgu"):
+async def get_epgu_application(callback: CallbackQuery, state: FSMContext, session: AsyncSession):
+    emp = await get_employee_by_tg_id(str(callback.from_user.id), session=session)
+    if not emp or not await has_access(str(callback.from_user.id), "epgu", session=session):
         return
-    app = await get_next_epgu_application(employee_id=emp.id, bot=callback.bot)
+    app = await get_next_epgu_application(employee_id=emp.id, bot=callback.bot, session=session)
     if not app:
         await callback.message.edit_text("Очередь пуста.", reply_markup=epgu_queue_keyboard(menu=True))
         return
@@ -83,9 +100,9 @@ async def get_epgu_application(callback: CallbackQuery, state: FSMContext):
 @router.callback_query(EPGUStates.waiting_decision, F.data.in_([
     "accept_epgu", "reject_epgu", "epgu_signature", "epgu_signature_scans", "epgu_scans", "epgu_error", "return_epgu"
 ]))
-async def process_epgu_decision(callback: CallbackQuery, state: FSMContext):
-    emp = await get_employee_by_tg_id(str(callback.from_user.id))
-    if not emp or not await has_access(str(callback.from_user.id), "epgu"):
+async def process_epgu_decision(callback: CallbackQuery, state: FSMContext, session: AsyncSession):
+    emp = await get_employee_by_tg_id(str(callback.from_user.id), session=session)
+    if not emp or not await has_access(str(callback.from_user.id), "epgu", session=session):
         return
     data = await state.get_data()
     app_id = data.get("app_id")
@@ -95,20 +112,19 @@ async def process_epgu_decision(callback: CallbackQuery, state: FSMContext):
 
     if callback.data == "accept_epgu":
         # Вариант 1: Принято сразу
-        await update_application_status(app_id, ApplicationStatusEnum.ACCEPTED, employee_id=employee_id)
         # Сохраняем, что обработал сотрудник ЕПГУ
-        await update_application_field(app_id, "epgu_action", EPGUActionEnum.ACCEPTED.value)
-        await update_application_field(app_id, "epgu_processor_id", employee_id)
-        result = await increment_processed_applications(employee_id)
-        logger.info(f"Заявление ЕПГУ принято: app_id={app_id}, increment_result={result}")
+        app = await decide_application(
+            app_id, employee_id, ApplicationStatusEnum.ACCEPTED,
+            field_patches={"epgu_action": EPGUActionEnum.ACCEPTED, "epgu_processor_id": employee_id},
+            session=session
+        )
+        logger.info(f"Заявление ЕПГУ принято: app_id={app_id}")
         await callback.message.edit_text("Заявление принято.", reply_markup=epgu_decision_keyboard(menu=True))
         
         # Логируем событие
         telegram_logger = get_logger()
-        if telegram_logger:
-            app = await get_application_by_id(app_id)
-            if app:
-                await telegram_logger.log_epgu_accepted(emp.fio, app_id, app.fio)
+        if telegram_logger and app:
+            await telegram_logger.log_epgu_accepted(emp.fio, app_id, app.fio)
         
         await callback.bot.send_message(ADMIN_CHAT_ID, f"ЕПГУ: {callback.from_user.full_name} принял заявление {app_id}")
         await state.clear()
@@ -120,69 +136,75 @@ async def process_epgu_decision(callback: CallbackQuery, state: FSMContext):
         await callback.message.edit_text("Укажите причину отклонения:", reply_markup=epgu_reason_keyboard())
     elif callback.data == "epgu_signature":
         # Вариант 2: Есть сканы, отправляем на подпись (в очередь почты)
-        await update_application_queue_type(app_id, "epgu_mail", employee_id=employee_id)
-        await update_application_field(app_id, "epgu_action", EPGUActionEnum.HAS_SCANS.value)
-        await update_application_field(app_id, "epgu_processor_id", employee_id)
-        await update_application_field(app_id, "needs_scans", False)
-        await update_application_field(app_id, "needs_signature", True)
-        await update_application_field(app_id, "scans_confirmed", True)
-        await update_application_field(app_id, "signature_confirmed", False)
-        result = await increment_processed_applications(employee_id)
-        logger.info(f"Заявление ЕПГУ отправлено на подпись (есть сканы): app_id={app_id}, increment_result={result}")
+        app = await decide_application(
+            app_id, employee_id, ApplicationStatusEnum.QUEUED, queue_type="epgu_mail",
+            field_patches={
+                "epgu_action": EPGUActionEnum.HAS_SCANS,
+                "epgu_processor_id": employee_id,
+                "needs_scans": False,
+                "needs_signature": True,
+                "scans_confirmed": True,
+                "signature_confirmed": False
+            },
+            session=session
+        )
+        logger.info(f"Заявление ЕПГУ отправлено на подпись (есть сканы): app_id={app_id}")
         await callback.message.edit_text("Заявление отправлено в очередь почты для подписи.", reply_markup=epgu_decision_keyboard(menu=True))
         
         # Логируем событие
         telegram_logger = get_logger()
-        if telegram_logger:
-            app = await get_application_by_id(app_id)
-            if app:
-                await telegram_logger.log_epgu_mail_queue(emp.fio, app_id, app.fio, "Подпись (есть сканы)")
+        if telegram_logger and app:
+            await telegram_logger.log_epgu_mail_queue(emp.fio, app_id, app.fio, "Подпись (есть сканы)")
         
         await callback.bot.send_message(ADMIN_CHAT_ID, f"ЕПГУ: {callback.from_user.full_name} отправил заявление {app_id} на подпись (есть сканы)")
         await state.clear()
 
     elif callback.data == "epgu_signature_scans":
         # Вариант 3: Нет сканов, отправляем на подпись и запрашиваем сканы (в очередь почты)
-        await update_application_queue_type(app_id, "epgu_mail", employee_id=employee_id)
-        await update_application_field(app_id, "epgu_action", EPGUActionEnum.NO_SCANS.value)
-        await update_application_field(app_id, "epgu_processor_id", employee_id)
-        await update_application_field(app_id, "needs_scans", True)
-        await update_application_field(app_id, "needs_signature", True)
-        await update_application_field(app_id, "scans_confirmed", False)
-        await update_application_field(app_id, "signature_confirmed", False)
-        result = await increment_processed_applications(employee_id)
-        logger.info(f"Заявление ЕПГУ отправлено на подпись и запрос сканов: app_id={app_id}, increment_result={result}")
+        app = await decide_application(
+            app_id, employee_id, ApplicationStatusEnum.QUEUED, queue_type="epgu_mail",
+            field_patches={
+                "epgu_action": EPGUActionEnum.NO_SCANS,
+                "epgu_processor_id": employee_id,
+                "needs_scans": True,
+                "needs_signature": True,
+                "scans_confirmed": False,
+                "signature_confirmed": False
+            },
+            session=session
+        )
+        logger.info(f"Заявление ЕПГУ отправлено на подпись и запрос сканов: app_id={app_id}")
         await callback.message.edit_text("Заявление отправлено в очередь почты для подписи и запроса сканов.", reply_markup=epgu_decision_keyboard(menu=True))
         
         # Логируем событие
         telegram_logger = get_logger()
-        if telegram_logger:
-            app = await get_application_by_id(app_id)
-            if app:
-                await telegram_logger.log_epgu_mail_queue(emp.fio, app_id, app.fio, "Подпись и запрос сканов")
+        if telegram_logger and app:
+            await telegram_logger.log_epgu_mail_queue(emp.fio, app_id, app.fio, "Подпись и запрос сканов")
         
         await callback.bot.send_message(ADMIN_CHAT_ID, f"ЕПГУ: {callback.from_user.full_name} отправил заявление {app_id} на подпись и запрос сканов")
         await state.clear()
 
     elif callback.data == "epgu_scans":
         # Новый вариант: нужны только сканы, подпись не требуется
-        await update_application_queue_type(app_id, "epgu_mail", employee_id=employee_id)
-        await update_application_field(app_id, "epgu_action", EPGUActionEnum.ONLY_SCANS.value)
-        await update_application_field(app_id, "epgu_processor_id", employee_id)
-        await update_application_field(app_id, "needs_scans", True)
-        await update_application_field(app_id, "needs_signature", False)
-        await update_application_field(app_id, "scans_confirmed", False)
-        await update_application_field(app_id, "signature_confirmed", True)
-        result = await increment_processed_applications(employee_id)
-        logger.info(f"Заявление ЕПГУ отправлено в очередь почты (только сканы): app_id={app_id}, increment_result={result}")
+        app = await decide_application(
+            app_id, employee_id, ApplicationStatusEnum.QUEUED, queue_type="epgu_mail",
+            field_patches={
+                "epgu_action": EPGUActionEnum.ONLY_SCANS,
+                "epgu_processor_id": employee_id,
+                "needs_scans": True,
+                "needs_signature": False,
+                "scans_confirmed": False,
+                "signature_confirmed": True
+            },
+            session=session
+        )
+        logger.info(f"Заявление ЕПГУ отправлено в очередь почты (только сканы): app_id={app_id}")
         await callback.message.edit_text("Заявление отправлено в очередь почты для получения сканов (подпись не требуется).", reply_markup=epgu_decision_keyboard(menu=True))
         
         # Логируем событие
         telegram_logger = get_logger()
-        if telegram_logger:
-            app = await get_application_by_id(app_id)
-            if app:
-                await telegram_logger.log_epgu_mail_queue(emp.fio, app_id, app.fio, "Получение сканов")
+        if telegram_logger and app:
+            await telegram_logger.log_epgu_mail_queue(emp.fio, app_id, app.fio, "Получение сканов")
         
         await callback.bot.send_message(ADMIN_CHAT_ID, f"ЕПГУ: {callback.from_user.full_name} отправил заявление {app_id} на получение сканов (без подписи)")
         await state.clear()
@@ -195,7 +217,7 @@ async def process_epgu_decision(callback: CallbackQuery, state: FSMContext):
 
     elif callback.data == "return_epgu":
         # Вернуть в очередь
-        await return_application_to_queue(app_id)
+        await return_application_to_queue(app_id, session=session)
         await callback.message.edit_text("Заявление возвращено в очередь.", reply_markup=epgu_decision_keyboard(menu=True))
         await state.clear()
 
@@ -217,9 +239,9 @@ async def cancel_epgu_reason(callback: CallbackQuery, state: FSMContext):
         await state.clear()
 
 @router.message(EPGUStates.waiting_reason)
-async def process_epgu_reason(message: Message, state: FSMContext):
-    emp = await get_employee_by_tg_id(str(message.from_user.id))
-    if not emp or not await has_access(str(message.from_user.id), "epgu"):
+async def process_epgu_reason(message: Message, state: FSMContext, session: AsyncSession):
+    emp = await get_employee_by_tg_id(str(message.from_user.id), session=session)
+    if not emp or not await has_access(str(message.from_user.id), "epgu", session=session):
         return
     data = await state.get_data()
     app_id = data.get("app_id")
@@ -231,36 +253,34 @@ async def process_epgu_reason(message: Message, state: FSMContext):
     
     if decision == "epgu_error":
         # Перевести в очередь проблем
-        await update_application_queue_type(app_id, "epgu_problem", employee_id=employee_id, reason=reason)
-        result = await increment_processed_applications(employee_id)
-        logger.info(f"Заявление ЕПГУ помечено как проблемное: app_id={app_id}, increment_result={result}")
+        app = await decide_application(
+            app_id, employee_id, ApplicationStatusEnum.QUEUED, reason=reason, queue_type="epgu_problem", session=session
+        )
+        logger.info(f"Заявление ЕПГУ помечено как проблемное: app_id={app_id}")
         
         await message.answer(f"Заявление помечено как проблемное. Причина: {reason}", reply_markup=epgu_decision_keyboard(menu=True))
         
         # Логируем событие
         telegram_logger = get_logger()
-        if telegram_logger:
-            app = await get_application_by_id(app_id)
-            if app:
-                await telegram_logger.log_epgu_problem(emp.fio, app_id, app.fio, reason)
+        if telegram_logger and app:
+            await telegram_logger.log_epgu_problem(emp.fio, app_id, app.fio, reason)
         
         await message.bot.send_message(ADMIN_CHAT_ID, f"ЕПГУ: {message.from_user.full_name} пометил заявление {app_id} как проблемное. Причина: {reason}")
         await state.clear()
 
     elif decision == "reject_epgu":
         # Отклонить заявление
-        await update_application_status(app_id, ApplicationStatusEnum.REJECTED, reason=reason, employee_id=employee_id)
-        await update_application_field(app_id, "epgu_action", EPGUActionEnum.REJECTED.value)
-        await update_application_field(app_id, "epgu_processor_id", employee_id)
-        result = await increment_processed_applications(employee_id)
-        logger.info(f"Заявление ЕПГУ отклонено: app_id={app_id}, increment_result={result}, reason={reason}")
+        app = await decide_application(
+            app_id, employee_id, ApplicationStatusEnum.REJECTED, reason=reason,
+            field_patches={"epgu_action": EPGUActionEnum.REJECTED, "epgu_processor_id": employee_id},
+            session=session
+        )
+        logger.info(f"Заявление ЕПГУ отклонено: app_id={app_id}, reason={reason}")
         await message.answer(f"Заявление отклонено. Причина: {reason}", reply_markup=epgu_decision_keyboard(menu=True))
         # Логируем событие
         telegram_logger = get_logger()
-        if telegram_logger:
-            app = await get_application_by_id(app_id)
-            if app:
-                await telegram_logger.log_epgu_rejected(emp.fio, app_id, app.fio, reason)
+        if telegram_logger and app:
+            await telegram_logger.log_epgu_rejected(emp.fio, app_id, app.fio, reason)
         await message.bot.send_message(ADMIN_CHAT_ID, f"ЕПГУ: {message.from_user.full_name} отклонил заявление {app_id}. Причина: {reason}")
         await state.clear()
 
@@ -269,9 +289,9 @@ async def block_menu_exit_during_processing(callback: CallbackQuery, state: FSMC
     await callback.answer("Сначала обработайте текущее заявление!", show_alert=True)
 
 @router.callback_query(F.data == "epgu_search_fio")
-async def epgu_search_fio_start(callback: CallbackQuery, state: FSMContext):
-    emp = await get_employee_by_tg_id(str(callback.from_user.id))
-    if not emp or not await has_access(str(callback.from_user.id), "epgu"):
+async def epgu_search_fio_start(callback: CallbackQuery, state: FSMContext, session: AsyncSession):
+    emp = await get_employee_by_tg_id(str(callback.from_user.id), session=session)
+    if not emp or not await has_access(str(callback.from_user.id), "epgu", session=session):
         return
     
     await state.set_state(EPGUStates.waiting_search_fio)
@@ -285,21 +305,21 @@ async def epgu_search_fio_start(callback: CallbackQuery, state: FSMContext):
     )
 
 @router.message(EPGUStates.waiting_search_fio)
-async def epgu_search_fio_process(message: Message, state: FSMContext):
-    emp = await get_employee_by_tg_id(str(message.from_user.id))
-    if not emp or not await has_access(str(message.from_user.id), "epgu"):
+async def epgu_search_fio_process(message: Message, state: FSMContext, session: AsyncSession):
+    emp = await get_employee_by_tg_id(str(message.from_user.id), session=session)
+    if not emp or not await has_access(str(message.from_user.id), "epgu", session=session):
         return
     
     fio = message.text.strip()
-    if not fio:
+    if not is_searchable(fio):
         await message.answer(
-            "❌ Пожалуйста, введите ФИО для поиска.",
+            f"❌ Пожалуйста, введите ФИО для поиска (не менее {SEARCH_MIN_LENGTH} символов).",
             reply_markup=epgu_decision_keyboard(menu=True)
         )
         return
     
-    # Поиск заявлений
-    apps = await get_applications_by_fio_and_queue(fio, "epgu")
+    # Первая страница результатов
+    apps, has_prev, has_next = await search_applications_page(fio, ["epgu"], session=session)
     
     if not apps:
         await message.answer(
@@ -312,67 +332,70 @@ async def epgu_search_fio_process(message: Message, state: FSMContext):
         await state.clear()
         return
     
-    # Статус эмодзи
-    status_emoji = {
-        'queued': '⏳',
-        'in_progress': '🔄',
-        'accepted': '✅',
-        'rejected': '❌',
-        'problem': '⚠️'
-    }
-    
-    # Статус текст
-    status_text = {
-        'queued': 'В очереди',
-        'in_progress': 'В обработке',
-        'accepted': 'Принято',
-        'rejected': 'Отклонено',
-        'problem': 'Проблемное'
-    }
-    
-    # Сортируем заявления: сначала в очереди, потом по дате
-    queued_apps = [app for app in apps if app.status.value == 'queued']
-    other_apps = [app for app in apps if app.status.value != 'queued']
+    await state.clear()
+    # Запрос нужен для перехода между страницами; курсор передается в кнопках
+    await state.update_data(epgu_search_query=fio)
+    await message.answer(
+        format_epgu_search_page(fio, apps),
+        reply_markup=epgu_search_page_keyboard(apps, *page_cursors(apps, has_prev, has_next)),
+        parse_mode="HTML"
+    )
+
+@router.callback_query(F.data.startswith("epgu_search_page_"))
+async def epgu_search_page_handler(callback: CallbackQuery, state: FSMContext, session: AsyncSession):
+    emp = await get_employee_by_tg_id(str(callback.from_user.id), session=session)
+    if not emp or not await has_access(str(callback.from_user.id), "epgu", session=session):
+        return
     
-    # Сортируем по дате подачи (новые сначала)
-    queued_apps.sort(key=lambda x: x.submitted_at, reverse=True)
-    other_apps.sort(key=lambda x: x.submitted_at, reverse=True)
+    fio = (await state.get_data()).get("epgu_search_query")
+    if not fio:
+        await callback.answer("Результаты поиска устарели, выполните поиск заново.", show_alert=True)
+        return
+    # callback_data вида 'epgu_search_page_{n|p}_{курсор}'
+    direction, _, cursor = callback.data.replace("epgu_search_page_", "").partition("_")
+    try:
+        cursor = decode_search_cursor(cursor)
+    except ValueError:
+        await callback.answer("Ошибка: некорректная страница.", show_alert=True)
+        return
     
-    sorted_apps = queued_apps + other_apps
+    apps, has_prev, has_next = await search_applications_page(
+        fio, ["epgu"], cursor, backward=direction == "p", session=session
+    )
+    if not apps:
+        # Заявления могли измениться с момента показа — возвращаемся к первой странице
+        apps, has_prev, has_next = await search_applications_page(fio, ["epgu"], session=session)
+    if not apps:
+        await callback.message.edit_text(
+            f"По запросу '<code>{fio}</code>' заявлений больше нет.",
+            reply_markup=epgu_search_results_keyboard(fio, 0),
+            parse_mode="HTML"
+        )
+        await callback.answer()
+        return
     
+    await callback.message.edit_text(
+        format_epgu_search_page(fio, apps),
+        reply_markup=epgu_search_page_keyboard(apps, *page_cursors(apps, has_prev, has_next)),
+        parse_mode="HTML"
+    )
+    await callback.answer()
 
-    
-    # Отправляем детальную информацию по каждому заявлению
-    for i, app in enumerate(sorted_apps, 1):
-        text = f"🏛️ <b>Заявление ЕПГУ #{app.id}</b> ({i}/{len(sorted_apps)})\n\n"
-        text += f"👨‍💼 <b>ФИО:</b> {app.fio}\n"
-        text += f"📅 <b>Дата подачи:</b> {app.submitted_at.strftime('%d.%m.%Y %H:%M')}\n"
-        text += f"📊 <b>Статус:</b> {status_emoji.get(app.status.value, '❓')} {status_text.get(app.status.value, app.status.value)}\n"
-        
+def format_epgu_search_page(fio: str, apps) -> str:
+    """Текст страницы результатов поиска ЕПГУ"""
+    text = f"🔍 <b>Поиск ЕПГУ:</b> '<code>{fio}</code>'\n"
+    for app in apps:
+        status = app.status.value if app.status else ''
+        text += f"\n{SEARCH_STATUS_EMOJI.get(status, '❓')} <b>#{app.id}</b> {app.fio}"
         if app.is_priority:
-            text += "🚨 <b>ПРИОРИТЕТНОЕ</b>\n"
-        
-        if app.status_reason:
-            text += f"💬 <b>Причина:</b> {app.status_reason}\n"
-        
+            text += " 🚨"
+        text += f"\n   📅 {app.submitted_at.strftime('%d.%m.%Y %H:%M')} · {SEARCH_STATUS_TEXT.get(status, status)}"
         if app.processed_by:
-            text += f"👤 <b>Обработал:</b> {app.processed_by.fio}\n"
-        
-        if app.processed_at:
-            text += f"⏰ <b>Время обработки:</b> {app.processed_at.strftime('%d.%m.%Y %H:%M')}\n"
-        
-        text += f"\n🔍 <b>Поисковый запрос:</b> '<code>{fio}</code>'"
-        
-        # Отладочная информация
-        print(f"DEBUG EPGU: app.id={app.id}, app.is_priority={app.is_priority}, app.status.value={app.status.value}")
-        
-        await message.answer(
-            text, 
-            reply_markup=epgu_escalate_keyboard(app.id, app.is_priority, app.status.value), 
-            parse_mode="HTML"
-        )
-    
-    await state.clear()
+            text += f" · 👤 {app.processed_by.fio}"
+        if app.status_reason:
+            text += f"\n   💬 {app.status_reason}"
+        text += "\n"
+    return text
 
 @router.callback_query(F.data == "epgu_search_info")
 async def epgu_search_info_handler(callback: CallbackQuery):
@@ -380,7 +403,7 @@ async def epgu_search_info_handler(callback: CallbackQuery):
     await callback.answer(
         "ℹ️ Информация о поиске\n\n"
         "• Поиск выполняется по частичному совпадению ФИО\n"
-        "• Заявления сортируются: сначала в очереди, потом по дате\n"
+        "• Заявления сортируются: сначала приоритетные, потом по дате подачи\n"
         "• Можно обрабатывать заявления в статусе 'В очереди' и 'В обработке'\n"
         "• Если заявление уже обрабатывается другим сотрудником, вы получите уведомление\n"
         "• Эскалировать можно только не приоритетные заявления в очереди",
@@ -388,13 +411,13 @@ async def epgu_search_info_handler(callback: CallbackQuery):
     )
 
 @router.callback_query(F.data.startswith("epgu_escalate_"))
-async def epgu_escalate_handler(callback: CallbackQuery):
-    emp = await get_employee_by_tg_id(str(callback.from_user.id))
-    if not emp or not await has_access(str(callback.from_user.id), "epgu"):
+async def epgu_escalate_handler(callback: CallbackQuery, session: AsyncSession):
+    emp = await get_employee_by_tg_id(str(callback.from_user.id), session=session)
+    if not emp or not await has_access(str(callback.from_user.id), "epgu", session=session):
         return
     
     app_id = int(callback.data.replace("epgu_escalate_", ""))
-    app = await get_application_by_id(app_id)
+    app = await get_application_by_id(app_id, session=session)
     
     if not app:
         await callback.message.edit_text(
@@ -428,7 +451,7 @@ async def epgu_escalate_handler(callback: CallbackQuery):
         return
     
     # Выполняем эскалацию
-    success = await escalate_application(app_id)
+    success = await escalate_application(app_id, session=session)
     
     if success:
         # Логирование
@@ -463,13 +486,13 @@ async def epgu_escalate_handler(callback: CallbackQuery):
         )
 
 @router.callback_query(F.data.startswith("epgu_process_found_"))
-async def epgu_process_found_application(callback: CallbackQuery, state: FSMContext):
-    emp = await get_employee_by_tg_id(str(callback.from_user.id))
-    if not emp or not await has_access(str(callback.from_user.id), "epgu"):
+async def epgu_process_found_application(callback: CallbackQuery, state: FSMContext, session: AsyncSession):
+    emp = await get_employee_by_tg_id(str(callback.from_user.id), session=session)
+    if not emp or not await has_access(str(callback.from_user.id), "epgu", session=session):
         return
     
     app_id = int(callback.data.replace("epgu_process_found_", ""))
-    app = await get_application_by_id(app_id)
+    app = await get_application_by_id(app_id, session=session)
     
     if not app:
         await callback.message.edit_text(
@@ -506,8 +529,8 @@ async def epgu_process_found_application(callback: CallbackQuery, state: FSMCont
     
     # Берем заявление в обработку (если оно еще не в обработке)
     if app.status == ApplicationStatusEnum.QUEUED:
-        await update_application_status(app_id, ApplicationStatusEnum.IN_PROGRESS, employee_id=emp.id)
-        await update_application_field(app_id, "taken_at", get_moscow_now())
+        await update_application_status(app_id, ApplicationStatusEnum.IN_PROGRESS, employee_id=emp.id, session=session)
+        await update_application_field(app_id, "taken_at", get_moscow_now(), session=session)
     
     # Сохраняем ID заявления в состоянии для дальнейшей обработки
     await state.update_data(app_id=app_id)
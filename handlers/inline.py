@@ -0,0 +1,84 @@
+from aiogram import Router
+from aiogram.types import InlineQuery, InlineQueryResultArticle, InputTextMessageContent
+from sqlalchemy.ext.asyncio import AsyncSession
+from db.crud import get_employee_by_tg_id, search_applications
+from db.lookup import get_applicant_index
+from db.search import is_searchable
+
+router = Router()
+
+# Группа сотрудника, дающая доступ к заявлениям очереди (как has_access в хендлерах очередей).
+# Очереди без группы (например, unknown) видны только администраторам
+QUEUE_GROUPS = {
+    "lk": "lk",
+    "epgu": "epgu",
+    "epgu_mail": "mail",
+    "lk_problem": "problem",
+    "epgu_problem": "problem",
+}
+
+QUEUE_NAMES = {
+    "lk": "ЛК",
+    "epgu": "ЕПГУ",
+    "epgu_mail": "ЕПГУ (почта)",
+    "lk_problem": "ЛК (проблемы)",
+    "epgu_problem": "ЕПГУ (проблемы)",
+}
+
+STATUS_NAMES = {
+    "queued": "⏳ В очереди",
+    "in_progress": "🔄 В обработке",
+    "accepted": "✅ Принято",
+    "rejected": "❌ Отклонено",
+    "problem": "⚠️ Проблемное",
+}
+
+INLINE_RESULTS_LIMIT = 50  # Максимум результатов inline-ответа в Telegram
+INLINE_CACHE_TIME = 10  # Секунд, которые Telegram кеширует ответ на тот же запрос
+
+def allowed_queues(emp):
+    """Очереди, заявления которых видит сотрудник; None — все (администратор)"""
+    if emp.is_admin:
+        return None
+    groups = {g.name for g in emp.groups}
+    return [queue for queue, group in QUEUE_GROUPS.items() if group in groups]
+
+def inline_result(app_id: int, fio: str, email, queue_type: str, status: str):
+    queue_name = QUEUE_NAMES.get(queue_type, queue_type)
+    status_name = STATUS_NAMES.get(status, status)
+    text = f"ID: {app_id}\nФИО: {fio}\n"
+    if email:
+        text += f"Email: {email}\n"
+    text += f"Очередь: {queue_name}\nСтатус: {status_name}"
+    return InlineQueryResultArticle(
+        id=str(app_id),
+        title=fio,
+        description=f"#{app_id} · {queue_name} · {status_name}" + (f" · {email}" if email else ""),
+        input_message_content=InputTextMessageContent(message_text=text)
+    )
+
+@router.inline_query()
+async def applicant_inline_lookup(inline_query: InlineQuery, session: AsyncSession):
+    # Проверка доступа — через кеш сотрудников, без запроса к БД на каждое нажатие
+    emp = await get_employee_by_tg_id(str(inline_query.from_user.id), session=session)
+    query = inline_query.query.strip()
+    queues = allowed_queues(emp) if emp else []
+    if queues == [] or not is_searchable(query):
+        await inline_query.answer([], cache_time=INLINE_CACHE_TIME, is_personal=True)
+        return
+
+    index = get_applicant_index()
+    if index is not None and index.ready:
+        results = [
+            inline_result(e.id, e.fio, e.email, e.queue_type, e.status)
+            for e in index.search(query, queues, limit=INLINE_RESULTS_LIMIT)
+        ]
+    else:
+        # Индекс выключен или перестраивается — один ограниченный запрос к БД
+        apps = await search_applications(query, queues, limit=INLINE_RESULTS_LIMIT, session=session)
+        results = [
+            inline_result(app.id, app.fio, app.email, app.queue_type, app.status.value if app.status else "")
+            for app in apps
+        ]
+    # Ответ зависит от прав сотрудника, поэтому кешируется для каждого отдельно
+    await inline_query.answer(results, cache_time=INLINE_CACHE_TIME, is_personal=True)
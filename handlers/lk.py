@@ -3,8 +3,10 @@ from aiogram.filters import Command
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 from aiogram.types import Message, CallbackQuery
-from db.crud import get_next_application, update_application_status, get_employee_by_tg_id, has_access, return_application_to_queue, increment_processed_applications, get_application_by_id, get_applications_by_fio_and_queue, escalate_application, update_application_field, get_moscow_now
+from sqlalchemy.ext.asyncio import AsyncSession
+from db.crud import get_next_application, update_application_status, get_employee_by_tg_id, has_access, return_application_to_queue, get_application_by_id, get_applications_by_fio_and_queue, escalate_application, update_application_field, get_moscow_now, decide_application
 from db.models import ApplicationStatusEnum
+from db.search import is_searchable, SEARCH_MIN_LENGTH
 from keyboards.lk import lk_queue_keyboard, lk_decision_keyboard, lk_reason_keyboard, lk_escalate_keyboard
 from keyboards.main import main_menu_keyboard
 from config import ADMIN_CHAT_ID
@@ -21,10 +23,10 @@ class LKStates(StatesGroup):
     waiting_search_fio = State()
 
 @router.callback_query(F.data == "lk_menu")
-async def lk_menu_entry(callback: CallbackQuery, state: FSMContext):
+async def lk_menu_entry(callback: CallbackQuery, state: FSMContext, session: AsyncSession):
     try:
-        emp = await get_employee_by_tg_id(str(callback.from_user.id))
-        if not emp or not await has_access(str(callback.from_user.id), "lk"):
+        emp = await get_employee_by_tg_id(str(callback.from_user.id), session=session)
+        if not emp or not await has_access(str(callback.from_user.id), "lk", session=session):
             return
         await callback.message.edit_text("Очередь ЛК. Нажмите кнопку, чтобы получить заявление.", reply_markup=lk_decision_keyboard(menu=True))
     except Exception as e:
@@ -33,11 +35,11 @@ async def lk_menu_entry(callback: CallbackQuery, state: FSMContext):
         print(traceback.format_exc())
 
 @router.callback_query(F.data == "lk_next")
-async def get_lk_application(callback: CallbackQuery, state: FSMContext):
-    emp = await get_employee_by_tg_id(str(callback.from_user.id))
-    if not emp or not await has_access(str(callback.from_user.id), "lk"):
+async def get_lk_application(callback: CallbackQuery, state: FSMContext, session: AsyncSession):
+    emp = await get_employee_by_tg_id(str(callback.from_user.id), session=session)
+    if not emp or not await has_access(str(callback.from_user.id), "lk", session=session):
         return
-    app = await get_next_application(queue_type="lk", employee_id=emp.id, bot=callback.bot)
+    app = await get_next_application(queue_type="lk", employee_id=emp.id, bot=callback.bot, session=session)
     if not app:
         await callback.message.edit_text("Очередь пуста.", reply_markup=lk_queue_keyboard(menu=True))
         return
@@ -46,9 +48,9 @@ async def get_lk_application(callback: CallbackQuery, state: FSMContext):
     await state.set_state(LKStates.waiting_decision)
 
 @router.callback_query(LKStates.waiting_decision, F.data.in_(["accept_lk", "reject_lk", "problem_lk", "return_lk"]))
-async def process_lk_decision(callback: CallbackQuery, state: FSMContext):
-    emp = await get_employee_by_tg_id(str(callback.from_user.id))
-    if not emp or not await has_access(str(callback.from_user.id), "lk"):
+async def process_lk_decision(callback: CallbackQuery, state: FSMContext, session: AsyncSession):
+    emp = await get_employee_by_tg_id(str(callback.from_user.id), session=session)
+    if not emp or not await has_access(str(callback.from_user.id), "lk", session=session):
         return
     data = await state.get_data()
     app_id = data.get("app_id")
@@ -57,22 +59,19 @@ async def process_lk_decision(callback: CallbackQuery, state: FSMContext):
     logger.info(f"Обработка решения: {callback.data} для app_id={app_id}, employee_id={employee_id}")
     
     if callback.data == "accept_lk":
-        await update_application_status(app_id, ApplicationStatusEnum.ACCEPTED, employee_id=employee_id)
-        result = await increment_processed_applications(employee_id)
-        logger.info(f"Заявление принято: app_id={app_id}, increment_result={result}")
+        app = await decide_application(app_id, employee_id, ApplicationStatusEnum.ACCEPTED, session=session)
+        logger.info(f"Заявление принято: app_id={app_id}")
         await callback.message.edit_text("Заявление принято.", reply_markup=lk_queue_keyboard(menu=True))
         
         # Логируем событие
         telegram_logger = get_logger()
-        if telegram_logger:
-            app = await get_application_by_id(app_id)
-            if app:
-                await telegram_logger.log_lk_accepted(emp.fio, app_id, app.fio)
+        if telegram_logger and app:
+            await telegram_logger.log_lk_accepted(emp.fio, app_id, app.fio)
         
         await callback.bot.send_message(ADMIN_CHAT_ID, f"ЛК: {callback.from_user.full_name} принял заявление {app_id}")
         await state.clear()
     elif callback.data == "return_lk":
-        await return_application_to_queue(app_id)
+        await return_application_to_queue(app_id, session=session)
         await callback.message.edit_text("Заявление возвращено в очередь.", reply_markup=lk_queue_keyboard(menu=True))
         await state.clear()
     elif callback.data in ["reject_lk", "problem_lk"]:
@@ -98,9 +97,9 @@ async def cancel_lk_reason(callback: CallbackQuery, state: FSMContext):
         await state.clear()
 
 @router.message(LKStates.waiting_reason)
-async def process_lk_reason(message: Message, state: FSMContext):
-    emp = await get_employee_by_tg_id(str(message.from_user.id))
-    if not emp or not await has_access(str(message.from_user.id), "lk"):
+async def process_lk_reason(message: Message, state: FSMContext, session: AsyncSession):
+    emp = await get_employee_by_tg_id(str(message.from_user.id), session=session)
+    if not emp or not await has_access(str(message.from_user.id), "lk", session=session):
         return
     data = await state.get_data()
     app_id = data.get("app_id")
@@ -111,24 +110,25 @@ async def process_lk_reason(message: Message, state: FSMContext):
     logger.info(f"Обработка причины: decision={decision}, app_id={app_id}, employee_id={employee_id}")
     
     status = ApplicationStatusEnum.REJECTED if decision == "reject_lk" else ApplicationStatusEnum.PROBLEM
-    await update_application_status(app_id, status, reason=reason, employee_id=employee_id)
+    # Счетчик обработанных увеличивается только при отклонении
+    app = await decide_application(
+        app_id, employee_id, status, reason=reason,
+        count_processed=status == ApplicationStatusEnum.REJECTED, session=session
+    )
     
     if status == ApplicationStatusEnum.REJECTED:
-        result = await increment_processed_applications(employee_id)
-        logger.info(f"Заявление отклонено: app_id={app_id}, increment_result={result}")
+        logger.info(f"Заявление отклонено: app_id={app_id}")
     
     status_text = "отклонено" if status == ApplicationStatusEnum.REJECTED else "помечено как проблемное"
     await message.answer(f"Заявление {status_text}. Причина: {reason}", reply_markup=lk_decision_keyboard(menu=True))
     
     # Логируем событие
     telegram_logger = get_logger()
-    if telegram_logger:
-        app = await get_application_by_id(app_id)
-        if app:
-            if status == ApplicationStatusEnum.REJECTED:
-                await telegram_logger.log_lk_rejected(emp.fio, app_id, app.fio, reason)
-            else:
-                await telegram_logger.log_lk_problem(emp.fio, app_id, app.fio, reason)
+    if telegram_logger and app:
+        if status == ApplicationStatusEnum.REJECTED:
+            await telegram_logger.log_lk_rejected(emp.fio, app_id, app.fio, reason)
+        else:
+            await telegram_logger.log_lk_problem(emp.fio, app_id, app.fio, reason)
     
     await message.bot.send_message(ADMIN_CHAT_ID, f"ЛК: {message.from_user.full_name} {status_text} заявление {app_id}. Причина: {reason}")
     await state.clear()
@@ -143,17 +143,17 @@ async def lk_search_fio_start(callback: CallbackQuery, state: FSMContext):
     await callback.message.edit_text("Введите ФИО для поиска заявлений:", reply_markup=lk_decision_keyboard(menu=True))
 
 @router.message(LKStates.waiting_search_fio)
-async def lk_search_fio_process(message: Message, state: FSMContext):
-    emp = await get_employee_by_tg_id(str(message.from_user.id))
-    if not emp or not await has_access(str(message.from_user.id), "lk"):
+async def lk_search_fio_process(message: Message, state: FSMContext, session: AsyncSession):
+    emp = await get_employee_by_tg_id(str(message.from_user.id), session=session)
+    if not emp or not await has_access(str(message.from_user.id), "lk", session=session):
         return
     
     fio = message.text.strip()
-    if not fio:
-        await message.answer("Пожалуйста, введите ФИО.", reply_markup=lk_decision_keyboard(menu=True))
+    if not is_searchable(fio):
+        await message.answer(f"Пожалуйста, введите ФИО (не менее {SEARCH_MIN_LENGTH} символов).", reply_markup=lk_decision_keyboard(menu=True))
         return
     
-    apps = await get_applications_by_fio_and_queue(fio, "lk")
+    apps = await get_applications_by_fio_and_queue(fio, "lk", session=session)
     if not apps:
         await message.answer(f"Заявления для '{fio}' не найдены.", reply_markup=lk_decision_keyboard(menu=True))
         await state.clear()
@@ -225,15 +225,15 @@ async def lk_search_fio_process(message: Message, state: FSMContext):
     await state.clear()
 
 @router.callback_query(F.data.startswith("lk_escalate_"))
-async def lk_escalate_handler(callback: CallbackQuery):
-    emp = await get_employee_by_tg_id(str(callback.from_user.id))
-    if not emp or not await has_access(str(callback.from_user.id), "lk"):
+async def lk_escalate_handler(callback: CallbackQuery, session: AsyncSession):
+    emp = await get_employee_by_tg_id(str(callback.from_user.id), session=session)
+    if not emp or not await has_access(str(callback.from_user.id), "lk", session=session):
         return
     app_id = int(callback.data.replace("lk_escalate_", ""))
-    success = await escalate_application(app_id)
+    success = await escalate_application(app_id, session=session)
     if success:
         from db.crud import get_application_by_id
-        app = await get_application_by_id(app_id)
+        app = await get_application_by_id(app_id, session=session)
         # Логирование
         logger = get_logger()
         if logger and app:
@@ -243,13 +243,13 @@ async def lk_escalate_handler(callback: CallbackQuery):
         await callback.message.edit_text("❌ Не удалось эскалировать заявление.", reply_markup=lk_decision_keyboard(menu=True))
 
 @router.callback_query(F.data.startswith("lk_process_found_"))
-async def lk_process_found_application(callback: CallbackQuery, state: FSMContext):
-    emp = await get_employee_by_tg_id(str(callback.from_user.id))
-    if not emp or not await has_access(str(callback.from_user.id), "lk"):
+async def lk_process_found_application(callback: CallbackQuery, state: FSMContext, session: AsyncSession):
+    emp = await get_employee_by_tg_id(str(callback.from_user.id), session=session)
+    if not emp or not await has_access(str(callback.from_user.id), "lk", session=session):
         return
     
     app_id = int(callback.data.replace("lk_process_found_", ""))
-    app = await get_application_by_id(app_id)
+    app = await get_application_by_id(app_id, session=session)
     
     if not app:
         await callback.message.edit_text(
@@ -287,8 +287,8 @@ async def lk_process_found_application(callback: CallbackQuery, state: FSMContex
     
     # Берем заявление в обработку (если оно еще не в обработке)
     if app.status == ApplicationStatusEnum.QUEUED:
-        await update_application_status(app_id, ApplicationStatusEnum.IN_PROGRESS, employee_id=emp.id)
-        await update_application_field(app_id, "taken_at", get_moscow_now())
+        await update_application_status(app_id, ApplicationStatusEnum.IN_PROGRESS, employee_id=emp.id, session=session)
+        await update_application_field(app_id, "taken_at", get_moscow_now(), session=session)
     
     # Сохраняем ID заявления в состоянии для дальнейшей обработки
     await state.update_data(app_id=app_id)
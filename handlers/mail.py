@@ -3,18 +3,20 @@ from aiogram.filters import Command
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 from aiogram.types import Message, CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton
+from sqlalchemy.ext.asyncio import AsyncSession
 from db.crud import (
     get_applications_by_fio_and_queue,
-    update_application_status,
+    search_applications_page,
     get_employee_by_tg_id, 
     has_access, 
-    increment_processed_applications,
     update_application_field,
     return_application_to_queue,
     get_application_by_id,
-    get_applications_by_email_and_queue
+    get_applications_by_email_and_queue,
+    decide_application
 )
 from db.models import ApplicationStatusEnum
+from db.search import is_searchable, is_email_query, page_cursors, decode_search_cursor, SEARCH_MIN_LENGTH
 from keyboards.mail import mail_menu_keyboard, mail_search_keyboard, mail_confirm_keyboard, mail_fio_search_keyboard
 from keyboards.main import main_menu_keyboard
 from config import ADMIN_CHAT_ID
@@ -33,10 +35,10 @@ class MailStates(StatesGroup):
     waiting_signature = State()
 
 @router.callback_query(F.data == "mail_menu")
-async def mail_menu_entry(callback: CallbackQuery, state: FSMContext):
+async def mail_menu_entry(callback: CallbackQuery, state: FSMContext, session: AsyncSession):
     try:
-        emp = await get_employee_by_tg_id(str(callback.from_user.id))
-        if not emp or not await has_access(str(callback.from_user.id), "mail"):
+        emp = await get_employee_by_tg_id(str(callback.from_user.id), session=session)
+        if not emp or not await has_access(str(callback.from_user.id), "mail", session=session):
             return
         await callback.message.edit_text(
             "📮 Очередь почты. Здесь подтверждается подпись документов.\n\n"
@@ -51,9 +53,9 @@ async def mail_menu_entry(callback: CallbackQuery, state: FSMContext):
 
 
 @router.callback_query(F.data == "mail_search_fio")
-async def mail_search_fio_start(callback: CallbackQuery, state: FSMContext):
-    emp = await get_employee_by_tg_id(str(callback.from_user.id))
-    if not emp or not await has_access(str(callback.from_user.id), "mail"):
+async def mail_search_fio_start(callback: CallbackQuery, state: FSMContext, session: AsyncSession):
+    emp = await get_employee_by_tg_id(str(callback.from_user.id), session=session)
+    if not emp or not await has_access(str(callback.from_user.id), "mail", session=session):
         return
     await state.set_state(MailStates.waiting_fio_search)
     await callback.message.edit_text(
@@ -63,25 +65,25 @@ async def mail_search_fio_start(callback: CallbackQuery, state: FSMContext):
     )
 
 @router.message(MailStates.waiting_fio_search)
-async def mail_search_fio_process(message: Message, state: FSMContext):
-    emp = await get_employee_by_tg_id(str(message.from_user.id))
-    if not emp or not await has_access(str(message.from_user.id), "mail"):
+async def mail_search_fio_process(message: Message, state: FSMContext, session: AsyncSession):
+    emp = await get_employee_by_tg_id(str(message.from_user.id), session=session)
+    if not emp or not await has_access(str(message.from_user.id), "mail", session=session):
         return
     fio = message.text.strip()
-    if not fio:
-        await message.answer("Пожалуйста, введите ФИО или email заявителя.")
+    if not is_searchable(fio):
+        await message.answer(f"Пожалуйста, введите ФИО или email заявителя (не менее {SEARCH_MIN_LENGTH} символов).")
         return
     # Универсальный поиск: если email — ищем по email, иначе по ФИО
-    if "@" in fio and "." in fio:
-        all_applications = await get_applications_by_email_and_queue(fio, "epgu_mail")
+    if is_email_query(fio):
+        all_applications = await get_applications_by_email_and_queue(fio, "epgu_mail", session=session)
         search_type = "email"
     else:
-        all_applications = await get_applications_by_fio_and_queue(fio, "epgu_mail")
+        all_applications = await get_applications_by_fio_and_queue(fio, "epgu_mail", session=session)
         search_type = "ФИО"
     if not all_applications:
         # Если искали по ФИО — пробуем найти похожие ФИО
-        if search_type == "ФИО" and len(fio) >= 3:
-            similar_apps = await get_applications_by_fio_and_queue(fio[:3], "epgu_mail")
+        if search_type == "ФИО" and len(fio) >= SEARCH_MIN_LENGTH:
+            similar_apps = await get_applications_by_fio_and_queue(fio[:SEARCH_MIN_LENGTH], "epgu_mail", session=session)
             if similar_apps:
                 unique_fios = sorted(set(app.fio for app in similar_apps))
                 text = f"Заявления для '{fio}' не найдены. Возможно, вы имели в виду:\n" + '\n'.join(unique_fios)
@@ -140,9 +142,9 @@ async def mail_search_fio_process(message: Message, state: FSMContext):
         await message.answer(text, reply_markup=keyboard)
 
 @router.callback_query(F.data.startswith("mail_select_"))
-async def mail_select_callback(callback: CallbackQuery, state: FSMContext):
-    emp = await get_employee_by_tg_id(str(callback.from_user.id))
-    if not emp or not await has_access(str(callback.from_user.id), "mail"):
+async def mail_select_callback(callback: CallbackQuery, state: FSMContext, session: AsyncSession):
+    emp = await get_employee_by_tg_id(str(callback.from_user.id), session=session)
+    if not emp or not await has_access(str(callback.from_user.id), "mail", session=session):
         return
     app_id = int(callback.data.replace("mail_select_", ""))
     data = await state.get_data()
@@ -164,16 +166,16 @@ async def mail_select_callback(callback: CallbackQuery, state: FSMContext):
     )
 
 @router.message(MailStates.waiting_confirm)
-async def mail_confirm_process(message: Message, state: FSMContext):
-    emp = await get_employee_by_tg_id(str(message.from_user.id))
-    if not emp or not await has_access(str(message.from_user.id), "mail"):
+async def mail_confirm_process(message: Message, state: FSMContext, session: AsyncSession):
+    emp = await get_employee_by_tg_id(str(message.from_user.id), session=session)
+    if not emp or not await has_access(str(message.from_user.id), "mail", session=session):
         return
     data = await state.get_data()
     app_id = data.get("app_id")
     fio = data.get("fio")
     # Получаем актуальное заявление
     from db.crud import get_application_by_id
-    app = await get_application_by_id(app_id)
+    app = await get_application_by_id(app_id, session=session)
     # Если нужны сканы — сначала спрашиваем их
     if getattr(app, 'needs_scans', False) and not getattr(app, 'scans_confirmed', False):
         await state.set_state(MailStates.waiting_scans)
@@ -191,11 +193,11 @@ async def mail_confirm_process(message: Message, state: FSMContext):
         )
         return
     # Если ничего не требуется — принимаем
-    await update_application_status(app_id, ApplicationStatusEnum.ACCEPTED, employee_id=emp.id)
-    await update_application_field(app_id, "scans_confirmed", True)
-    await update_application_field(app_id, "signature_confirmed", True)
-    result = await increment_processed_applications(emp.id)
-    logger.info(f"Заявление почты подтверждено: app_id={app_id}, increment_result={result}")
+    await decide_application(
+        app_id, emp.id, ApplicationStatusEnum.ACCEPTED,
+        field_patches={"scans_confirmed": True, "signature_confirmed": True}, session=session
+    )
+    logger.info(f"Заявление почты подтверждено: app_id={app_id}")
     await message.answer(
         f"✅ Заявление {app_id} ({fio}) подтверждено.\nВсе необходимые документы в наличии.",
         reply_markup=mail_menu_keyboard()
@@ -207,17 +209,17 @@ async def mail_confirm_process(message: Message, state: FSMContext):
     await state.clear()
 
 @router.message(MailStates.waiting_scans)
-async def mail_scans_process(message: Message, state: FSMContext):
-    emp = await get_employee_by_tg_id(str(message.from_user.id))
+async def mail_scans_process(message: Message, state: FSMContext, session: AsyncSession):
+    emp = await get_employee_by_tg_id(str(message.from_user.id), session=session)
     data = await state.get_data()
     app_id = data.get("app_id")
     fio = data.get("fio")
     answer = message.text.strip().lower()
     if answer in ["да", "есть", "подтверждаю", "готово"]:
-        await update_application_field(app_id, "scans_confirmed", True)
+        await update_application_field(app_id, "scans_confirmed", True, session=session)
         # Проверяем, нужна ли подпись
         from db.crud import get_application_by_id
-        app = await get_application_by_id(app_id)
+        app = await get_application_by_id(app_id, session=session)
         if getattr(app, 'needs_signature', False) and not getattr(app, 'signature_confirmed', False):
             await state.set_state(MailStates.waiting_signature)
             await message.answer(
@@ -226,11 +228,11 @@ async def mail_scans_process(message: Message, state: FSMContext):
             )
             return
         # Если подпись не нужна — завершаем
-        await update_application_status(app_id, ApplicationStatusEnum.ACCEPTED, employee_id=emp.id)
-        await update_application_field(app_id, "signature_confirmed", True)
-        from db.crud import increment_processed_applications
-        result = await increment_processed_applications(emp.id)
-        logger.info(f"Заявление почты подтверждено (сканы): app_id={app_id}, increment_result={result}")
+        await decide_application(
+            app_id, emp.id, ApplicationStatusEnum.ACCEPTED,
+            field_patches={"signature_confirmed": True}, session=session
+        )
+        logger.info(f"Заявление почты подтверждено (сканы): app_id={app_id}")
         await message.answer(
             f"✅ Заявление {app_id} ({fio}) подтверждено.\nВсе необходимые документы в наличии.",
             reply_markup=mail_menu_keyboard()
@@ -242,8 +244,8 @@ async def mail_scans_process(message: Message, state: FSMContext):
         await state.clear()
     else:
         # Если сканов нет — возвращаем в очередь почты
-        await update_application_field(app_id, "scans_confirmed", False)
-        await return_application_to_queue(app_id)
+        await update_application_field(app_id, "scans_confirmed", False, session=session)
+        await return_application_to_queue(app_id, session=session)
         await message.answer(
             f"❗ Сканы не подтверждены. Заявление возвращено в очередь почты.",
             reply_markup=mail_menu_keyboard()
@@ -251,17 +253,17 @@ async def mail_scans_process(message: Message, state: FSMContext):
         await state.clear()
 
 @router.message(MailStates.waiting_signature)
-async def mail_signature_process(message: Message, state: FSMContext):
-    emp = await get_employee_by_tg_id(str(message.from_user.id))
+async def mail_signature_process(message: Message, state: FSMContext, session: AsyncSession):
+    emp = await get_employee_by_tg_id(str(message.from_user.id), session=session)
     data = await state.get_data()
     app_id = data.get("app_id")
     fio = data.get("fio")
     answer = message.text.strip().lower()
     if answer in ["да", "есть", "подтверждаю", "готово"]:
-        await update_application_field(app_id, "signature_confirmed", True)
+        await update_application_field(app_id, "signature_confirmed", True, session=session)
         # Проверяем, нужны ли сканы и подтверждены ли они
         from db.crud import get_application_by_id
-        app = await get_application_by_id(app_id)
+        app = await get_application_by_id(app_id, session=session)
         if getattr(app, 'needs_scans', False) and not getattr(app, 'scans_confirmed', False):
             await state.set_state(MailStates.waiting_scans)
             await message.answer(
@@ -270,9 +272,8 @@ async def mail_signature_process(message: Message, state: FSMContext):
             )
             return
         # Если всё подтверждено — завершаем
-        await update_application_status(app_id, ApplicationStatusEnum.ACCEPTED, employee_id=emp.id)
-        result = await increment_processed_applications(emp.id)
-        logger.info(f"Заявление почты подтверждено (подпись): app_id={app_id}, increment_result={result}")
+        await decide_application(app_id, emp.id, ApplicationStatusEnum.ACCEPTED, session=session)
+        logger.info(f"Заявление почты подтверждено (подпись): app_id={app_id}")
         await message.answer(
             f"✅ Заявление {app_id} ({fio}) подтверждено.\nВсе необходимые документы в наличии.",
             reply_markup=mail_menu_keyboard()
@@ -284,8 +285,8 @@ async def mail_signature_process(message: Message, state: FSMContext):
         await state.clear()
     else:
         # Если подписи нет — возвращаем в очередь почты
-        await update_application_field(app_id, "signature_confirmed", False)
-        await return_application_to_queue(app_id)
+        await update_application_field(app_id, "signature_confirmed", False, session=session)
+        await return_application_to_queue(app_id, session=session)
         await message.answer(
             f"❗ Подпись не подтверждена. Заявление возвращено в очередь почты.",
             reply_markup=mail_menu_keyboard()
@@ -293,22 +294,21 @@ async def mail_signature_process(message: Message, state: FSMContext):
         await state.clear()
 
 @router.callback_query(F.data == "mail_back_to_menu")
-async def mail_back_to_menu(callback: CallbackQuery, state: FSMContext):
+async def mail_back_to_menu(callback: CallbackQuery, state: FSMContext, session: AsyncSession):
     await state.clear()
-    await mail_menu_entry(callback, state)
+    await mail_menu_entry(callback, state, session=session)
 
 @router.callback_query(F.data == "mail_confirm_yes")
-async def mail_confirm_yes_callback(callback: CallbackQuery, state: FSMContext):
-    emp = await get_employee_by_tg_id(str(callback.from_user.id))
-    if not emp or not await has_access(str(callback.from_user.id), "mail"):
+async def mail_confirm_yes_callback(callback: CallbackQuery, state: FSMContext, session: AsyncSession):
+    emp = await get_employee_by_tg_id(str(callback.from_user.id), session=session)
+    if not emp or not await has_access(str(callback.from_user.id), "mail", session=session):
         return
     data = await state.get_data()
     app_id = data.get("app_id")
     fio = data.get("fio")
     if app_id:
-        await update_application_status(app_id, ApplicationStatusEnum.ACCEPTED, employee_id=emp.id)
-        result = await increment_processed_applications(emp.id)
-        logger.info(f"Заявление почты подтверждено (кнопка): app_id={app_id}, increment_result={result}")
+        app = await decide_application(app_id, emp.id, ApplicationStatusEnum.ACCEPTED, session=session)
+        logger.info(f"Заявление почты подтверждено (кнопка): app_id={app_id}")
         await callback.message.edit_text(
             f"✅ Заявление {app_id} ({fio}) подтверждено.\nДокументы подписаны и загружены.",
             reply_markup=mail_menu_keyboard()
@@ -316,10 +316,8 @@ async def mail_confirm_yes_callback(callback: CallbackQuery, state: FSMContext):
         
         # Логируем событие
         telegram_logger = get_logger()
-        if telegram_logger:
-            app = await get_application_by_id(app_id)
-            if app:
-                await telegram_logger.log_mail_confirmed(emp.fio, app.fio)
+        if telegram_logger and app:
+            await telegram_logger.log_mail_confirmed(emp.fio, app.fio)
         
         await callback.bot.send_message(
             ADMIN_CHAT_ID,
@@ -329,44 +327,65 @@ async def mail_confirm_yes_callback(callback: CallbackQuery, state: FSMContext):
     else:
         await callback.answer("Ошибка: не выбрано заявление.", show_alert=True)
 
+# Очереди, в которых ищется заявитель для просмотра всей информации
+MAIL_INFO_QUEUES = ["epgu_mail", "epgu", "lk", "epgu_problem", "lk_problem"]
+# Подробная карточка длиннее строки списка: меньше заявлений на странице, чтобы
+# сообщение не превышало ограничение Telegram на длину
+MAIL_INFO_PAGE_SIZE = 5
+
+def format_mail_info_page(fio: str, apps) -> str:
+    """Текст страницы просмотра заявлений заявителя"""
+    text = f"<b>Заявления для '{fio}':</b>\n\n"
+    for app in apps:
+        text += f"<b>ID:</b> {app.id}\n"
+        text += f"<b>ФИО:</b> {app.fio}\n"
+        text += f"<b>Дата подачи:</b> {app.submitted_at.strftime('%d.%m.%Y %H:%M')}\n"
+        text += f"<b>Очередь:</b> {app.queue_type}\n"
+        text += f"<b>Статус:</b> {app.status.value if app.status else '-'}\n"
+        text += f"<b>Причина:</b> {app.status_reason or '-'}\n"
+        text += f"<b>Подтверждено:</b> {'да' if app.status == ApplicationStatusEnum.ACCEPTED else 'нет'}\n"
+        text += f"<b>Комментарий:</b> {app.problem_comment or '-'}\n"
+        text += f"<b>Ответственный:</b> {app.problem_responsible or '-'}\n"
+        text += "-----------------------------\n"
+    text += f"\n🔍 <b>Поисковый запрос:</b> '{fio}'"
+    return text
+
+async def answer_mail_info(message: Message, state: FSMContext, fio: str, session: AsyncSession):
+    """Первая страница заявлений заявителя; False — ничего не найдено"""
+    apps, has_prev, has_next = await search_applications_page(
+        fio, MAIL_INFO_QUEUES, page_size=MAIL_INFO_PAGE_SIZE, session=session
+    )
+    if not apps:
+        return False
+    # Запрос нужен для перехода между страницами; курсор передается в кнопках
+    await state.update_data(mail_info_query=fio)
+    await message.answer(
+        format_mail_info_page(fio, apps),
+        parse_mode="HTML",
+        reply_markup=mail_fio_search_keyboard(*page_cursors(apps, has_prev, has_next))
+    )
+    return True
+
 @router.message(Command("mailinfo"))
-async def mail_info_handler(message: Message):
-    emp = await get_employee_by_tg_id(str(message.from_user.id))
-    if not emp or not await has_access(str(message.from_user.id), "mail"):
+async def mail_info_handler(message: Message, state: FSMContext, session: AsyncSession):
+    emp = await get_employee_by_tg_id(str(message.from_user.id), session=session)
+    if not emp or not await has_access(str(message.from_user.id), "mail", session=session):
         return
     args = message.text.split(maxsplit=1)
     if len(args) < 2:
         await message.answer("Используйте: /mailinfo <ФИО>")
         return
     fio = args[1].strip()
-    if not fio:
-        await message.answer("Пожалуйста, укажите ФИО заявителя после команды.")
+    if not is_searchable(fio):
+        await message.answer(f"Пожалуйста, укажите ФИО заявителя после команды (не менее {SEARCH_MIN_LENGTH} символов).")
         return
     # Ищем заявления по ФИО во всех очередях
-    queues = ["epgu_mail", "epgu", "lk", "epgu_problem", "lk_problem"]
-    found = []
-    for queue in queues:
-        apps = await get_applications_by_fio_and_queue(fio, queue)
-        found.extend(apps)
-    if not found:
+    if not await answer_mail_info(message, state, fio, session):
         await message.answer(f"Заявления для '{fio}' не найдены ни в одной очереди.")
-        return
-    for app in found:
-        text = f"<b>Заявление</b>\n"
-        text += f"ФИО: {app.fio}\n"
-        text += f"Дата подачи: {app.submitted_at.strftime('%d.%m.%Y %H:%M')}\n"
-        text += f"ID: {app.id}\n"
-        text += f"Очередь: {app.queue_type}\n"
-        text += f"Статус: {app.status.value if app.status else '-'}\n"
-        text += f"Причина: {app.status_reason or '-'}\n"
-        text += f"Подтверждено: {'да' if app.status.value == 'accepted' else 'нет'}\n"
-        text += f"Комментарий: {app.problem_comment or '-'}\n"
-        text += f"Ответственный: {app.problem_responsible or '-'}\n"
-        await message.answer(text, parse_mode="HTML")
 
 @router.callback_query(F.data == "mail_info_fio")
-async def mail_info_fio_start(callback: CallbackQuery, state: FSMContext):
-    emp = await get_employee_by_tg_id(str(callback.from_user.id))
+async def mail_info_fio_start(callback: CallbackQuery, state: FSMContext, session: AsyncSession):
+    emp = await get_employee_by_tg_id(str(callback.from_user.id), session=session)
     if not emp:
         return
     await state.set_state(MailStates.waiting_fio_info)
@@ -378,44 +397,54 @@ async def mail_info_fio_start(callback: CallbackQuery, state: FSMContext):
     )
 
 @router.message(MailStates.waiting_fio_info)
-async def mail_info_fio_process(message: Message, state: FSMContext):
-    emp = await get_employee_by_tg_id(str(message.from_user.id))
+async def mail_info_fio_process(message: Message, state: FSMContext, session: AsyncSession):
+    emp = await get_employee_by_tg_id(str(message.from_user.id), session=session)
     if not emp:
         return
     fio = message.text.strip()
-    if not fio:
-        await message.answer("Пожалуйста, введите ФИО заявителя.")
+    if not is_searchable(fio):
+        await message.answer(f"Пожалуйста, введите ФИО заявителя (не менее {SEARCH_MIN_LENGTH} символов).")
         return
-    queues = ["epgu_mail", "epgu", "lk", "epgu_problem", "lk_problem"]
-    found = []
-    for queue in queues:
-        apps = await get_applications_by_fio_and_queue(fio, queue)
-        found.extend(apps)
-    if not found:
+    await state.clear()
+    if not await answer_mail_info(message, state, fio, session):
         await message.answer(
             f"Заявления для '{fio}' не найдены ни в одной очереди.", 
             reply_markup=mail_fio_search_keyboard()
         )
-        await state.clear()
+
+@router.callback_query(F.data.startswith("mail_info_page_"))
+async def mail_info_page_handler(callback: CallbackQuery, state: FSMContext, session: AsyncSession):
+    emp = await get_employee_by_tg_id(str(callback.from_user.id), session=session)
+    if not emp:
         return
-    
-    # Формируем один большой текст для edit_text
-    text = f"<b>Заявления для '{fio}':</b>\n\n"
-    for app in found:
-        text += f"<b>ID:</b> {app.id}\n"
-        text += f"<b>ФИО:</b> {app.fio}\n"
-        text += f"<b>Дата подачи:</b> {app.submitted_at.strftime('%d.%m.%Y %H:%M')}\n"
-        text += f"<b>Очередь:</b> {app.queue_type}\n"
-        text += f"<b>Статус:</b> {app.status.value if app.status else '-'}\n"
-        text += f"<b>Причина:</b> {app.status_reason or '-'}\n"
-        text += f"<b>Подтверждено:</b> {'да' if app.status.value == 'accepted' else 'нет'}\n"
-        text += f"<b>Комментарий:</b> {app.problem_comment or '-'}\n"
-        text += f"<b>Ответственный:</b> {app.problem_responsible or '-'}\n"
-        text += "-----------------------------\n"
-    
-    # Добавляем информацию о поисковом запросе
-    text += f"\n🔍 <b>Поисковый запрос:</b> '{fio}'\n"
-    text += f"📊 <b>Найдено заявлений:</b> {len(found)}"
-    
-    await message.answer(text, parse_mode="HTML", reply_markup=mail_fio_search_keyboard())
-    await state.clear() 
\ No newline at end of file
+    fio = (await state.get_data()).get("mail_info_query")
+    if not fio:
+        await callback.answer("Результаты поиска устарели, выполните поиск заново.", show_alert=True)
+        return
+    # callback_data вида 'mail_info_page_{n|p}_{курсор}'
+    direction, _, cursor = callback.data.replace("mail_info_page_", "").partition("_")
+    try:
+        cursor = decode_search_cursor(cursor)
+    except ValueError:
+        await callback.answer("Ошибка: некорректная страница.", show_alert=True)
+        return
+    apps, has_prev, has_next = await search_applications_page(
+        fio, MAIL_INFO_QUEUES, cursor, backward=direction == "p", page_size=MAIL_INFO_PAGE_SIZE, session=session
+    )
+    if not apps:
+        # Заявления могли измениться с момента показа — возвращаемся к первой странице
+        apps, has_prev, has_next = await search_applications_page(
+            fio, MAIL_INFO_QUEUES, page_size=MAIL_INFO_PAGE_SIZE, session=session
+        )
+    if not apps:
+        await callback.message.edit_text(
+            f"Заявления для '{fio}' не найдены ни в одной очереди.",
+            reply_markup=mail_fio_search_keyboard()
+        )
+    else:
+        await callback.message.edit_text(
+            format_mail_info_page(fio, apps),
+            parse_mode="HTML",
+            reply_markup=mail_fio_search_keyboard(*page_cursors(apps, has_prev, has_next))
+        )
+    await callback.answer() 
\ No newline at end of file
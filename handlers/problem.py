@@ -3,6 +3,7 @@ from aiogram.filters import Command
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 from aiogram.types import Message, CallbackQuery
+from sqlalchemy.ext.asyncio import AsyncSession
 from db.crud import (
     get_problem_applications,
     get_employee_by_tg_id,
@@ -26,9 +27,9 @@ class ProblemStates(StatesGroup):
     waiting_comment = State()
 
 @router.callback_query(F.data == "problem_menu")
-async def problem_menu_entry(callback: CallbackQuery, state: FSMContext):
-    emp = await get_employee_by_tg_id(str(callback.from_user.id))
-    if not emp or not await has_access(str(callback.from_user.id), "problem"):
+async def problem_menu_entry(callback: CallbackQuery, state: FSMContext, session: AsyncSession):
+    emp = await get_employee_by_tg_id(str(callback.from_user.id), session=session)
+    if not emp or not await has_access(str(callback.from_user.id), "problem", session=session):
         return
     await state.set_state(ProblemStates.waiting_queue_type)
     await callback.message.edit_text(
@@ -37,13 +38,13 @@ async def problem_menu_entry(callback: CallbackQuery, state: FSMContext):
     )
 
 @router.callback_query(ProblemStates.waiting_queue_type, F.data.startswith("problem_queue_"))
-async def problem_queue_list(callback: CallbackQuery, state: FSMContext):
-    emp = await get_employee_by_tg_id(str(callback.from_user.id))
-    if not emp or not await has_access(str(callback.from_user.id), "problem"):
+async def problem_queue_list(callback: CallbackQuery, state: FSMContext, session: AsyncSession):
+    emp = await get_employee_by_tg_id(str(callback.from_user.id), session=session)
+    if not emp or not await has_access(str(callback.from_user.id), "problem", session=session):
         return
     
     queue_type = callback.data.replace("problem_queue_", "")
-    problems = await get_problem_applications(queue_type)
+    problems = await get_problem_applications(queue_type, session=session)
     if not problems:
         await callback.message.edit_text(
             f"В очереди {queue_type} нет проблемных дел.",
@@ -58,13 +59,13 @@ async def problem_queue_list(callback: CallbackQuery, state: FSMContext):
     )
 
 @router.callback_query(ProblemStates.waiting_action, F.data.startswith("problem_app_"))
-async def problem_app_action(callback: CallbackQuery, state: FSMContext):
-    emp = await get_employee_by_tg_id(str(callback.from_user.id))
-    if not emp or not await has_access(str(callback.from_user.id), "problem"):
+async def problem_app_action(callback: CallbackQuery, state: FSMContext, session: AsyncSession):
+    emp = await get_employee_by_tg_id(str(callback.from_user.id), session=session)
+    if not emp or not await has_access(str(callback.from_user.id), "problem", session=session):
         return
     
     app_id = int(callback.data.replace("problem_app_", ""))
-    app = await get_application_by_id(app_id)
+    app = await get_application_by_id(app_id, session=session)
     if not app:
         await callback.message.edit_text("Заявление не найдено.", reply_markup=problem_menu_keyboard())
         await state.clear()
@@ -92,47 +93,47 @@ async def problem_app_action(callback: CallbackQuery, state: FSMContext):
     )
 
 @router.callback_query(ProblemStates.waiting_action, F.data.startswith("problem_action_"))
-async def problem_action(callback: CallbackQuery, state: FSMContext):
-    emp = await get_employee_by_tg_id(str(callback.from_user.id))
-    if not emp or not await has_access(str(callback.from_user.id), "problem"):
+async def problem_action(callback: CallbackQuery, state: FSMContext, session: AsyncSession):
+    emp = await get_employee_by_tg_id(str(callback.from_user.id), session=session)
+    if not emp or not await has_access(str(callback.from_user.id), "problem", session=session):
         return
     
     data = await state.get_data()
     app_id = data.get("app_id")
     action = callback.data.replace("problem_action_", "")
     if action == "solved":
-        await update_problem_status(app_id, "solved")
+        await update_problem_status(app_id, "solved", session=session)
         
         # Логируем событие
         telegram_logger = get_logger()
         if telegram_logger:
-            app = await get_application_by_id(app_id)
+            app = await get_application_by_id(app_id, session=session)
             if app:
                 await telegram_logger.log_problem_solved(emp.fio, app_id, app.fio)
         
         await callback.message.edit_text("✅ Дело отмечено как решенное и отправлено как принятое.", reply_markup=problem_menu_keyboard())
         await state.clear()
-        await problem_menu_entry(callback, state)
+        await problem_menu_entry(callback, state, session=session)
     elif action == "solved_return":
-        await update_problem_status(app_id, "solved_return")
+        await update_problem_status(app_id, "solved_return", session=session)
         
         # Логируем событие
         telegram_logger = get_logger()
         if telegram_logger:
-            app = await get_application_by_id(app_id)
+            app = await get_application_by_id(app_id, session=session)
             if app:
                 await telegram_logger.log_problem_solved_queue(emp.fio, app_id, app.fio, app.queue_type)
         
         await callback.message.edit_text("✅ Дело отмечено как решенное и возвращено в очередь.", reply_markup=problem_menu_keyboard())
         await state.clear()
-        await problem_menu_entry(callback, state)
+        await problem_menu_entry(callback, state, session=session)
     elif action == "in_progress":
         await state.set_state(ProblemStates.waiting_comment)
         
         # Логируем событие
         telegram_logger = get_logger()
         if telegram_logger:
-            app = await get_application_by_id(app_id)
+            app = await get_application_by_id(app_id, session=session)
             if app:
                 await telegram_logger.log_problem_in_progress(emp.fio, app_id, app.fio)
         
@@ -140,21 +141,21 @@ async def problem_action(callback: CallbackQuery, state: FSMContext):
     elif action == "cancel":
         await callback.message.edit_text("Дело осталось в проблемных.", reply_markup=problem_menu_keyboard())
         await state.clear()
-        await problem_menu_entry(callback, state)
+        await problem_menu_entry(callback, state, session=session)
 
 @router.message(ProblemStates.waiting_comment)
-async def problem_comment(message: Message, state: FSMContext):
+async def problem_comment(message: Message, state: FSMContext, session: AsyncSession):
     data = await state.get_data()
     app_id = data.get("app_id")
     comment = message.text.strip()
-    await update_problem_status(app_id, "in_progress", comment=comment, responsible=message.from_user.full_name)
+    await update_problem_status(app_id, "in_progress", comment=comment, responsible=message.from_user.full_name, session=session)
     await message.answer("Комментарий добавлен. Дело отмечено как 'в процессе решения'.", reply_markup=problem_menu_keyboard())
     await state.clear()
 
 @router.callback_query(F.data.startswith("problem_status_"))
-async def problem_status_action(callback: CallbackQuery, state: FSMContext):
-    emp = await get_employee_by_tg_id(str(callback.from_user.id))
-    if not emp or not await has_access(str(callback.from_user.id), "problem"):
+async def problem_status_action(callback: CallbackQuery, state: FSMContext, session: AsyncSession):
+    emp = await get_employee_by_tg_id(str(callback.from_user.id), session=session)
+    if not emp or not await has_access(str(callback.from_user.id), "problem", session=session):
         return
     
     data = await state.get_data()
@@ -162,16 +163,16 @@ async def problem_status_action(callback: CallbackQuery, state: FSMContext):
     action = callback.data.replace("problem_status_", "")
     
     if action == "solved":
-        await update_problem_status(app_id, "solved")
+        await update_problem_status(app_id, "solved", session=session)
         await callback.message.edit_text("✅ Дело отмечено как решенное.", reply_markup=problem_menu_keyboard())
     elif action == "solved_return":
-        await update_problem_status(app_id, "solved_return")
+        await update_problem_status(app_id, "solved_return", session=session)
         await callback.message.edit_text("✅ Дело отмечено как решенное и возвращено в очередь.", reply_markup=problem_menu_keyboard())
     elif action == "in_progress":
         await callback.message.edit_text("Дело отмечено как 'в процессе решения'.", reply_markup=problem_menu_keyboard())
     elif action == "new":
-        await update_problem_status(app_id, "new")
+        await update_problem_status(app_id, "new", session=session)
         await callback.message.edit_text("🔄 Дело отмечено как новое.", reply_markup=problem_menu_keyboard())
     
     await state.clear()
-    await problem_menu_entry(callback, state) 
\ No newline at end of file
+    await problem_menu_entry(callback, state, session=session) 
\ No newline at end of file
@@ -30,6 +30,7 @@ def admin_queue_menu_keyboard():
         [InlineKeyboardButton(text="🗑️ Очистить очередь", callback_data="admin_clear_queue")],
         [InlineKeyboardButton(text="📤 Загрузить заявления", callback_data="admin_upload_queue")],
         [InlineKeyboardButton(text="📊 Импорт выгрузки 1С", callback_data="admin_upload_1c")],
+        [InlineKeyboardButton(text="📥 Задания импорта", callback_data="admin_import_jobs")],
         [InlineKeyboardButton(text="💾 Создать бэкап БД", callback_data="admin_create_backup")],
         [InlineKeyboardButton(text="🔙 Назад", callback_data="admin_menu")]
     ])
@@ -126,6 +127,11 @@ def admin_cancel_keyboard():
         [InlineKeyboardButton(text="❌ Отмена", callback_data="admin_search_applications")]
     ])
 
+def admin_import_progress_keyboard(job_id: int):
+    return InlineKeyboardMarkup(inline_keyboard=[
+        [InlineKeyboardButton(text="⛔ Отменить импорт", callback_data=f"admin_cancel_import_{job_id}")]
+    ])
+
 def admin_chat_settings_keyboard():
     return InlineKeyboardMarkup(inline_keyboard=[
         [InlineKeyboardButton(text="📝 Настроить общий чат", callback_data="admin_set_general_chat")],
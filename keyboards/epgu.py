@@ -78,4 +78,32 @@ def epgu_search_results_keyboard(fio: str, total_found: int):
     ])
     buttons.append([InlineKeyboardButton(text="🔙 Назад", callback_data="epgu_menu")])
     
-    return InlineKeyboardMarkup(inline_keyboard=buttons) 
\ No newline at end of file
+    return InlineKeyboardMarkup(inline_keyboard=buttons)
+
+def epgu_search_page_keyboard(apps, prev_cursor: str = None, next_cursor: str = None):
+    """Клавиатура страницы результатов поиска: действия по заявлениям и переход между страницами"""
+    buttons = []
+    for app in apps:
+        status = app.status.value if app.status else ""
+        row = []
+        if status in ["queued", "in_progress"]:
+            row.append(InlineKeyboardButton(text=f"🔄 #{app.id}", callback_data=f"epgu_process_found_{app.id}"))
+        if not app.is_priority and status == "queued":
+            row.append(InlineKeyboardButton(text=f"🚨 #{app.id}", callback_data=f"epgu_escalate_{app.id}"))
+        if row:
+            buttons.append(row)
+    
+    nav = []
+    if prev_cursor:
+        nav.append(InlineKeyboardButton(text="◀️", callback_data=f"epgu_search_page_p_{prev_cursor}"))
+    if next_cursor:
+        nav.append(InlineKeyboardButton(text="▶️", callback_data=f"epgu_search_page_n_{next_cursor}"))
+    if nav:
+        buttons.append(nav)
+    
+    buttons.append([
+        InlineKeyboardButton(text="🔍 Новый поиск", callback_data="epgu_search_fio"),
+        InlineKeyboardButton(text="📋 Следующее", callback_data="epgu_next")
+    ])
+    buttons.append([InlineKeyboardButton(text="🔙 Назад", callback_data="epgu_menu")])
+    return InlineKeyboardMarkup(inline_keyboard=buttons)
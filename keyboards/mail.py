@@ -21,9 +21,16 @@ def mail_confirm_keyboard() -> InlineKeyboardMarkup:
         [InlineKeyboardButton(text="❌ Нет", callback_data="mail_back_to_menu")]
     ])
 
-def mail_fio_search_keyboard():
-    """Клавиатура для поиска по ФИО с кнопками 'Найти еще' и 'Назад'"""
-    return InlineKeyboardMarkup(inline_keyboard=[
-        [InlineKeyboardButton(text="🔍 Найти еще", callback_data="mail_info_fio")],
-        [InlineKeyboardButton(text="🔙 Назад", callback_data="main_menu")]
-    ]) 
\ No newline at end of file
+def mail_fio_search_keyboard(prev_cursor: str = None, next_cursor: str = None):
+    """Клавиатура для поиска по ФИО с переходом между страницами и кнопками 'Найти еще' и 'Назад'"""
+    buttons = []
+    nav = []
+    if prev_cursor:
+        nav.append(InlineKeyboardButton(text="◀️", callback_data=f"mail_info_page_p_{prev_cursor}"))
+    if next_cursor:
+        nav.append(InlineKeyboardButton(text="▶️", callback_data=f"mail_info_page_n_{next_cursor}"))
+    if nav:
+        buttons.append(nav)
+    buttons.append([InlineKeyboardButton(text="🔍 Найти еще", callback_data="mail_info_fio")])
+    buttons.append([InlineKeyboardButton(text="🔙 Назад", callback_data="main_menu")])
+    return InlineKeyboardMarkup(inline_keyboard=buttons) 
\ No newline at end of file
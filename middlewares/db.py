@@ -0,0 +1,62 @@
+import asyncio
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+from aiogram import BaseMiddleware
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+from aiogram.types import TelegramObject
+from sqlalchemy.ext.asyncio import AsyncSession
+from db.session import AsyncSessionLocal, UNIT_OF_WORK
+
+# Сессия текущего апдейта и задача, которая его обрабатывает
+_current_unit: ContextVar[Optional[Tuple[AsyncSession, asyncio.Task]]] = ContextVar(
+    "current_unit_of_work", default=None
+)
+
+
+class DbSessionMiddleware(BaseMiddleware):
+    """
+    Единица работы на один апдейт: открывает одну AsyncSession, передает ее в хендлеры
+    (аргумент session) и коммитит один раз после обработки, при ошибке — откатывает.
+    Функции db.crud, получившие эту сессию, вместо commit делают только flush.
+    Подключение из пула берется только при первом запросе к БД.
+    Перед каждым запросом к Telegram изменения фиксируются (CommitBeforeRequestMiddleware).
+    """
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        async with AsyncSessionLocal() as session:
+            session.info[UNIT_OF_WORK] = True
+            data["session"] = session
+            token = _current_unit.set((session, asyncio.current_task()))
+            try:
+                result = await handler(event, data)
+            except Exception:
+                await session.rollback()
+                raise
+            finally:
+                _current_unit.reset(token)
+            await session.commit()
+            return result
+
+
+class CommitBeforeRequestMiddleware(BaseRequestMiddleware):
+    """
+    Коммит единицы работы перед запросом к Telegram API.
+    Решение, о котором сообщили сотруднику или админам, не откатится из-за ошибки
+    отправки, а блокировки строк не держатся на время запроса к Telegram.
+    Подключается к сессии бота: bot.session.middleware(CommitBeforeRequestMiddleware())
+    """
+
+    async def __call__(self, make_request, bot, method):
+        unit = _current_unit.get()
+        # Фоновые задачи, запущенные из хендлера, наследуют контекст — их запросы
+        # не должны трогать чужую сессию
+        if unit is not None:
+            session, task = unit
+            if task is asyncio.current_task() and session.in_transaction():
+                await session.commit()
+        return await make_request(bot, method)
@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""
+Проверка импорта выгрузки 1С в базу (import_1c_applications_from_excel).
+
+Синтетическая выгрузка импортируется в базу с заранее заведенными заявлениями;
+итоги (добавлено/обновлено/пропущено по очередям) и итоговое содержимое applications
+сравниваются с построчной моделью тех же правил (expected_import):
+- строки с ФИО, уже стоящими в очередях SKIP_FIO_QUEUES (после нормализации), не
+  импортируются и не входят в итоги;
+- при повторе ключа внутри выгрузки применяется последняя строка, остальные — пропущены;
+- строка выгрузки обновляет одно заявление (с наименьшим id), даже если в базе
+  несколько заявлений с тем же ключом.
+
+Данные создаются в отдельной схеме test_1c_import, которая удаляется по окончании.
+Запуск: DB_DSN=postgresql+asyncpg://... python test_1c_import_db.py
+"""
+import asyncio
+import os
+import sys
+import tempfile
+from datetime import datetime
+
+# Добавляем корневую директорию в путь
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import pandas as pd
+from sqlalchemy import event, select, text
+from sqlalchemy.ext.asyncio import create_async_engine
+from config import DB_DSN
+from db.models import Base, Application, ApplicationStatusEnum
+from db.session import engine, AsyncSessionLocal
+from db.imports import SKIP_FIO_QUEUES, STAGED_QUEUES
+from db.lookup import normalize_query
+from db.crud import import_1c_applications_from_excel
+from utils.excel import parse_1c_applications_from_excel
+
+TEST_SCHEMA = "test_1c_import"
+
+D1 = datetime(2025, 6, 20, 10, 25, 1)
+D2 = datetime(2025, 6, 20, 11, 30, 35)
+D3 = datetime(2025, 6, 21, 9, 0, 0)
+D4 = datetime(2025, 6, 21, 9, 30, 0)
+D5 = datetime(2025, 6, 22, 14, 15, 0)
+
+UNKNOWN_REASON = "Неизвестный способ подачи: '{}'"
+
+# Заявления в базе до импорта: (ФИО, дата подачи, очередь, статус, причина)
+EXISTING = [
+    ("Петров Петр Петрович", D1, "lk", ApplicationStatusEnum.QUEUED, None),
+    ("Сидорова Анна Ивановна", D2, "epgu_mail", ApplicationStatusEnum.QUEUED, None),
+    # Два заявления с одним ключом: строка выгрузки должна обновить одно
+    ("Кузнецов Олег Игоревич", D1, "unknown", ApplicationStatusEnum.QUEUED, UNKNOWN_REASON.format("Лично")),
+    ("Кузнецов Олег Игоревич", D1, "unknown", ApplicationStatusEnum.QUEUED, UNKNOWN_REASON.format("Лично")),
+    ("Смирнова Ольга Петровна", D2, "unknown", ApplicationStatusEnum.QUEUED, UNKNOWN_REASON.format("Лично")),
+]
+
+SMS = "СМС-подтверждение пакета документов"
+EPGU = "ЕПГУ"
+
+# Строки выгрузки: (ФИО, способ подачи, статус в ПК, есть изменения, дата первой подачи)
+EXPORT = [
+    ("Иванов Иван Иванович", SMS, "Подано", "Нет", D3),
+    # Повтор ФИО ЛК: применяется одна строка, вторая — пропущена
+    ("Иванов Иван Иванович", SMS, "На рассмотрении", "Да", D4),
+    # ФИО уже в очереди ЛК (отличается пробелами и регистром) — строка отбрасывается
+    (" петров  петр петрович", SMS, "Принято", "Нет", D1),
+    # ФИО уже в очереди почты ЕПГУ — строка отбрасывается
+    ("Сидорова Анна Ивановна", EPGU, "На рассмотрении", "Нет", D2),
+    # Повтор ключа ЕПГУ: применяется последняя строка
+    ("Федоров Федор Федорович", EPGU, "Принято", "Нет", D5),
+    ("Федоров Федор Федорович", EPGU, "На рассмотрении", "Нет", D5),
+    ("Алексеева Ёлка Павловна", EPGU, "Принято", "Нет", D3),
+    # Совпадает с двумя заявлениями unknown, причина изменилась — обновление
+    ("Кузнецов Олег Игоревич", "Почта России", "Подано", "Нет", D1),
+    # Совпадает, ничего не изменилось — пропуск
+    ("Смирнова Ольга Петровна", "Лично", "Подано", "Нет", D2),
+    # Статус, который не импортируется
+    ("Николаев Николай Николаевич", SMS, "Редактируется", "Нет", D4),
+]
+
+
+@event.listens_for(engine.sync_engine, "connect")
+def use_test_schema(dbapi_connection, connection_record):
+    # Все подключения импорта работают в тестовой схеме
+    dbapi_connection.run_async(lambda conn: conn.execute(f"SET search_path TO {TEST_SCHEMA}, public"))
+
+
+def write_export(path: str):
+    pd.DataFrame({
+        "Физическое лицо": [row[0] for row in EXPORT],
+        "Способ подачи заявления": [row[1] for row in EXPORT],
+        "Статус заявления в ПК": [row[2] for row in EXPORT],
+        "Есть изменения": [row[3] for row in EXPORT],
+        "Дата первой подачи": [row[4].strftime("%d.%m.%Y %H:%M:%S") for row in EXPORT],
+    }).to_excel(path, index=False)
+
+
+def _key(queue_type: str, fio: str, submitted_at):
+    if queue_type == "lk":
+        return normalize_query(fio)
+    return normalize_query(fio), submitted_at
+
+
+def _changed(queue_type: str, app: dict, row: dict) -> bool:
+    if queue_type == "lk":
+        return app["status"] != row["status"] or app["is_priority"] != row["is_priority"]
+    if queue_type == "epgu":
+        return app["status"] != row["status"]
+    return app["status"] != row["status"] or app["status_reason"] != row["status_reason"]
+
+
+def expected_import(existing, parsed_data):
+    """Построчная модель импорта: итоги по очередям и итоговые заявления"""
+    apps = [dict(app) for app in existing]
+    known = {normalize_query(app["fio"]) for app in apps if app["queue_type"] in SKIP_FIO_QUEUES}
+    results = {}
+    for queue_type in STAGED_QUEUES:
+        rows = [row for row in parsed_data.get(queue_type, []) if normalize_query(row["fio"]) not in known]
+        last = {}
+        for row in rows:
+            last[_key(queue_type, row["fio"], row["submitted_at"])] = row
+        counts = {"added": 0, "updated": 0, "skipped": len(rows) - len(last), "total": len(rows)}
+        for key, row in last.items():
+            matches = [
+                app for app in apps
+                if app["queue_type"] == queue_type and _key(queue_type, app["fio"], app["submitted_at"]) == key
+            ]
+            if not matches:
+                apps.append({
+                    "id": None,
+                    "fio": row["fio"],
+                    "submitted_at": row["submitted_at"],
+                    "queue_type": queue_type,
+                    "status": row["status"],
+                    "is_priority": bool(row["is_priority"]),
+                    "status_reason": row["status_reason"],
+                })
+                counts["added"] += 1
+                continue
+            app = min(matches, key=lambda a: a["id"])
+            if not _changed(queue_type, app, row):
+                counts["skipped"] += 1
+                continue
+            app["status"] = row["status"]
+            if queue_type == "unknown":
+                app["status_reason"] = row["status_reason"]
+            else:
+                app["status_reason"] = row["status_reason"] or app["status_reason"]
+            if queue_type == "lk":
+                app["is_priority"] = bool(row["is_priority"])
+            counts["updated"] += 1
+        results[queue_type] = counts
+    return results, apps
+
+
+def _state(apps):
+    """Содержимое таблицы без id и времени обработки — для сравнения"""
+    return sorted(
+        (app["fio"], app["submitted_at"], app["queue_type"], app["status"], app["is_priority"], app["status_reason"] or "")
+        for app in apps
+    )
+
+
+async def seed():
+    async with AsyncSessionLocal() as session:
+        apps = [
+            Application(fio=fio, submitted_at=submitted_at, queue_type=queue_type, status=status,
+                        is_priority=False, status_reason=reason)
+            for fio, submitted_at, queue_type, status, reason in EXISTING
+        ]
+        session.add_all(apps)
+        await session.commit()
+        return [_as_dict(app) for app in apps]
+
+
+async def load_applications():
+    async with AsyncSessionLocal() as session:
+        result = await session.execute(select(Application).order_by(Application.id))
+        return [_as_dict(app) for app in result.scalars().all()]
+
+
+def _as_dict(app):
+    return {
+        "id": app.id,
+        "fio": app.fio,
+        "submitted_at": app.submitted_at,
+        "queue_type": app.queue_type,
+        "status": app.status.value,
+        "is_priority": bool(app.is_priority),
+        "status_reason": app.status_reason,
+    }
+
+
+async def run_check(path: str):
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    existing = await seed()
+
+    parsed_data = await parse_1c_applications_from_excel(path)
+    expected_results, expected_apps = expected_import(existing, parsed_data)
+
+    results = await import_1c_applications_from_excel(path)
+    apps = await load_applications()
+
+    for queue_type in STAGED_QUEUES:
+        print(f"   {queue_type:<8} ожидалось {expected_results[queue_type]}, получено {results[queue_type]}")
+        assert results[queue_type] == expected_results[queue_type], f"итоги очереди {queue_type} различаются"
+    assert _state(apps) == _state(expected_apps), "заявления в базе отличаются от построчной модели"
+
+    # Отброшенные строки не трогают существующие заявления
+    petrov = [app for app in apps if normalize_query(app["fio"]) == "петров петр петрович"]
+    assert len(petrov) == 1 and petrov[0]["status"] == "queued", "строка с известным ФИО изменила заявление"
+    # Из двух совпавших заявлений обновлено только первое
+    kuznetsov = [app for app in apps if app["fio"] == "Кузнецов Олег Игоревич"]
+    assert [app["status_reason"] for app in kuznetsov] == [
+        UNKNOWN_REASON.format("Почта России"), UNKNOWN_REASON.format("Лично")
+    ], "строка выгрузки обновила несколько заявлений"
+    # Повтор ключа ЕПГУ: последняя строка
+    fedorov = [app for app in apps if app["fio"] == "Федоров Федор Федорович"]
+    assert len(fedorov) == 1 and fedorov[0]["status"] == "queued", "при повторе ключа применена не последняя строка"
+
+    # Повторная загрузка того же файла ничего не меняет
+    again = await import_1c_applications_from_excel(path)
+    assert again["manifest"]["same_file"], "повторная загрузка файла не распознана"
+    assert _state(await load_applications()) == _state(apps), "повторная загрузка изменила заявления"
+
+
+async def main():
+    admin_engine = create_async_engine(DB_DSN)
+    async with admin_engine.begin() as conn:
+        await conn.execute(text(f"DROP SCHEMA IF EXISTS {TEST_SCHEMA} CASCADE"))
+        await conn.execute(text(f"CREATE SCHEMA {TEST_SCHEMA}"))
+    try:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "export_1c.xlsx")
+            write_export(path)
+            print("🧪 Импорт выгрузки 1С в тестовую схему")
+            await run_check(path)
+        print("✅ Итоги и заявления совпадают с построчной моделью")
+    finally:
+        await engine.dispose()
+        async with admin_engine.begin() as conn:
+            await conn.execute(text(f"DROP SCHEMA IF EXISTS {TEST_SCHEMA} CASCADE"))
+        await admin_engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,41 +1,336 @@
+import csv
+import hashlib
+import os
+import shutil
+import tempfile
+import zipfile
+from contextlib import contextmanager
+
+import numpy as np
 import pandas as pd
-from datetime import datetime
+from openpyxl import load_workbook
+from pandas._libs.parsers import STR_NA_VALUES
+from utils.workers import run_in_worker, should_offload
 
-def parse_lk_applications_from_excel(file_path: str):
-    df = pd.read_excel(file_path)
-    # Фильтрация
-    filtered = []
-    seen_fio = set()
-    for _, row in df.iterrows():
-        fio = str(row["Физическое лицо"]).strip()
-        status = str(row["Статус заявления в ПК"]).strip().lower()
-        changes = str(row["Есть изменения"]).strip().lower()
-        date_str = str(row["Дата первой подачи"]).strip()
+# python-calamine необязателен: нативный (Rust) движок для pd.read_excel, он же
+# единственный, который читает старый формат .xls; без него .xlsx читает openpyxl
+try:
+    import python_calamine  # noqa: F401
+    EXCEL_ENGINE = "calamine"
+except ImportError:
+    EXCEL_ENGINE = "openpyxl"
+
+# Форматы дат в выгрузках, в порядке попыток разбора
+DATE_FORMATS = ["%d.%m.%Y %H:%M:%S", "%d.%m.%Y %H:%M", "%d.%m.%Y"]
+LK_DATE_FORMATS = DATE_FORMATS[:2]
+
+# Строк в одном чанке потокового чтения
+EXCEL_CHUNK_SIZE = 5000
+
+# Поддерживаемые форматы загрузки (в т.ч. внутри .zip)
+UPLOAD_EXTENSIONS = (".xlsx", ".xlsm", ".xls", ".csv", ".tsv", ".txt", ".zip")
+TEXT_ENCODINGS = ("utf-8-sig", "cp1251")
+
+
+def upload_suffix(file_name: str) -> str:
+    """Расширение загруженного файла для временного файла (по умолчанию .xlsx)"""
+    ext = os.path.splitext(file_name or "")[1].lower()
+    return ext if ext in UPLOAD_EXTENSIONS else ".xlsx"
+
+
+def detect_format(file_path: str) -> str:
+    """Формат по содержимому: 'xlsx', 'xls', 'zip' (архив с таблицей) или 'csv'"""
+    with open(file_path, "rb") as f:
+        head = f.read(8)
+    if head.startswith(b"\xd0\xcf\x11\xe0"):
+        return "xls"
+    if head.startswith(b"PK") and zipfile.is_zipfile(file_path):
+        with zipfile.ZipFile(file_path) as archive:
+            names = set(archive.namelist())
+        return "xlsx" if "xl/workbook.xml" in names else "zip"
+    return "csv"
+
+
+def detect_encoding(file_path: str) -> str:
+    """Кодировка текстового файла: UTF-8 (с BOM или без), иначе cp1251"""
+    with open(file_path, "rb") as f:
+        sample = f.read(1 << 20)
+    for encoding in TEXT_ENCODINGS:
         try:
-            submitted_at = datetime.strptime(date_str, "%d.%m.%Y %H:%M:%S")
-        except Exception:
-            try:
-                submitted_at = datetime.strptime(date_str, "%d.%m.%Y %H:%M")
-            except Exception:
-                continue
-        if fio in seen_fio:
-            continue
-        if status == "подано":
-            filtered.append({"fio": fio, "submitted_at": submitted_at, "priority": False})
-            seen_fio.add(fio)
-        elif status == "на рассмотрении" and changes == "да":
-            filtered.append({"fio": fio, "submitted_at": submitted_at, "priority": True})
-            seen_fio.add(fio)
+            sample.decode(encoding)
+            return encoding
+        except UnicodeDecodeError as e:
+            # Выборка могла оборвать многобайтный символ
+            if encoding != "cp1251" and e.start >= len(sample) - 3:
+                return encoding
+    return "cp1251"
+
+
+def detect_delimiter(file_path: str, encoding: str) -> str:
+    with open(file_path, encoding=encoding, errors="replace") as f:
+        sample = f.read(64 * 1024)
+    try:
+        return csv.Sniffer().sniff(sample, delimiters=";,\t|").delimiter
+    except csv.Error:
+        return "\t" if file_path.lower().endswith(".tsv") else ","
+
+
+@contextmanager
+def unpacked(file_path: str):
+    """
+    Путь к таблице для чтения: для .zip — первая по имени таблица из архива,
+    распакованная во временный каталог, для остальных — сам файл
+    """
+    if detect_format(file_path) != "zip":
+        yield file_path
+        return
+    with zipfile.ZipFile(file_path) as archive:
+        members = sorted(
+            name for name in archive.namelist()
+            if not name.endswith("/") and not name.startswith("__MACOSX/")
+            and os.path.splitext(name)[1].lower() in UPLOAD_EXTENSIONS[:-1]
+        )
+        if not members:
+            raise ValueError("В архиве нет таблицы (.xlsx, .xls, .csv, .tsv)")
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            yield archive.extract(members[0], tmp_dir)
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+def _excel_engine(fmt: str, engine: str = None) -> str:
+    """Движок pd.read_excel для формата; .xls без calamine не читается — понятная ошибка"""
+    engine = engine or EXCEL_ENGINE
+    if fmt == "xls" and engine != "calamine":
+        raise ValueError(
+            "Файлы .xls читаются только с установленным python-calamine; "
+            "сохраните таблицу как .xlsx или CSV и загрузите снова"
+        )
+    return engine
+
+
+def _csv_options(file_path: str):
+    encoding = detect_encoding(file_path)
+    # Все значения — строки, пустые — NaN: так же, как текстовые ячейки Excel
+    return {"encoding": encoding, "sep": detect_delimiter(file_path, encoding), "dtype": str}
+
+
+def read_table(file_path: str, engine: str = None, check_cancelled=None) -> pd.DataFrame:
+    """
+    Прочитать первый лист таблицы целиком. Формат определяется по содержимому:
+    .xlsx/.xls — pd.read_excel (calamine, если установлен python-calamine; .xls — только с ним),
+    CSV/TSV — pd.read_csv с определением кодировки и разделителя, .zip — таблица из архива.
+    check_cancelled вызывается после чтения, а для CSV и .xlsx без calamine, которые
+    читаются чанками (open_chunk_reader), — и между чанками
+    """
+    engine = engine or EXCEL_ENGINE
+    with unpacked(file_path) as path:
+        fmt = detect_format(path)
+        if check_cancelled and (fmt == "csv" or (fmt == "xlsx" and engine == "openpyxl")):
+            df = _read_chunks(path, check_cancelled)
+        elif fmt == "csv":
+            df = pd.read_csv(path, **_csv_options(path))
+        else:
+            df = pd.read_excel(path, engine=_excel_engine(fmt, engine))
+    if check_cancelled:
+        check_cancelled()
+    return df
+
+
+def _read_chunks(path: str, check_cancelled) -> pd.DataFrame:
+    with open_chunk_reader(path) as reader:
+        chunks = []
+        for chunk in reader:
+            check_cancelled()
+            chunks.append(chunk)
+        if not chunks:
+            return pd.DataFrame(columns=reader.columns)
+        return pd.concat(chunks, ignore_index=True)
+
+
+class ChunkReader:
+    """
+    Потоковое чтение таблицы DataFrame-чанками по chunk_size строк.
+    columns — заголовок, rows_read — прочитано строк, total_rows — всего строк (если известно)
+    """
+
+    def __init__(self, chunk_size: int = EXCEL_CHUNK_SIZE):
+        self.chunk_size = chunk_size
+        self.rows_read = 0
+        self.columns = []
+        self.total_rows = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        pass
+
+    def _counted(self, frame: pd.DataFrame) -> pd.DataFrame:
+        self.rows_read += len(frame)
+        return frame
+
+
+class XlsxChunkReader(ChunkReader):
+    """
+    Первый лист .xlsx через openpyxl read_only: книга не загружается целиком,
+    строки читаются по мере обхода. Заголовок и пустые ячейки обрабатываются
+    как в pd.read_excel, поэтому чанки можно передавать в те же функции разбора
+    """
+
+    def __init__(self, file_path: str, chunk_size: int = EXCEL_CHUNK_SIZE):
+        super().__init__(chunk_size)
+        self._workbook = load_workbook(file_path, read_only=True, data_only=True)
+        sheet = self._workbook.worksheets[0]
+        self._rows = sheet.iter_rows(values_only=True)
+        self.columns = _header(next(self._rows, None) or ())
+        # Размер листа из метаданных файла; может отсутствовать
+        self.total_rows = sheet.max_row - 1 if sheet.max_row else None
+
+    def close(self):
+        self._workbook.close()
+
+    def __iter__(self):
+        width = len(self.columns)
+        chunk = []
+        for row in self._rows:
+            if len(row) != width:
+                row = (tuple(row) + (None,) * width)[:width]
+            chunk.append(row)
+            if len(chunk) >= self.chunk_size:
+                yield self._frame(chunk)
+                chunk = []
+        if chunk:
+            yield self._frame(chunk)
+
+    def _frame(self, rows):
+        frame = pd.DataFrame(rows, columns=self.columns)
+        # Пустые ячейки и строки вида 'N/A' — NaN, как у pd.read_excel
+        return self._counted(frame.mask(frame.isna() | frame.isin(STR_NA_VALUES)))
+
+
+class CsvChunkReader(ChunkReader):
+    """CSV/TSV через pd.read_csv(chunksize=...)"""
+
+    def __init__(self, file_path: str, chunk_size: int = EXCEL_CHUNK_SIZE):
+        super().__init__(chunk_size)
+        self._reader = pd.read_csv(file_path, chunksize=chunk_size, **_csv_options(file_path))
+        self._first = next(self._reader, None)
+        if self._first is not None:
+            self.columns = list(self._first.columns)
+
+    def close(self):
+        self._reader.close()
+
+    def __iter__(self):
+        if self._first is not None:
+            first, self._first = self._first, None
+            yield self._counted(first)
+        for chunk in self._reader:
+            yield self._counted(chunk)
+
+
+class FrameChunkReader(ChunkReader):
+    """Таблица, прочитанная целиком (.xls и другие форматы без потокового чтения)"""
+
+    def __init__(self, df: pd.DataFrame, chunk_size: int = EXCEL_CHUNK_SIZE):
+        super().__init__(chunk_size)
+        self._df = df
+        self.columns = list(df.columns)
+        self.total_rows = len(df)
+
+    def __iter__(self):
+        for start in range(0, len(self._df), self.chunk_size):
+            yield self._counted(self._df.iloc[start:start + self.chunk_size])
+
+
+def open_chunk_reader(file_path: str, chunk_size: int = EXCEL_CHUNK_SIZE) -> ChunkReader:
+    """Потоковый читатель по формату файла (file_path — уже распакованный, см. unpacked)"""
+    fmt = detect_format(file_path)
+    if fmt == "xlsx":
+        return XlsxChunkReader(file_path, chunk_size)
+    if fmt == "csv":
+        return CsvChunkReader(file_path, chunk_size)
+    return FrameChunkReader(pd.read_excel(file_path, engine=_excel_engine(fmt)), chunk_size)
+
+
+def _header(values):
+    """Имена колонок как у pd.read_excel: пустые — 'Unnamed: i', повторы — 'имя.1', 'имя.2'"""
+    columns = []
+    seen = {}
+    for i, value in enumerate(values):
+        name = f"Unnamed: {i}" if value is None else value
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        columns.append(name)
+    return columns
+
+
+def _text(df: pd.DataFrame, column) -> pd.Series:
+    """Колонка как строки без пробелов по краям (пустые ячейки дают 'nan', как str(NaN))"""
+    return df[column].astype(str).str.strip()
+
+
+def _parse_dates(values: pd.Series, formats=DATE_FORMATS) -> pd.Series:
+    """Разобрать даты по списку форматов: каждый следующий формат — только для еще не разобранных"""
+    result = pd.Series(pd.NaT, index=values.index, dtype="datetime64[ns]")
+    for fmt in formats:
+        missing = result.isna()
+        if not missing.any():
+            break
+        result[missing] = pd.to_datetime(values[missing], format=fmt, errors="coerce")
+    return result
+
+
+def _datetimes(values: pd.Series):
+    """datetime64-колонка -> список datetime (как возвращал strptime)"""
+    return values.to_numpy(dtype="datetime64[us]").tolist()
+
+
+def _records(columns: dict):
+    """Колонки {ключ: значения} -> список словарей в порядке строк"""
+    keys = list(columns)
+    return [dict(zip(keys, row)) for row in zip(*columns.values())]
+
+
+def parse_lk_applications(df: pd.DataFrame):
+    """Заявления ЛК из таблицы выгрузки: поданные и на рассмотрении с изменениями (приоритетные)"""
+    fio = _text(df, "Физическое лицо")
+    status = _text(df, "Статус заявления в ПК").str.lower()
+    changes = _text(df, "Есть изменения").str.lower()
+    submitted_at = _parse_dates(_text(df, "Дата первой подачи"), LK_DATE_FORMATS)
+
+    priority = (status == "на рассмотрении") & (changes == "да")
+    selected = pd.DataFrame({
+        "fio": fio,
+        "submitted_at": submitted_at,
+        "priority": priority,
+    })[submitted_at.notna() & ((status == "подано") | priority)]
+    # Одно заявление на ФИО — первое подходящее по порядку строк
+    selected = selected.drop_duplicates("fio", keep="first")
     # Сортировка: сначала priority=True, потом False, внутри — по дате
-    filtered.sort(key=lambda x: (not x["priority"], x["submitted_at"]))
-    return filtered
+    selected = selected.assign(regular=~selected["priority"]).sort_values(["regular", "submitted_at"], kind="stable")
+    return _records({
+        "fio": selected["fio"].tolist(),
+        "submitted_at": _datetimes(selected["submitted_at"]),
+        "priority": selected["priority"].tolist(),
+    })
 
-def parse_epgu_applications_from_excel(file_path: str):
-    print("=== Вызвана функция parse_epgu_applications_from_excel ===")
-    df = pd.read_excel(file_path)
-    print(f"Колонки в файле: {list(df.columns)}")
+
+def parse_lk_applications_from_excel(file_path: str, check_cancelled=None):
+    return parse_lk_applications(read_table(file_path, check_cancelled=check_cancelled))
+
+
+def parse_epgu_applications(df: pd.DataFrame):
+    """Заявления ЕПГУ: колонки ФИО и даты подачи определяются по названию"""
     filtered = []
-    seen = set()
     fio_column = None
     date_column = None
     for col in df.columns:
@@ -48,165 +343,206 @@ def parse_epgu_applications_from_excel(file_path: str):
         fio_column = df.columns[0]
     if not date_column and len(df.columns) > 1:
         date_column = df.columns[1]
-    for _, row in df.iterrows():
-        fio = str(row[fio_column]).strip() if fio_column else None
-        date_str = str(row[date_column]).strip() if date_column else None
-        if not fio or fio == 'nan' or not date_str or date_str == 'nan':
-            continue
-        try:
-            submitted_at = datetime.strptime(date_str, "%d.%m.%Y %H:%M:%S")
-        except Exception:
-            try:
-                submitted_at = datetime.strptime(date_str, "%d.%m.%Y %H:%M")
-            except Exception:
-                try:
-                    submitted_at = datetime.strptime(date_str, "%d.%m.%Y")
-                except Exception:
-                    continue
-        key = (fio, submitted_at)
-        if key in seen:
-            continue
-        filtered.append({"fio": fio, "submitted_at": submitted_at})
-        seen.add(key)
-    filtered.sort(key=lambda x: x["submitted_at"])
+    if fio_column is None or date_column is None:
+        return filtered
+
+    fio = _text(df, fio_column)
+    date_str = _text(df, date_column)
+    submitted_at = _parse_dates(date_str)
+    valid = (fio != "") & (fio != "nan") & (date_str != "") & (date_str != "nan") & submitted_at.notna()
+
+    selected = pd.DataFrame({"fio": fio, "submitted_at": submitted_at})[valid]
+    selected = selected.drop_duplicates(["fio", "submitted_at"], keep="first")
+    selected = selected.sort_values("submitted_at", kind="stable")
+    filtered = _records({
+        "fio": selected["fio"].tolist(),
+        "submitted_at": _datetimes(selected["submitted_at"]),
+    })
+    return filtered
+
+
+def parse_epgu_applications_from_excel(file_path: str, check_cancelled=None):
+    print("=== Вызвана функция parse_epgu_applications_from_excel ===")
+    df = read_table(file_path, check_cancelled=check_cancelled)
+    print(f"Колонки в файле: {list(df.columns)}")
+    filtered = parse_epgu_applications(df)
     print(f"Найдено строк для импорта: {len(filtered)}")
     return filtered
 
-async def parse_1c_applications_from_excel(file_path: str, progress_callback=None, existing_fios_by_queue=None):
+
+def classify_1c_applications(df: pd.DataFrame, skip_fios=None):
+    """
+    Распределение строк выгрузки 1С по очередям lk / epgu / unknown.
+    skip_fios — ФИО, которые уже есть в очередях: такие строки пропускаются
+    """
+    fio = _text(df, "Физическое лицо")
+    submission_method = _text(df, "Способ подачи заявления")
+    status = _text(df, "Статус заявления в ПК").str.lower()
+    has_changes = _text(df, "Есть изменения").str.lower()
+    date_str = _text(df, "Дата первой подачи")
+
+    valid = (fio != "") & (fio != "nan") & (date_str != "") & (date_str != "nan")
+    if skip_fios:
+        # Если ФИО уже есть в одной из очередей — пропускаем
+        valid &= ~fio.isin(skip_fios)
+    submitted_at = pd.Series(pd.NaT, index=df.index, dtype="datetime64[ns]")
+    submitted_at[valid] = _parse_dates(date_str[valid])
+    valid &= submitted_at.notna()
+
+    # ЛК (СМС-подтверждение), затем ЕПГУ, затем пустой способ подачи, остальное — unknown
+    is_lk = submission_method.str.contains("СМС-подтверждение", regex=False)
+    is_epgu = ~is_lk & submission_method.str.contains("ЕПГУ", regex=False)
+    is_empty_lk = ~is_lk & ~is_epgu & (submission_method == "") & (status == "подано")
+    is_unknown = ~is_lk & ~is_epgu & ~is_empty_lk
+
+    accepted = status == "принято"
+    reviewing = status == "на рассмотрении"
+    lk_priority = is_lk & reviewing & (has_changes == "да")
+    lk_rejected = is_lk & reviewing & (has_changes != "да")
+    lk_queued = (is_lk & (status == "подано")) | lk_priority | is_empty_lk
+
+    conditions = [
+        is_lk & accepted, lk_queued, lk_rejected,
+        is_epgu & accepted, is_epgu & reviewing,
+        is_unknown,
+    ]
+    queue_type = np.select(conditions, ["lk", "lk", "lk", "epgu", "epgu", "unknown"], default="")
+    app_status = np.select(conditions, ["accepted", "queued", "rejected", "accepted", "queued", "queued"], default="")
+    status_reason = pd.Series(np.full(len(df), None, dtype=object), index=df.index)
+    status_reason[lk_rejected] = "загружено администратором"
+    status_reason[is_unknown] = "Неизвестный способ подачи: '" + submission_method[is_unknown] + "'"
+    # Остальные статусы (например, «Редактируется») не импортируются
+    valid &= queue_type != ""
+
+    frame = pd.DataFrame({
+        "fio": fio,
+        "submitted_at": submitted_at,
+        "queue_type": queue_type,
+        "status": app_status,
+        "is_priority": lk_priority,
+        "status_reason": status_reason,
+    })[valid]
+    # Отпечаток нормализованной строки (64 бита, векторно): неизменившиеся между
+    # загрузками строки пропускаются до работы с базой
+    frame = frame.assign(fingerprint=pd.util.hash_pandas_object(frame, index=False).to_numpy().view("int64"))
+
+    def applications(queue_frame, sort_columns):
+        queue_frame = queue_frame.sort_values(sort_columns, kind="stable")
+        return _records({
+            "fio": queue_frame["fio"].tolist(),
+            "submitted_at": _datetimes(queue_frame["submitted_at"]),
+            "queue_type": queue_frame["queue_type"].tolist(),
+            "status": queue_frame["status"].tolist(),
+            "is_priority": queue_frame["is_priority"].tolist(),
+            "status_reason": queue_frame["status_reason"].tolist(),
+            "fingerprint": queue_frame["fingerprint"].tolist(),
+        })
+
+    lk = frame[frame["queue_type"] == "lk"]
+    return {
+        "lk": applications(lk.assign(regular=~lk["is_priority"]), ["regular", "submitted_at"]),
+        "epgu": applications(frame[frame["queue_type"] == "epgu"], "submitted_at"),
+        "unknown": applications(frame[frame["queue_type"] == "unknown"], "submitted_at")
+    }
+
+
+def parse_1c_chunks(job, file_path: str, skip_fios):
+    """
+    Задача пула (utils.workers): потоково разобрать выгрузку 1С.
+    Результат каждого чанка отправляется через job.emit, прогресс — через job.report.
+    Возвращает число прочитанных строк
+    """
+    with unpacked(file_path) as path, open_chunk_reader(path) as reader:
+        print(f"Колонки в файле: {reader.columns}")
+        print(f"Всего строк в файле: {reader.total_rows}")
+        for chunk in reader:
+            job.check_cancelled()
+            job.emit(classify_1c_applications(chunk, skip_fios))
+            progress_text = f"📊 Обработано строк: {reader.rows_read}"
+            if reader.total_rows:
+                progress_text += f"/{reader.total_rows}"
+            print(progress_text)
+            job.report(progress_text, done=reader.rows_read, total=reader.total_rows)
+        return reader.rows_read
+
+
+def file_sha256(file_path: str, check_cancelled=None) -> str:
+    """SHA-256 содержимого файла — ключ загрузки в манифесте импорта"""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            if check_cancelled:
+                check_cancelled()
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def run_parser(job, parser, file_path: str):
+    """Задача пула: выполнить функцию разбора файла; parser проверяет отмену через check_cancelled"""
+    job.check_cancelled()
+    return parser(file_path, check_cancelled=job.check_cancelled)
+
+
+async def parse_1c_applications_from_excel(file_path: str, progress_callback=None, existing_fios_by_queue=None,
+                                           cancel_key=None):
     """
     Парсинг выгрузки из 1С для обработки заявлений ЛК и ЕПГУ
     existing_fios_by_queue: dict[str, set[str]] — ФИО, уже присутствующие в каждой очереди
+
+    Файл читается потоково (open_chunk_reader) вне цикла событий (utils.workers: большой
+    файл — в процессе пула, небольшой — в потоке): бот не блокируется, память не растет с размером выгрузки, а прогресс сообщается
+    по мере чтения строк. Принимаются .xlsx, .xls, CSV/TSV и .zip.
+    cancel_key — ключ для отмены разбора через utils.workers.cancel_jobs
     """
     print("=== Вызвана функция parse_1c_applications_from_excel ===")
-    df = pd.read_excel(file_path)
-    print(f"Колонки в файле: {list(df.columns)}")
-    print(f"Всего строк в файле: {len(df)}")
-    
-    lk_applications = []
-    epgu_applications = []
-    unknown_applications = []
-    
-    processed_count = 0
     if existing_fios_by_queue is None:
         existing_fios_by_queue = {}
     # Собираем все ФИО из "проблемных" и почтовых очередей в один set
     skip_fios = set()
     for q in ["lk_problem", "epgu_mail", "epgu_problem", "epgu", "lk"]:
         skip_fios.update(existing_fios_by_queue.get(q, set()))
-    
-    for _, row in df.iterrows():
-        processed_count += 1
-        if processed_count % 150 == 0:
-            progress_text = f"📊 Обработано строк: {processed_count}/{len(df)}"
-            print(progress_text)
-            if progress_callback:
-                try:
-                    await progress_callback(progress_text)
-                except:
-                    pass
-        fio = str(row["Физическое лицо"]).strip()
-        submission_method = str(row["Способ подачи заявления"]).strip()
-        status = str(row["Статус заявления в ПК"]).strip()
-        has_changes = str(row["Есть изменения"]).strip().lower()
-        date_str = str(row["Дата первой подачи"]).strip()
-        if not fio or fio == 'nan' or not date_str or date_str == 'nan':
-            continue
-        # Если ФИО уже есть в одной из "особых" очередей — пропускаем
-        if fio in skip_fios:
-            continue
-        try:
-            submitted_at = datetime.strptime(date_str, "%d.%m.%Y %H:%M:%S")
-        except Exception:
-            try:
-                submitted_at = datetime.strptime(date_str, "%d.%m.%Y %H:%M")
-            except Exception:
-                try:
-                    submitted_at = datetime.strptime(date_str, "%d.%m.%Y")
-                except Exception:
-                    continue
-        queue_type = None
-        app_status = None
-        is_priority = False
-        status_reason = None
-        # ЛК (СМС-подтверждение)
-        if "СМС-подтверждение" in submission_method:
-            queue_type = "lk"
-            if status.lower() == "принято":
-                app_status = "accepted"
-            elif status.lower() == "подано":
-                app_status = "queued"
-            elif status.lower() == "на рассмотрении":
-                if has_changes == "да":
-                    app_status = "queued"
-                    is_priority = True
-                else:
-                    app_status = "rejected"
-                    status_reason = "загружено администратором"
-            elif status.lower() == "редактируется":
-                continue
-            else:
-                continue
-        # ЕПГУ
-        elif "ЕПГУ" in submission_method:
-            queue_type = "epgu"
-            if status.lower() == "принято":
-                app_status = "accepted"
-            elif status.lower() == "на рассмотрении":
-                app_status = "queued"
-            else:
-                continue
-        # Пустой способ подачи
-        elif submission_method == "" and status.lower() == "подано":
-            queue_type = "lk"
-            app_status = "queued"
-        # Пустой или нераспознанный способ подачи — отдельная очередь
-        else:
-            queue_type = "unknown"
-            app_status = "queued"
-            status_reason = f"Неизвестный способ подачи: '{submission_method}'"
-        application = {
-            "fio": fio,
-            "submitted_at": submitted_at,
-            "queue_type": queue_type,
-            "status": app_status,
-            "is_priority": is_priority,
-            "status_reason": status_reason
-        }
-        if queue_type == "lk":
-            lk_applications.append(application)
-        elif queue_type == "epgu":
-            epgu_applications.append(application)
-        elif queue_type == "unknown":
-            unknown_applications.append(application)
-    lk_applications.sort(key=lambda x: (not x["is_priority"], x["submitted_at"]))
-    epgu_applications.sort(key=lambda x: x["submitted_at"])
-    unknown_applications.sort(key=lambda x: x["submitted_at"])
-    final_text = f"✅ Обработка завершена. Всего обработано строк: {processed_count}"
+
+    # Импорт здесь: процессы пула загружают этот модуль ради функций задач и не должны тянуть aiogram
+    from utils.progress import as_reporter
+    progress = as_reporter(progress_callback)
+    result = {"lk": [], "epgu": [], "unknown": []}
+
+    def collect(chunk_result):
+        for queue_type, applications in chunk_result.items():
+            result[queue_type].extend(applications)
+
+    rows_read = await run_in_worker(
+        parse_1c_chunks, file_path, skip_fios,
+        progress_callback=progress, on_item=collect, cancel_key=cancel_key, offload=should_offload(file_path)
+    )
+
+    # Чанки отсортированы по отдельности — досортировываем объединенные списки
+    result["lk"].sort(key=lambda x: (not x["is_priority"], x["submitted_at"]))
+    result["epgu"].sort(key=lambda x: x["submitted_at"])
+    result["unknown"].sort(key=lambda x: x["submitted_at"])
+    final_text = f"✅ Обработка завершена. Всего обработано строк: {rows_read}"
     print(final_text)
-    if progress_callback:
-        try:
-            await progress_callback(final_text)
-        except:
-            pass
-    print(f"Найдено ЛК заявлений: {len(lk_applications)}")
-    print(f"Найдено ЕПГУ заявлений: {len(epgu_applications)}")
-    print(f"Найдено заявлений с неизвестным способом подачи: {len(unknown_applications)}")
-    return {
-        "lk": lk_applications,
-        "epgu": epgu_applications,
-        "unknown": unknown_applications
-    }
+    progress.report(final_text)
+    await progress.flush()
+    print(f"Найдено ЛК заявлений: {len(result['lk'])}")
+    print(f"Найдено ЕПГУ заявлений: {len(result['epgu'])}")
+    print(f"Найдено заявлений с неизвестным способом подачи: {len(result['unknown'])}")
+    return result
+
 
-def parse_epgu_mail_applications_from_excel(file_path: str):
+def parse_epgu_mail_applications(df: pd.DataFrame):
+    """Строки очереди ЕПГУ почта с заполненными ФИО и Email"""
+    if "Физическое лицо" not in df.columns or "Email" not in df.columns:
+        return []
+    fio = _text(df, "Физическое лицо")
+    email = _text(df, "Email")
+    valid = (fio != "") & (email != "") & (email != "nan")
+    return _records({"fio": fio[valid].tolist(), "email": email[valid].tolist()})
+
+
+def parse_epgu_mail_applications_from_excel(file_path: str, check_cancelled=None):
     """
     Парсит excel-файл очереди ЕПГУ почта с колонками N, Физическое лицо, Email
     Возвращает список словарей с fio и email
     """
-    df = pd.read_excel(file_path)
-    filtered = []
-    for _, row in df.iterrows():
-        fio = str(row.get("Физическое лицо", "")).strip()
-        email = str(row.get("Email", "")).strip()
-        if fio and email and email != 'nan':
-            filtered.append({"fio": fio, "email": email})
-    return filtered 
\ No newline at end of file
+    return parse_epgu_mail_applications(read_table(file_path, check_cancelled=check_cancelled))
@@ -0,0 +1,304 @@
+"""
+Фоновые задания импорта: таблица import_jobs и исполнитель в процессе бота.
+
+Хендлер загрузки сохраняет файл в IMPORT_JOBS_DIR, ставит задание в очередь
+(enqueue_import_job) и сразу отвечает. ImportJobRunner выбирает ожидающие задания
+по порядку постановки; задания, затрагивающие одни и те же очереди (JOB_TARGETS),
+выполняются строго последовательно, независимые — параллельно. Статус, время,
+число строк, итоги и ошибка сохраняются в задании; прогресс и отчет показываются
+в сообщении, из которого файл был загружен.
+
+Задания, прерванные остановкой бота, при следующем запуске возвращаются в очередь
+и выполняются заново (импорт повторно не дублирует заявления).
+"""
+import asyncio
+import json
+import logging
+import os
+import time
+from typing import Dict, Optional
+
+from aiogram import Bot
+
+from config import IMPORT_JOBS_DIR, IMPORT_JOBS_POLL_INTERVAL
+from db.crud import (
+    import_1c_applications_from_excel, import_applications_from_excel, import_epgu_mail_applications_from_excel,
+    enqueue_import_job, get_queued_import_jobs, start_import_job, update_import_job, requeue_interrupted_import_jobs,
+    get_moscow_now
+)
+from db.models import ImportJobStatusEnum
+from keyboards.admin import admin_queue_menu_keyboard, admin_import_progress_keyboard
+from utils.logger import get_logger
+from utils.progress import ProgressReporter
+from utils.workers import JobCancelled
+
+logger = logging.getLogger(__name__)
+
+# Очереди, которые затрагивает задание каждого вида
+JOB_TARGETS = {
+    "1c": {"lk", "epgu", "unknown"},
+    "lk": {"lk"},
+    "epgu": {"epgu"},
+    "epgu_mail": {"epgu", "epgu_mail"},
+}
+
+JOB_KIND_NAMES = {
+    "1c": "Выгрузка 1С",
+    "lk": "ЛК",
+    "epgu": "ЕПГУ",
+    "epgu_mail": "ЕПГУ (почта)",
+}
+
+JOB_STATUS_ICONS = {
+    ImportJobStatusEnum.QUEUED: "⏳",
+    ImportJobStatusEnum.RUNNING: "🔄",
+    ImportJobStatusEnum.DONE: "✅",
+    ImportJobStatusEnum.FAILED: "❌",
+    ImportJobStatusEnum.CANCELLED: "⛔",
+}
+
+
+def job_file_path(suffix: str) -> str:
+    """Путь для файла нового задания в IMPORT_JOBS_DIR"""
+    os.makedirs(IMPORT_JOBS_DIR, exist_ok=True)
+    return os.path.join(IMPORT_JOBS_DIR, f"{time.time_ns()}{suffix}")
+
+
+def _normalize_result(kind: str, result) -> dict:
+    if kind in ("lk", "epgu"):
+        added, skipped, total = result
+        return {"added": added, "skipped": skipped, "total": total}
+    return result
+
+
+def result_rows(kind: str, result: dict) -> int:
+    """Число строк файла, обработанных заданием"""
+    if kind == "1c":
+        manifest = result.get("manifest", {})
+        if manifest.get("total"):
+            return manifest["total"]
+        return sum(result.get(q, {}).get("total", 0) for q in ("lk", "epgu", "unknown"))
+    return result.get("total", 0)
+
+
+def format_import_report(kind: str, result: dict) -> str:
+    """Текст отчета об импорте для сообщения администратору"""
+    if kind == "1c":
+        report_text = "📊 Импорт выгрузки 1С завершён\n\n"
+        for queue_type, title in [("lk", "📱 ЛК заявления"), ("epgu", "🌐 ЕПГУ заявления")]:
+            data = result.get(queue_type, {})
+            report_text += f"{title}:\n"
+            report_text += f"   Всего обработано: {data.get('total', 0)}\n"
+            report_text += f"   Добавлено: {data.get('added', 0)}\n"
+            report_text += f"   Обновлено: {data.get('updated', 0)}\n"
+            report_text += f"   Пропущено: {data.get('skipped', 0)}\n\n"
+        # Строки, не изменившиеся с прошлых загрузок
+        manifest = result.get("manifest", {})
+        if manifest.get("same_file"):
+            report_text += "⏭ Файл не изменился с прошлой загрузки\n"
+        elif manifest.get("total"):
+            report_text += f"⏭ Без изменений: {manifest['unchanged']} из {manifest['total']} строк\n"
+        return report_text
+    if kind == "epgu_mail":
+        return (
+            f"Импорт завершён для очереди: {kind}.\n"
+            f"Всего строк: {result.get('total', '?')}\n"
+            f"Добавлено новых: {result.get('added', '?')}\n"
+            f"Перенесено из epgu: {result.get('moved', '?')}\n"
+            f"Пропущено: {result.get('skipped', '?')}"
+        )
+    return (
+        f"Импорт завершён для очереди: {kind}.\n"
+        f"Всего строк: {result.get('total', '?')}\n"
+        f"Добавлено: {result.get('added', '?')}\n"
+        f"Пропущено: {result.get('skipped', '?')}"
+    )
+
+
+def format_import_job(job) -> str:
+    """Строка списка заданий: статус, время, скорость и ошибка"""
+    icon = JOB_STATUS_ICONS.get(job.status, "")
+    text = f"{icon} #{job.id} {JOB_KIND_NAMES.get(job.kind, job.kind)}"
+    if job.file_name:
+        text += f" — {job.file_name}"
+    text += f"\n   Поставлено: {job.created_at:%d.%m %H:%M:%S}"
+    if job.employee_name:
+        text += f", {job.employee_name}"
+    if job.started_at:
+        end = job.finished_at or get_moscow_now()
+        duration = (end - job.started_at).total_seconds()
+        text += f"\n   Выполнение: {duration:.1f} с"
+        if job.total_rows and duration > 0:
+            text += f", строк: {job.total_rows} ({job.total_rows / duration:.0f} строк/с)"
+    if job.status == ImportJobStatusEnum.RUNNING and job.progress:
+        text += f"\n   {job.progress.splitlines()[-1]}"
+    if job.error:
+        text += f"\n   Ошибка: {job.error}"
+    return text
+
+
+class ImportJobRunner:
+    def __init__(self, bot: Bot):
+        self.bot = bot
+        self._wakeup = asyncio.Event()
+        self._loop_task: Optional[asyncio.Task] = None
+        self._running: Dict[int, asyncio.Task] = {}
+        self._targets: Dict[int, set] = {}
+
+    async def start(self):
+        requeued = await requeue_interrupted_import_jobs()
+        if requeued:
+            logger.info(f"Возвращено в очередь прерванных заданий импорта: {requeued}")
+        self._loop_task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        tasks = list(self._running.values())
+        if self._loop_task:
+            tasks.append(self._loop_task)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._loop_task = None
+
+    def notify(self):
+        """Разбудить исполнитель после постановки задания"""
+        self._wakeup.set()
+
+    async def _loop(self):
+        while True:
+            try:
+                await self._start_ready()
+            except Exception as e:
+                logger.error(f"Ошибка выбора заданий импорта: {e}")
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=IMPORT_JOBS_POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+    async def _start_ready(self):
+        busy = set().union(*self._targets.values())
+        for job in await get_queued_import_jobs():
+            targets = JOB_TARGETS.get(job.kind, {job.kind})
+            if targets & busy:
+                # Более поздние задания по тем же очередям ждут, порядок сохраняется
+                busy |= targets
+                continue
+            busy |= targets
+            job = await start_import_job(job.id)
+            if job is None:
+                continue
+            self._targets[job.id] = targets
+            self._running[job.id] = asyncio.create_task(self._run(job))
+
+    async def _run(self, job):
+        started = time.monotonic()
+
+        async def send_progress(text):
+            # Ошибки отправки обрабатывает ProgressReporter (в т.ч. повтор после RetryAfter)
+            await update_import_job(job.id, progress=text)
+            if job.chat_id and job.message_id:
+                await self.bot.edit_message_text(
+                    f"📄 Задание #{job.id}: {JOB_KIND_NAMES.get(job.kind, job.kind)}\n\n{text}",
+                    chat_id=job.chat_id, message_id=job.message_id, reply_markup=admin_import_progress_keyboard(job.id)
+                )
+
+        # Один объект на задание: обновления не чаще IMPORT_PROGRESS_INTERVAL
+        progress = ProgressReporter(send_progress)
+        try:
+            if job.kind == "1c":
+                result = await import_1c_applications_from_excel(job.file_path, progress, cancel_key=job.id)
+            elif job.kind == "epgu_mail":
+                result = await import_epgu_mail_applications_from_excel(
+                    job.file_path, job.employee_name or job.created_by, progress, cancel_key=job.id
+                )
+            else:
+                result = await import_applications_from_excel(job.file_path, job.kind, progress, cancel_key=job.id)
+            # Отложенный прогресс не должен перезаписать итог задания
+            progress.cancel()
+            result = _normalize_result(job.kind, result)
+            await update_import_job(
+                job.id,
+                status=ImportJobStatusEnum.DONE,
+                finished_at=get_moscow_now(),
+                total_rows=result_rows(job.kind, result),
+                result=json.dumps(result, ensure_ascii=False),
+                error=None
+            )
+            logger.info(f"Задание импорта #{job.id} ({job.kind}) выполнено за {time.monotonic() - started:.1f} с")
+            await self._show(job, format_import_report(job.kind, result), admin_queue_menu_keyboard())
+            await self._log_queue_updated(job, result)
+        except JobCancelled:
+            progress.cancel()
+            await update_import_job(job.id, status=ImportJobStatusEnum.CANCELLED, finished_at=get_moscow_now())
+            await self._show(job, f"⛔ Задание импорта #{job.id} отменено.", admin_queue_menu_keyboard())
+        except asyncio.CancelledError:
+            # Остановка бота: задание останется RUNNING и будет перезапущено при старте
+            raise
+        except Exception as e:
+            progress.cancel()
+            logger.error(f"Задание импорта #{job.id} ({job.kind}) завершилось с ошибкой: {e}")
+            await update_import_job(
+                job.id, status=ImportJobStatusEnum.FAILED, finished_at=get_moscow_now(), error=str(e)[:1000]
+            )
+            await self._show(job, f"❌ Ошибка при импорте (задание #{job.id}): {e}", admin_queue_menu_keyboard())
+        finally:
+            progress.cancel()
+            self._running.pop(job.id, None)
+            self._targets.pop(job.id, None)
+            self.notify()
+        if os.path.exists(job.file_path):
+            os.unlink(job.file_path)
+
+    async def _show(self, job, text: str, reply_markup):
+        if not job.chat_id or not job.message_id:
+            return
+        try:
+            await self.bot.edit_message_text(
+                text, chat_id=job.chat_id, message_id=job.message_id, reply_markup=reply_markup
+            )
+        except Exception:
+            pass  # Игнорируем ошибки обновления
+
+    async def _log_queue_updated(self, job, result: dict):
+        telegram_logger = get_logger()
+        if not telegram_logger or not job.employee_name:
+            return
+        if job.kind == "1c":
+            for queue_type in ("lk", "epgu"):
+                data = result.get(queue_type, {})
+                changed = data.get("added", 0) + data.get("updated", 0)
+                if changed > 0:
+                    await telegram_logger.log_queue_updated(queue_type, job.employee_name, changed)
+        elif job.kind in ("lk", "epgu") and result.get("added", 0) > 0:
+            await telegram_logger.log_queue_updated(job.kind, job.employee_name, result["added"])
+
+
+_runner: Optional[ImportJobRunner] = None
+
+
+def get_import_runner() -> Optional[ImportJobRunner]:
+    return _runner
+
+
+async def start_import_runner(bot: Bot) -> ImportJobRunner:
+    global _runner
+    _runner = ImportJobRunner(bot)
+    await _runner.start()
+    return _runner
+
+
+async def stop_import_runner():
+    global _runner
+    if _runner is not None:
+        await _runner.stop()
+        _runner = None
+
+
+async def submit_import_job(kind: str, file_path: str, file_name: str, created_by: str, employee_name: str = None,
+                            chat_id: int = None, message_id: int = None):
+    """Поставить задание в очередь и разбудить исполнитель"""
+    job = await enqueue_import_job(kind, file_path, file_name, created_by, employee_name, chat_id, message_id)
+    if _runner is not None:
+        _runner.notify()
+    return job
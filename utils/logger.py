@@ -2,9 +2,12 @@ import logging
 import asyncio
 from typing import Optional, Dict, Any
 from aiogram import Bot
+from aiogram.types import BufferedInputFile
 from aiogram.exceptions import TelegramNetworkError, TelegramAPIError
 from config import GENERAL_CHAT_ID, ADMIN_LOG_CHAT_ID, THREAD_IDS
 import traceback
+import csv
+import io
 from datetime import datetime
 
 class TelegramLogger:
@@ -44,6 +47,38 @@ class TelegramLogger:
             print(f"Ошибка отправки в тред {thread_name}: {e}")
             return False
     
+    async def log_document_to_thread(self, thread_name: str, caption: str, file_name: str, content: bytes,
+                                     parse_mode: str = "HTML") -> bool:
+        """Отправить файл с подписью в определенный тред общего чата"""
+        if not self.general_chat_id or not self.thread_ids.get(thread_name):
+            return False
+        
+        try:
+            thread_id = self.thread_ids[thread_name]
+            await asyncio.wait_for(
+                self.bot.send_document(
+                    chat_id=self.general_chat_id,
+                    document=BufferedInputFile(content, filename=file_name),
+                    caption=caption,
+                    message_thread_id=thread_id,
+                    parse_mode=parse_mode
+                ),
+                timeout=30.0  # Файл отправляется дольше сообщения
+            )
+            return True
+        except asyncio.TimeoutError:
+            print(f"Таймаут при отправке файла в тред {thread_name}")
+            return False
+        except TelegramNetworkError as e:
+            print(f"Сетевая ошибка при отправке файла в тред {thread_name}: {e}")
+            return False
+        except TelegramAPIError as e:
+            print(f"Ошибка API при отправке файла в тред {thread_name}: {e}")
+            return False
+        except Exception as e:
+            print(f"Ошибка отправки файла в тред {thread_name}: {e}")
+            return False
+    
     async def log_to_admin(self, message: str, parse_mode: str = "HTML") -> bool:
         """Отправить сообщение в админский чат"""
         if not self.admin_chat_id:
@@ -130,6 +165,19 @@ class TelegramLogger:
         message = f"📮 <b>ЕПГУ: Отправлено в очередь почты</b>\n👤 {employee_name}\n📋 ID: {app_id}\n👨‍💼 {fio}\n📝 Действие: {action}"
         return await self.log_to_thread("epgu_mail_queue", message)
     
+    async def log_epgu_mail_import(self, employee_name: str, added: int, moved: int, skipped: int, details) -> bool:
+        """Логировать импорт очереди почты ЕПГУ одним сообщением; details — (id, ФИО, email, действие)"""
+        message = (
+            f"📮 <b>ЕПГУ: Загружена очередь почты</b>\n👤 {employee_name}\n"
+            f"➕ Создано новых: {added}\n🔀 Перенесено из ЕПГУ: {moved}\n⏭ Пропущено: {skipped}"
+        )
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, delimiter=";")
+        writer.writerow(["ID", "ФИО", "Email", "Действие"])
+        writer.writerows(details)
+        content = buffer.getvalue().encode("utf-8-sig")  # BOM — чтобы Excel открыл кириллицу
+        return await self.log_document_to_thread("epgu_mail_queue", message, "epgu_mail_import.csv", content)
+    
     async def log_epgu_problem(self, employee_name: str, app_id: int, fio: str, reason: str) -> bool:
         """Логировать проблемное заявление ЕПГУ"""
         message = f"⚠️ <b>ЕПГУ: Проблемное заявление</b>\n👤 {employee_name}\n📋 ID: {app_id}\n👨‍💼 {fio}\n📝 Причина: {reason}"
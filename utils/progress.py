@@ -0,0 +1,114 @@
+"""
+Сообщения о прогрессе импорта с ограничением частоты.
+
+Каждое сообщение о прогрессе — edit_text в Telegram: при частых вызовах бот упирается
+в ограничения флуда, а ожидание сети тормозит цикл импорта. ProgressReporter хранит
+только последнее состояние и отправляет его в фоновой задаче не чаще раза в interval
+секунд; промежуточные состояния схлопываются. При переданных done/total к тексту
+добавляются скорость (строк/с) и оценка оставшегося времени. flush() доставляет
+последнее состояние сразу, повторяя отправку после TelegramRetryAfter.
+"""
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, Optional
+
+from aiogram.exceptions import TelegramBadRequest, TelegramRetryAfter
+
+from config import IMPORT_PROGRESS_INTERVAL
+
+logger = logging.getLogger(__name__)
+
+FLUSH_ATTEMPTS = 3  # Попыток доставить финальное состояние
+
+
+class ProgressReporter:
+    def __init__(self, send: Optional[Callable[[str], Awaitable]] = None, interval: float = IMPORT_PROGRESS_INTERVAL):
+        self._send = send
+        self.interval = interval
+        self._text: Optional[str] = None
+        self._sent_text: Optional[str] = None
+        self._next_send = 0.0  # monotonic: раньше этого момента не отправлять
+        self._task: Optional[asyncio.Task] = None
+        self._rate_total = None
+        self._rate_started = None
+
+    async def __call__(self, text: str):
+        """Совместимость с progress_callback(text)"""
+        self.report(text)
+
+    def report(self, text: str, done: int = None, total: int = None):
+        """Запомнить состояние; отправка — в фоне, не чаще раза в interval секунд"""
+        if self._send is None:
+            return
+        if done is not None:
+            text += self._rate(done, total)
+        self._text = text
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._deliver())
+
+    async def flush(self):
+        """Отправить последнее состояние сейчас (финальный итог этапа)"""
+        self.cancel()
+        for _ in range(FLUSH_ATTEMPTS):
+            delay = await self._send_latest()
+            if not delay:
+                return
+            await asyncio.sleep(delay)
+
+    def cancel(self):
+        """Отменить отложенную отправку (например, перед показом итогового отчета)"""
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+        self._task = None
+
+    def _rate(self, done: int, total: int = None) -> str:
+        now = time.monotonic()
+        # Новый этап (другое число строк) — скорость считается заново
+        if self._rate_started is None or total != self._rate_total:
+            self._rate_total = total
+            self._rate_started = (now, done)
+            return ""
+        started_at, started_done = self._rate_started
+        elapsed = now - started_at
+        if elapsed <= 0 or done <= started_done:
+            return ""
+        rate = (done - started_done) / elapsed
+        text = f"\n⚡ {rate:.0f} строк/с"
+        if total:
+            text += f", осталось ~{max(total - done, 0) / rate:.0f} с"
+        return text
+
+    async def _deliver(self):
+        # Состояния, пришедшие во время отправки, доставляются этой же задачей
+        while self._text != self._sent_text:
+            delay = self._next_send - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            await self._send_latest()
+
+    async def _send_latest(self) -> float:
+        """Отправить последнее состояние. Возвращает, сколько ждать перед повтором (0 — не нужно)"""
+        text = self._text
+        if text is None or text == self._sent_text:
+            return 0
+        try:
+            await self._send(text)
+        except TelegramRetryAfter as e:
+            self._next_send = time.monotonic() + e.retry_after
+            return e.retry_after
+        except TelegramBadRequest as e:
+            if "message is not modified" not in str(e):
+                logger.warning(f"Не удалось обновить прогресс: {e}")
+        except Exception as e:
+            logger.warning(f"Не удалось обновить прогресс: {e}")
+        self._sent_text = text
+        self._next_send = time.monotonic() + self.interval
+        return 0
+
+
+def as_reporter(progress_callback) -> ProgressReporter:
+    """progress_callback импортера -> ProgressReporter (вложенные вызовы используют тот же объект)"""
+    if isinstance(progress_callback, ProgressReporter):
+        return progress_callback
+    return ProgressReporter(progress_callback)
@@ -0,0 +1,125 @@
+import asyncio
+import logging
+import random
+import time
+from typing import Awaitable, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class JobStats:
+    """Метрики выполнения периодической задачи"""
+
+    def __init__(self):
+        self.runs = 0
+        self.failures = 0
+        self.skipped = 0  # пропущено тиков: предыдущий запуск еще не завершился
+        self.last_started: Optional[float] = None
+        self.last_duration: Optional[float] = None
+        self.max_duration = 0.0
+        self.total_duration = 0.0
+        self.last_error: Optional[str] = None
+
+    def as_dict(self):
+        return {
+            "runs": self.runs,
+            "failures": self.failures,
+            "skipped": self.skipped,
+            "last_duration": self.last_duration,
+            "avg_duration": self.total_duration / self.runs if self.runs else None,
+            "max_duration": self.max_duration,
+            "last_error": self.last_error
+        }
+
+
+class Job:
+    def __init__(self, name: str, func: Callable[[], Awaitable], interval: float, jitter: float, first_delay: float):
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self.jitter = jitter
+        self.first_delay = first_delay
+        self.stats = JobStats()
+        self.running: Optional[asyncio.Task] = None
+
+
+class Scheduler:
+    """
+    Планировщик периодических задач бота на asyncio.
+
+    Каждая задача запускается раз в interval секунд со случайным разбросом jitter
+    (доля интервала), чтобы задачи не срабатывали одновременно. Если предыдущий
+    запуск еще идет, тик пропускается — запуски одной задачи не перекрываются.
+    Ошибки задачи логируются и не останавливают планировщик.
+    """
+
+    def __init__(self):
+        self._jobs: Dict[str, Job] = {}
+        self._loops = []
+
+    def add_job(self, name: str, func: Callable[[], Awaitable], interval: float,
+                jitter: float = 0.1, first_delay: float = None):
+        if name in self._jobs:
+            raise ValueError(f"Задача {name} уже зарегистрирована")
+        if first_delay is None:
+            first_delay = interval
+        self._jobs[name] = Job(name, func, interval, jitter, first_delay)
+
+    def start(self):
+        for job in self._jobs.values():
+            self._loops.append(asyncio.create_task(self._loop(job)))
+        logger.info(f"Планировщик запущен, задач: {len(self._jobs)}")
+
+    async def stop(self):
+        tasks = self._loops + [job.running for job in self._jobs.values() if job.running]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._loops = []
+
+    def stats(self):
+        """Метрики всех задач: число запусков, ошибок, пропусков и время выполнения"""
+        return {name: job.stats.as_dict() for name, job in self._jobs.items()}
+
+    def _delay(self, job: Job, base: float):
+        return max(0.0, base * (1 + random.uniform(-job.jitter, job.jitter)))
+
+    async def _loop(self, job: Job):
+        await asyncio.sleep(self._delay(job, job.first_delay))
+        while True:
+            if job.running and not job.running.done():
+                job.stats.skipped += 1
+                logger.warning(f"Задача {job.name}: предыдущий запуск еще выполняется, пропуск")
+            else:
+                job.running = asyncio.create_task(self._run(job))
+            await asyncio.sleep(self._delay(job, job.interval))
+
+    async def _run(self, job: Job):
+        stats = job.stats
+        stats.last_started = time.time()
+        started = time.perf_counter()
+        try:
+            await job.func()
+        except Exception as e:
+            stats.failures += 1
+            stats.last_error = str(e)
+            logger.error(f"Задача {job.name} завершилась с ошибкой: {e}")
+        duration = time.perf_counter() - started
+        stats.runs += 1
+        stats.last_duration = duration
+        stats.total_duration += duration
+        stats.max_duration = max(stats.max_duration, duration)
+        logger.info(f"Задача {job.name} выполнена за {duration:.3f} с")
+
+
+_scheduler = None
+
+
+def init_scheduler() -> Scheduler:
+    global _scheduler
+    _scheduler = Scheduler()
+    return _scheduler
+
+
+def get_scheduler() -> Optional[Scheduler]:
+    return _scheduler
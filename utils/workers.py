@@ -0,0 +1,259 @@
+"""
+Разбор файлов импорта вне цикла событий бота.
+
+Разбор Excel/CSV — чистая работа CPU: в цикле событий он останавливает обработку
+апдейтов всех сотрудников, пока администратор импортирует файл. run_in_worker
+выполняет функцию в потоке или в ProcessPoolExecutor и передает в корутину
+сообщения о прогрессе и частичные результаты по мере их появления.
+
+Процесс пула дорог: запуск интерпретатора и импорт pandas стоят больше, чем разбор
+небольшого файла, а в потоке разбор мешает боту лишь доли секунды. Поэтому в пул
+уходят только файлы от IMPORT_OFFLOAD_MIN_MB (см. should_offload), остальные
+разбираются в потоке. Пул создается один раз; сообщения всех задач идут через одну
+multiprocessing.Queue, которую читает поток-диспетчер, а флаги отмены — общий массив
+id отмененных задач (без процесса Manager и прокси на каждое сообщение).
+
+Функция задачи получает первым аргументом JobContext:
+    job.report(text, done, total) — сообщение о прогрессе (progress_callback, см. utils.progress)
+    job.emit(item) — частичный результат (on_item)
+    job.check_cancelled() — выбрасывает JobCancelled, если задачу отменили
+
+Отмена кооперативная: cancel_jobs(key) или отмена ожидающей корутины выставляет
+флаг, и задача прерывается на ближайшей проверке. Работа в самом боте (например,
+запись импорта в базу) проверяет отмену через cancellation(key). IMPORT_WORKERS=0
+выполняет все задачи в потоке. Если процесс пула погиб (например, из-за нехватки
+памяти на большом файле), задача завершается ошибкой BrokenProcessPool, а пул
+пересоздается для следующих задач.
+"""
+import asyncio
+import itertools
+import multiprocessing
+import os
+import threading
+import zipfile
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+from functools import partial
+from typing import Callable, Optional
+
+from config import IMPORT_WORKERS, IMPORT_OFFLOAD_MIN_MB
+
+CANCEL_RING = 256  # Сколько последних отмененных задач пула помнит общий массив
+
+
+class JobCancelled(Exception):
+    """Задача разбора отменена"""
+
+
+class JobContext:
+    def __init__(self, send: Callable, is_cancelled: Callable[[], bool]):
+        self._send = send
+        self._is_cancelled = is_cancelled
+
+    def report(self, text: str, done: int = None, total: int = None):
+        self._send("progress", (text, done, total))
+
+    def emit(self, item):
+        self._send("item", item)
+
+    def check_cancelled(self):
+        if self._is_cancelled():
+            raise JobCancelled("Импорт отменен")
+
+
+def _run_job(func, args, send, is_cancelled):
+    try:
+        return func(JobContext(send, is_cancelled), *args)
+    finally:
+        # Последнее сообщение задачи: после него все остальные уже доставлены
+        send("end", None)
+
+
+# --- Процесс пула ---
+
+_worker_messages = None
+_worker_cancelled = None
+
+
+def _init_worker(messages, cancelled):
+    global _worker_messages, _worker_cancelled
+    _worker_messages = messages
+    _worker_cancelled = cancelled
+
+
+def _run_in_process(job_id: int, func, args):
+    def send(kind, payload):
+        _worker_messages.put((job_id, kind, payload))
+
+    return _run_job(func, args, send, lambda: job_id in _worker_cancelled[:])
+
+
+# --- Процесс бота ---
+
+_pool = None
+_messages = None  # сообщения задач пула: (id задачи, вид, данные)
+_cancelled = None  # кольцо id отмененных задач пула
+_cancel_position = 0
+_handlers = {}  # id задачи пула -> обработчик ее сообщений
+_job_ids = itertools.count(1)
+_active = defaultdict(set)  # ключ отмены -> функции отмены выполняемых задач
+
+
+def _read_messages(messages):
+    """Поток-диспетчер: сообщения задач пула -> обработчики в цикле событий"""
+    while True:
+        message = messages.get()
+        if message is None:
+            return
+        job_id, kind, payload = message
+        handler = _handlers.get(job_id)
+        if handler is not None:
+            handler(kind, payload)
+
+
+def _get_pool():
+    global _pool, _messages, _cancelled
+    if _pool is None:
+        # spawn: дочерний процесс не наследует потоки и соединения бота
+        context = multiprocessing.get_context("spawn")
+        _messages = context.Queue()
+        _cancelled = context.Array("q", CANCEL_RING)
+        _pool = ProcessPoolExecutor(
+            max_workers=IMPORT_WORKERS, mp_context=context,
+            initializer=_init_worker, initargs=(_messages, _cancelled)
+        )
+        threading.Thread(target=_read_messages, args=(_messages,), name="import-workers", daemon=True).start()
+    return _pool
+
+
+def _reset_pool(pool=None):
+    """Остановить пул (если это все еще pool) и поток-диспетчер; следующая задача создаст новый"""
+    global _pool, _messages, _cancelled
+    if _pool is None or (pool is not None and _pool is not pool):
+        return
+    _pool.shutdown(wait=False, cancel_futures=True)
+    _messages.put(None)  # остановить поток-диспетчер
+    _pool = _messages = _cancelled = None
+
+
+def _cancel_in_pool(job_id: int):
+    global _cancel_position
+    with _cancelled.get_lock():
+        _cancelled[_cancel_position % CANCEL_RING] = job_id
+        _cancel_position += 1
+
+
+def _register(cancel_key, cancel: Callable):
+    _active[cancel_key].add(cancel)
+
+
+def _unregister(cancel_key, cancel: Callable):
+    _active[cancel_key].discard(cancel)
+    if not _active[cancel_key]:
+        del _active[cancel_key]
+
+
+def should_offload(file_path: str) -> bool:
+    """Разбирать ли файл в пуле процессов: по размеру (для .zip — распакованному)"""
+    try:
+        size = os.path.getsize(file_path)
+        if zipfile.is_zipfile(file_path):
+            with zipfile.ZipFile(file_path) as archive:
+                size = max(size, sum(info.file_size for info in archive.infolist()))
+    except (OSError, zipfile.BadZipFile):
+        return True
+    return size >= IMPORT_OFFLOAD_MIN_MB * 1024 * 1024
+
+
+async def run_in_worker(func: Callable, *args, progress_callback=None,
+                        on_item: Optional[Callable] = None, cancel_key=None, offload: bool = True):
+    """
+    Выполнить func(job, *args) и вернуть ее результат: в пуле процессов при offload
+    (func и аргументы должны сериализоваться pickle — функция уровня модуля),
+    иначе в потоке
+    """
+    # Импорт здесь: процессы пула загружают этот модуль и utils.excel (функции задач)
+    # и не должны тянуть aiogram
+    from utils.progress import as_reporter
+    loop = asyncio.get_running_loop()
+    progress = as_reporter(progress_callback)
+    delivered = loop.create_future()
+
+    def deliver(kind, payload):
+        if kind == "item":
+            if on_item:
+                on_item(payload)
+        elif kind == "progress":
+            text, done, total = payload
+            progress.report(text, done=done, total=total)
+        elif not delivered.done():
+            delivered.set_result(None)
+
+    def post(kind, payload):
+        loop.call_soon_threadsafe(deliver, kind, payload)
+
+    job_id = next(_job_ids)
+    pool = None
+    if offload and IMPORT_WORKERS > 0:
+        pool = _get_pool()
+        _handlers[job_id] = post
+        cancel = partial(_cancel_in_pool, job_id)
+        future = loop.run_in_executor(pool, _run_in_process, job_id, func, args)
+    else:
+        cancel_event = threading.Event()
+        cancel = cancel_event.set
+        future = loop.run_in_executor(None, _run_job, func, args, post, cancel_event.is_set)
+    _register(cancel_key, cancel)
+    try:
+        result = await future
+        await delivered
+        return result
+    except asyncio.CancelledError:
+        cancel()
+        raise
+    except BrokenProcessPool:
+        # Сломанный пул не принимает задачи — без сброса все следующие импорты падали бы до перезапуска
+        _reset_pool(pool)
+        raise
+    finally:
+        _handlers.pop(job_id, None)
+        _unregister(cancel_key, cancel)
+
+
+class CancelToken:
+    """Флаг отмены работы, выполняемой в самом боте"""
+
+    def __init__(self):
+        self._event = threading.Event()
+
+    def cancel(self):
+        self._event.set()
+
+    def check(self):
+        if self._event.is_set():
+            raise JobCancelled("Импорт отменен")
+
+
+@contextmanager
+def cancellation(cancel_key):
+    """Отмена по cancel_jobs(cancel_key) на время блока: token.check() между шагами"""
+    token = CancelToken()
+    _register(cancel_key, token.cancel)
+    try:
+        yield token
+    finally:
+        _unregister(cancel_key, token.cancel)
+
+
+def cancel_jobs(cancel_key) -> int:
+    """Отменить выполняемые задачи с ключом cancel_key. Возвращает число задач"""
+    cancels = list(_active.get(cancel_key, ()))
+    for cancel in cancels:
+        cancel()
+    return len(cancels)
+
+
+def shutdown_workers():
+    _reset_pool()
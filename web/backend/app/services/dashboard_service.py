@@ -1,8 +1,11 @@
-from sqlalchemy.orm import Session
-from sqlalchemy import func, and_, or_
+from sqlalchemy.orm import Session, selectinload
+from sqlalchemy import and_, or_
 from datetime import datetime, timedelta
 import pytz
 from db.models import Employee, Application, WorkDay, ApplicationStatusEnum, WorkDayStatusEnum
+from db.dispatch import claim_next_application_stmt
+from db.search import search_applications_page_stmt, is_searchable, is_email_query
+from db.statistics import get_statistics_snapshot_sync
 from typing import List, Dict, Any
 import time
 
@@ -216,66 +219,11 @@ class DashboardService:
 
     def get_queue_statistics(self) -> List[Dict[str, Any]]:
         """Получить статистику по всем очередям"""
-        queue_types = ['lk', 'epgu', 'epgu_mail', 'epgu_problem']
-        result = []
-        
-        for queue_type in queue_types:
-            # Общее количество
-            total = self.db.query(func.count(Application.id)).filter(
-                Application.queue_type == queue_type
-            ).scalar()
-            
-            # В очереди
-            queued = self.db.query(func.count(Application.id)).filter(
-                and_(
-                    Application.queue_type == queue_type,
-                    Application.status == ApplicationStatusEnum.QUEUED
-                )
-            ).scalar()
-            
-            # В обработке
-            in_progress = self.db.query(func.count(Application.id)).filter(
-                and_(
-                    Application.queue_type == queue_type,
-                    Application.status == ApplicationStatusEnum.IN_PROGRESS
-                )
-            ).scalar()
-            
-            # Принято
-            accepted = self.db.query(func.count(Application.id)).filter(
-                and_(
-                    Application.queue_type == queue_type,
-                    Application.status == ApplicationStatusEnum.ACCEPTED
-                )
-            ).scalar()
-            
-            # Отклонено
-            rejected = self.db.query(func.count(Application.id)).filter(
-                and_(
-                    Application.queue_type == queue_type,
-                    Application.status == ApplicationStatusEnum.REJECTED
-                )
-            ).scalar()
-            
-            # Проблемные
-            problem = self.db.query(func.count(Application.id)).filter(
-                and_(
-                    Application.queue_type == queue_type,
-                    Application.status == ApplicationStatusEnum.PROBLEM
-                )
-            ).scalar()
-            
-            result.append({
-                "queue_type": queue_type,
-                "total": total,
-                "queued": queued,
-                "in_progress": in_progress,
-                "accepted": accepted,
-                "rejected": rejected,
-                "problem": problem
-            })
-        
-        return result
+        snapshot = get_statistics_snapshot_sync(self.db)
+        return [
+            snapshot.queue(queue_type).as_dict()
+            for queue_type in ['lk', 'epgu', 'epgu_mail', 'epgu_problem']
+        ]
 
     def get_queue_applications(self, queue_type: str) -> List[Dict[str, Any]]:
         """Получить все заявления из конкретной очереди"""
@@ -302,73 +250,21 @@ class DashboardService:
         
         return result
 
-    def get_lk_chart_data(self) -> Dict[str, Any]:
-        """Получить данные для круговой диаграммы ЛК"""
-        # Получаем статистику по ЛК
-        total = self.db.query(func.count(Application.id)).filter(
-            Application.queue_type == 'lk'
-        ).scalar()
-        
-        queued = self.db.query(func.count(Application.id)).filter(
-            and_(
-                Application.queue_type == 'lk',
-                Application.status == ApplicationStatusEnum.QUEUED
-            )
-        ).scalar()
-        
-        in_progress = self.db.query(func.count(Application.id)).filter(
-            and_(
-                Application.queue_type == 'lk',
-                Application.status == ApplicationStatusEnum.IN_PROGRESS
-            )
-        ).scalar()
-        
-        completed = self.db.query(func.count(Application.id)).filter(
-            and_(
-                Application.queue_type == 'lk',
-                Application.status.in_([ApplicationStatusEnum.ACCEPTED, ApplicationStatusEnum.REJECTED])
-            )
-        ).scalar()
-        
+    def _chart_data(self, queue_type: str) -> Dict[str, Any]:
+        stats = get_statistics_snapshot_sync(self.db).queue(queue_type)
         return {
             "labels": ["В очереди", "В обработке", "Завершено"],
-            "data": [queued, in_progress, completed],
-            "total": total
+            "data": [stats.queued, stats.in_progress, stats.completed],
+            "total": stats.total
         }
 
+    def get_lk_chart_data(self) -> Dict[str, Any]:
+        """Получить данные для круговой диаграммы ЛК"""
+        return self._chart_data('lk')
+
     def get_epgu_chart_data(self) -> Dict[str, Any]:
         """Получить данные для круговой диаграммы ЕПГУ"""
-        # Получаем статистику по ЕПГУ
-        total = self.db.query(func.count(Application.id)).filter(
-            Application.queue_type == 'epgu'
-        ).scalar()
-        
-        queued = self.db.query(func.count(Application.id)).filter(
-            and_(
-                Application.queue_type == 'epgu',
-                Application.status == ApplicationStatusEnum.QUEUED
-            )
-        ).scalar()
-        
-        in_progress = self.db.query(func.count(Application.id)).filter(
-            and_(
-                Application.queue_type == 'epgu',
-                Application.status == ApplicationStatusEnum.IN_PROGRESS
-            )
-        ).scalar()
-        
-        completed = self.db.query(func.count(Application.id)).filter(
-            and_(
-                Application.queue_type == 'epgu',
-                Application.status.in_([ApplicationStatusEnum.ACCEPTED, ApplicationStatusEnum.REJECTED])
-            )
-        ).scalar()
-        
-        return {
-            "labels": ["В очереди", "В обработке", "Завершено"],
-            "data": [queued, in_progress, completed],
-            "total": total
-        }
+        return self._chart_data('epgu')
 
     def get_full_report_by_date(self, report_date: datetime.date = None) -> list:
         """Получить полный отчет по всем сотрудникам за день (рабочее время, перерывы, заявления)"""
@@ -473,28 +369,24 @@ class DashboardService:
         self.accept_application(app, employee_id) 
 
     def assign_next_application(self, queue_type, employee_id):
-        # Аналогично get_next_application из crud.py
-        app = self.db.query(Application).filter(
-            Application.queue_type == queue_type,
-            Application.status == ApplicationStatusEnum.QUEUED
-        ).order_by(
-            Application.is_priority.desc(),
-            Application.submitted_at.asc()
-        ).first()
-        if app:
-            app.status = ApplicationStatusEnum.IN_PROGRESS
-            app.processed_by_id = employee_id
-            app.taken_at = get_moscow_now()
-            self.db.commit()
+        # Тот же атомарный захват, что и в get_next_application из crud.py
+        now = get_moscow_now()
+        postponed_before = now if queue_type == 'epgu' else None
+        app = self.db.execute(
+            claim_next_application_stmt(queue_type, employee_id, now, postponed_before=postponed_before)
+        ).scalars().first()
+        self.db.commit()
         return app
 
     def search_applications(self, queue_type, fio_or_email):
         # Для epgu_mail поддерживаем поиск по email
-        q = self.db.query(Application).filter(Application.queue_type == queue_type)
-        if queue_type == 'epgu_mail' and ('@' in fio_or_email and '.' in fio_or_email):
-            q = q.filter(Application.email.ilike(f"%{fio_or_email}%"))
-        else:
-            q = q.filter(Application.fio.ilike(f"%{fio_or_email}%"))
+        if not is_searchable(fio_or_email):
+            return []
+        by_email = queue_type == 'epgu_mail' and is_email_query(fio_or_email)
+        # Тот же запрос, что и у поиска в боте (search_applications в db/crud.py)
+        stmt = search_applications_page_stmt(fio_or_email, [queue_type], by_email=by_email).options(
+            selectinload(Application.processed_by)
+        )
         return [
             {
                 "id": app.id,
@@ -506,5 +398,5 @@ class DashboardService:
                 "processed_by_fio": app.processed_by.fio if app.processed_by else None,
                 "is_priority": app.is_priority if hasattr(app, 'is_priority') else False
             }
-            for app in q.order_by(Application.submitted_at.desc()).all()
+            for app in self.db.execute(stmt).scalars().all()
         ] 
\ No newline at end of file